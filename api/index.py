@@ -6,23 +6,35 @@ import smtplib
 import json
 import random
 import time
+import atexit
 import base64
+import difflib
+import glob
+import secrets
 import email
+import email.header
+import email.parser
 import email.policy
 from email.message import EmailMessage
 from datetime import datetime, timedelta, UTC
-from collections import defaultdict
-import fitz  # PyMuPDF
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+import gzip
+import hashlib
+import heapq
+import itertools
+import zlib
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import wraps
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, stream_with_context, has_request_context
 from werkzeug.utils import secure_filename
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
-from supabase import create_client, Client # New import for Supabase
+
+# NOTE: PyMuPDF (fitz), the Google API/OAuth clients, langchain_groq and supabase are
+# imported lazily inside the functions that need them. Each one costs tens to hundreds
+# of milliseconds at import, and serverless cold starts for light routes (GET /,
+# static assets) should not pay for SDKs they never touch.
+# Budget and eager-import check: python bench/bench_startup.py --check
 
 # DEV ONLY: allow http://localhost for OAuth during local development (remove in production)
 if os.getenv("VERCEL_ENV") != "production":
@@ -36,18 +48,34 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET_NAME = os.getenv("SUPABASE_BUCKET_NAME", "resumes")
 
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("Supabase client initialized successfully.")
-except Exception as e:
-    print(f"Failed to initialize Supabase client: {e}")
-    supabase = None
+# Created on first use by get_supabase(); tests and the load-test harness may assign it directly.
+supabase = None
+_supabase_init_attempted = False
+_supabase_lock = threading.Lock()
+
+def get_supabase():
+    """Returns the shared Supabase client, creating it on first use (None if unavailable)."""
+    global supabase, _supabase_init_attempted
+    if supabase is not None or _supabase_init_attempted:
+        return supabase
+    with _supabase_lock:
+        if supabase is None and not _supabase_init_attempted:
+            _supabase_init_attempted = True
+            try:
+                from supabase import create_client
+                supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+                print("Supabase client initialized successfully.")
+            except Exception as e:
+                print(f"Failed to initialize Supabase client: {e}")
+                supabase = None
+    return supabase
 
 # ==================== CHAT HISTORY MANAGEMENT (Supabase) ====================
 # Uses Supabase table 'chat_history' with columns: session_id (PK, text), history_json (jsonb)
 CHAT_HISTORY_TABLE = "chat_history"
 
 def load_chat_history(session_id):
+    supabase = get_supabase()
     if not supabase: return []
     try:
         # Fetch history by session_id
@@ -61,6 +89,7 @@ def load_chat_history(session_id):
         return []
 
 def save_chat_history(session_id, history):
+    supabase = get_supabase()
     if not supabase: return
     try:
         # Keep only the last 20 messages before saving
@@ -101,6 +130,98 @@ SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = os.getenv("SMTP_PORT")
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+# Required in the X-Admin-Token header by /admin/* endpoints (which are disabled when unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def _parse_env_map(value):
+    """Parses "a=b,c=d" environment values into a dict."""
+    out = {}
+    for item in (value or "").split(","):
+        key, _, val = item.partition("=")
+        if key.strip() and val.strip():
+            out[key.strip()] = val.strip()
+    return out
+
+# -------------------- LLM model routing --------------------
+# Evaluations are routed by a cheap first-pass score (local keyword overlap, or a short
+# LLM scoring call when the JD has no known keywords):
+#   score <  ROUTER_QUICK_BELOW                   -> "quick":    fast model, resume truncated
+#   ROUTER_ESCALATE_MIN <= score <= ..._MAX       -> "escalate": strong model (borderline cases)
+#   anything else                                  -> "standard": fast model, full prompt
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+LLM_STRONG_MODEL = os.getenv("LLM_STRONG_MODEL", "llama-3.3-70b-versatile")
+LLM_CHAT_MODEL = os.getenv("LLM_CHAT_MODEL", LLM_FAST_MODEL)
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.18"))
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") == "1"
+ROUTER_QUICK_BELOW = int(os.getenv("ROUTER_QUICK_BELOW", "20"))
+ROUTER_ESCALATE_MIN = int(os.getenv("ROUTER_ESCALATE_MIN", "45"))
+ROUTER_ESCALATE_MAX = int(os.getenv("ROUTER_ESCALATE_MAX", "75"))
+ROUTER_QUICK_SCORE_CALL = os.getenv("ROUTER_QUICK_SCORE_CALL", "1") == "1"
+QUICK_RESUME_CHARS = int(os.getenv("QUICK_RESUME_CHARS", "4000"))
+# Max in-flight requests per model, e.g. "llama-3.1-8b-instant=8,llama-3.3-70b-versatile=2"
+LLM_MODEL_CONCURRENCY = {k: int(v) for k, v in _parse_env_map(
+    os.getenv("LLM_MODEL_CONCURRENCY", f"{LLM_FAST_MODEL}=8,{LLM_STRONG_MODEL}=2")).items()}
+LLM_DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", "4"))
+# Model to switch to when a model answers 429, e.g. "llama-3.3-70b-versatile=llama-3.1-8b-instant"
+LLM_FALLBACKS = _parse_env_map(os.getenv("LLM_FALLBACKS", f"{LLM_STRONG_MODEL}={LLM_FAST_MODEL}"))
+
+# Admission control. Requests are classed as "chat" (interactive), "upload" or "bulk"
+# (Gmail fetches, re-evaluation). Each session may run ADMISSION_OWNER_LIMITS[class]
+# requests at once; all LLM calls share LLM_GLOBAL_CONCURRENCY slots, handed to chat first.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_OWNER_LIMITS = {k: int(v) for k, v in _parse_env_map(
+    os.getenv("ADMISSION_OWNER_LIMITS", "chat=2,upload=2,bulk=1")).items()}
+ADMISSION_RETRY_AFTER = {k: int(v) for k, v in _parse_env_map(
+    os.getenv("ADMISSION_RETRY_AFTER", "chat=2,upload=5,bulk=30")).items()}
+LLM_GLOBAL_CONCURRENCY = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "10"))
+# New upload/bulk requests are refused while this many LLM calls are already queued
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "30"))
+LLM_CHAT_QUEUE_TIMEOUT = float(os.getenv("LLM_CHAT_QUEUE_TIMEOUT", "10"))
+
+# Two-phase evaluation: phase one extracts a JD-independent profile once per resume
+# (cached by text hash in RESUME_PROFILES_TABLE); phase two scores that compact profile
+# against each job description instead of the full resume text.
+TWO_PHASE_ENABLED = os.getenv("TWO_PHASE_ENABLED", "1") == "1"
+RESUME_PROFILE_CACHE_SIZE = int(os.getenv("RESUME_PROFILE_CACHE_SIZE", "512"))
+
+# Resume PDFs are stored once per content hash and uploaded BLOB_UPLOAD_CONCURRENCY at a time.
+# Download links are signed for SIGNED_URL_TTL_SECONDS and reused while most of that is left.
+BLOB_UPLOAD_CONCURRENCY = int(os.getenv("BLOB_UPLOAD_CONCURRENCY", "4"))
+SIGNED_URL_TTL_SECONDS = int(os.getenv("SIGNED_URL_TTL_SECONDS", "300"))
+
+# Ingestion checkpoints: a batch left "running" longer than INGESTION_LEASE_SECONDS may be
+# taken over by a retry; finished batches are replayed for INGESTION_TTL_SECONDS. The blob
+# sweeper never removes unreferenced blobs younger than BLOB_ORPHAN_GRACE_SECONDS.
+INGESTION_LEASE_SECONDS = int(os.getenv("INGESTION_LEASE_SECONDS", "300"))
+INGESTION_TTL_SECONDS = int(os.getenv("INGESTION_TTL_SECONDS", str(24 * 3600)))
+BLOB_ORPHAN_GRACE_SECONDS = int(os.getenv("BLOB_ORPHAN_GRACE_SECONDS", str(24 * 3600)))
+# Attempts of a versioned project save when the project keeps changing underneath
+PROJECT_SAVE_RETRIES = int(os.getenv("PROJECT_SAVE_RETRIES", os.getenv("REEVAL_COMMIT_RETRIES", "5")))
+
+# Google credentials are kept server-side (see GOOGLE CREDENTIAL STORE). Each instance caches
+# them for CREDENTIAL_CACHE_TTL_SECONDS; tokens are refreshed on use when they expire within
+# TOKEN_REFRESH_MARGIN_SECONDS, and every TOKEN_REFRESH_INTERVAL_SECONDS a background thread
+# refreshes cached sessions whose token expires within TOKEN_REFRESH_AHEAD_SECONDS.
+CREDENTIAL_CACHE_TTL_SECONDS = int(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "900"))
+CREDENTIAL_CACHE_MAX_ENTRIES = int(os.getenv("CREDENTIAL_CACHE_MAX_ENTRIES", "1024"))
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+TOKEN_REFRESH_AHEAD_SECONDS = int(os.getenv("TOKEN_REFRESH_AHEAD_SECONDS", "600"))
+TOKEN_REFRESH_INTERVAL_SECONDS = int(os.getenv("TOKEN_REFRESH_INTERVAL_SECONDS", "60"))
+TOKEN_REFRESHER_ENABLED = os.getenv("TOKEN_REFRESHER_ENABLED", "1") == "1"
+
+# Gmail scans fetch messages GMAIL_FETCH_CONCURRENCY at a time and hand each raw message to
+# GMAIL_DECODE_WORKERS MIME parsers, so decoding overlaps the network. Resume attachments
+# larger than GMAIL_MAX_ATTACHMENT_BYTES are skipped without being decoded.
+GMAIL_FETCH_CONCURRENCY = int(os.getenv("GMAIL_FETCH_CONCURRENCY", "4"))
+GMAIL_DECODE_WORKERS = int(os.getenv("GMAIL_DECODE_WORKERS", "2"))
+GMAIL_MAX_ATTACHMENT_BYTES = int(os.getenv("GMAIL_MAX_ATTACHMENT_BYTES", str(10 * 1024 * 1024)))
+
+# Audit events and usage counters are buffered in memory (and a local spill file) and written
+# every AUDIT_FLUSH_SECONDS, or as soon as AUDIT_FLUSH_MAX_EVENTS events are waiting.
+AUDIT_LOG_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "1") == "1"
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "5"))
+AUDIT_FLUSH_MAX_EVENTS = int(os.getenv("AUDIT_FLUSH_MAX_EVENTS", "100"))
+AUDIT_SPILL_DIR = os.getenv("AUDIT_SPILL_DIR", os.path.join(TEMPORARY_FOLDER, "audit-spill"))
 
 # Domain keywords for analysis
 KEYWORDS = {
@@ -120,12 +241,91 @@ app = Flask(
     template_folder="../templates"   # go one folder up to /templates
 )
 
-app.secret_key = os.urandom(24)
+# Must be shared by every worker and survive restarts, or each one invalidates all sessions.
+app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(24)
+if not os.getenv("FLASK_SECRET_KEY"):
+    print("Warning: FLASK_SECRET_KEY is not set; sessions will not survive restarts or span workers.")
+
+# -------------------- HTTP compression, ETags and static caching --------------------
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/javascript", "text/javascript", "text/css", "text/html", "text/plain", "text/csv", "application/x-ndjson"}
+STATIC_MAX_AGE = 365 * 24 * 3600
+_static_fingerprints = {}
+
+def static_fingerprint(filename):
+    """Short content hash of a static file, used as the ?v= cache-busting parameter."""
+    if filename not in _static_fingerprints:
+        try:
+            with open(os.path.join(app.static_folder, filename), 'rb') as f:
+                _static_fingerprints[filename] = hashlib.sha1(f.read()).hexdigest()[:12]
+        except OSError:
+            _static_fingerprints[filename] = None
+    return _static_fingerprints[filename]
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = static_fingerprint(values['filename'])
+        if fingerprint:
+            values['v'] = fingerprint
+
+def compress_body(data, accept_encoding):
+    """Returns (encoding, compressed bytes) preferring zstd over gzip, or (None, data)."""
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if "zstd" in accepted:
+        try:
+            import zstandard
+            return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+        except ImportError:
+            pass
+    if "gzip" in accepted:
+        return "gzip", gzip.compress(data, compresslevel=6)
+    return None, data
+
+@app.after_request
+def optimize_response(response):
+    if request.endpoint == 'static' and response.status_code == 200:
+        filename = (request.view_args or {}).get('filename')
+        if filename and request.args.get('v') == static_fingerprint(filename):
+            # Fingerprinted URLs change whenever the file does, so they can be cached for good.
+            # A stale or made-up ?v= gets the default caching, or it would pin old content.
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        # send_file streams from disk; buffer it so the asset can be compressed below.
+        response.direct_passthrough = False
+        response.get_data()
+    if (response.status_code != 200 or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or "Content-Encoding" in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+    encoding, compressed = compress_body(data, request.headers.get("Accept-Encoding"))
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+def json_with_etag(payload, etag):
+    """JSON response with a weak ETag; answers 304 when If-None-Match matches. `no-cache`
+    makes browsers revalidate on every fetch instead of reusing a stale copy."""
+    response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and request.headers.get("X-Admin-Token") == ADMIN_TOKEN
 
 # -------------------- Project storage helpers (Supabase) --------------------
 PROJECTS_TABLE = "projects"
 
 def load_projects():
+    supabase = get_supabase()
     if not supabase: return []
     try:
         # Fetch all project data (id and the entire 'data' JSON blob)
@@ -139,9 +339,19 @@ def load_projects():
         return []
 
 def save_projects(projects):
-    """Saves all projects by batch updating the Supabase table."""
+    """Saves all projects by batch updating the Supabase table. Full resume records are
+    split first: evaluation details go to RESUME_DETAILS_TABLE, the project keeps the index.
+    Details are written before the index, so a saved index never lists a resume whose
+    evaluation was lost; a failed upsert only leaves unused detail rows behind."""
+    supabase = get_supabase()
     if not supabase: return False
     try:
+        details = []
+        for p in projects:
+            details.extend(compact_project(p))
+        if details and not save_resume_details(details):
+            return False
+
         # Prepare data for Supabase upsert: list of {'id': project_id, 'data': project_object}
         data_to_save = []
         for p in projects:
@@ -163,7 +373,30 @@ def save_projects(projects):
         print(f"Supabase failed to save projects: {e}")
         return False
 
+def save_project_if_version(project, expected_version):
+    """Compare-and-swap save of one project: the row is only updated while its stored version
+    is still `expected_version` (None: a legacy row without one). Returns False on a version
+    mismatch or a storage error.
+    As in save_projects(), detail documents go first; a lost race leaves them to be
+    rewritten by the caller's retry."""
+    supabase = get_supabase()
+    if not supabase: return False
+    try:
+        details = compact_project(project)
+        if details and not save_resume_details(details):
+            return False
+        query = supabase.table(PROJECTS_TABLE).update({'data': project}).eq('id', project['id'])
+        if expected_version is None:
+            query = query.is_('data->>version', 'null')
+        else:
+            query = query.eq('data->>version', str(expected_version))
+        return bool(query.execute().data)
+    except Exception as e:
+        print(f"Supabase failed to save project {project.get('id')}: {e}")
+        return False
+
 def find_project(project_id):
+    supabase = get_supabase()
     if not supabase: return None
     try:
         # Fetch a single project by id
@@ -176,30 +409,905 @@ def find_project(project_id):
         # This handles the case where the project is not found (Supabase raises an exception if single() returns no rows)
         return None
 
+def find_project_fields(project_id, fields):
+    """Reads only the given top-level keys of a project document (JSON-path select), so
+    small routes do not transfer the resume index. Returns a dict or None."""
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        columns = ", ".join(f"{f}:data->{f}" for f in fields)
+        response = supabase.table(PROJECTS_TABLE).select(columns).eq("id", project_id).single().execute()
+        return dict(response.data) if response.data else None
+    except Exception:
+        return None
+
+# -------------------- Resume profile storage helpers (Supabase) --------------------
+# Uses Supabase table 'resume_profiles' with columns: resume_hash (PK, text), profile_json (jsonb), created_at (text)
+RESUME_PROFILES_TABLE = "resume_profiles"
+_resume_profile_cache = OrderedDict()
+_resume_profile_lock = threading.Lock()
+
+def resume_text_hash(cleaned_text):
+    return hashlib.sha256((cleaned_text or "").encode("utf-8")).hexdigest()
+
+def load_resume_profile(resume_hash):
+    with _resume_profile_lock:
+        if resume_hash in _resume_profile_cache:
+            _resume_profile_cache.move_to_end(resume_hash)
+            return _resume_profile_cache[resume_hash]
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        response = supabase.table(RESUME_PROFILES_TABLE).select("profile_json").eq("resume_hash", resume_hash).single().execute()
+        if response.data and response.data.get('profile_json'):
+            remember_resume_profile(resume_hash, response.data['profile_json'])
+            return response.data['profile_json']
+        return None
+    except Exception:
+        # single() raises when no row exists yet
+        return None
+
+def remember_resume_profile(resume_hash, profile):
+    with _resume_profile_lock:
+        _resume_profile_cache[resume_hash] = profile
+        _resume_profile_cache.move_to_end(resume_hash)
+        while len(_resume_profile_cache) > RESUME_PROFILE_CACHE_SIZE:
+            _resume_profile_cache.popitem(last=False)
+
+def save_resume_profile(resume_hash, profile):
+    remember_resume_profile(resume_hash, profile)
+    supabase = get_supabase()
+    if not supabase: return
+    try:
+        supabase.table(RESUME_PROFILES_TABLE).upsert({
+            "resume_hash": resume_hash,
+            "profile_json": profile,
+            "created_at": datetime.utcnow().isoformat() + 'Z'
+        }, on_conflict="resume_hash").execute()
+    except Exception as e:
+        print(f"Supabase save resume profile error: {e}")
+
+# -------------------- Project analytics aggregates --------------------
+# Maintained incrementally in project['analytics'] on every resume insert/delete/re-score, so
+# the analytics endpoint never walks the resume list. Projects saved before the aggregates
+# existed (or with an older ANALYTICS_VERSION) are rebuilt once from their index records.
+ANALYTICS_VERSION = 1
+
+def score_bucket(score):
+    low = min(max(int(score), 0) // 10 * 10, 90)
+    return f"{low}-{100 if low == 90 else low + 9}"
+
+def empty_analytics():
+    return {
+        'version': ANALYTICS_VERSION, 'count': 0, 'score_sum': 0, 'hr_score_sum': 0,
+        'score_histogram': {score_bucket(low): 0 for low in range(0, 100, 10)},
+        'domain_coverage': {}, 'domain_keywords': {}, 'sender_domains': {}, 'intake_per_day': {}
+    }
+
+def _bump(counter, key, delta):
+    value = counter.get(key, 0) + delta
+    if value > 0:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+def apply_resume_to_analytics(analytics, resume, delta):
+    """Adds (delta=1) or removes (delta=-1) one resume's contribution."""
+    score = resume_ats_score(resume)
+    try:
+        hr_score = int(resume_field(resume, 'hr_score') or 0)
+    except Exception:
+        hr_score = 0
+    analytics['count'] = max(0, analytics['count'] + delta)
+    analytics['score_sum'] += delta * score
+    analytics['hr_score_sum'] += delta * hr_score
+    histogram = analytics['score_histogram']
+    histogram[score_bucket(score)] = max(0, histogram.get(score_bucket(score), 0) + delta)
+
+    for domain, words in (resume_field(resume, 'matched_keywords') or {}).items():
+        if not words:
+            continue
+        _bump(analytics['domain_coverage'], domain, delta)
+        counts = analytics['domain_keywords'].setdefault(domain, {})
+        for word in set(words):
+            _bump(counts, word, delta)
+        if not counts:
+            del analytics['domain_keywords'][domain]
+
+    address = parse_email_from_sender(resume.get('sender', '')) or resume.get('email') or ''
+    if '@' in address:
+        _bump(analytics['sender_domains'], address.rsplit('@', 1)[1].lower(), delta)
+    day = (resume.get('uploaded_at') or '')[:10]
+    if day:
+        _bump(analytics['intake_per_day'], day, delta)
+
+def project_analytics(project):
+    analytics = project.get('analytics')
+    if not analytics or analytics.get('version') != ANALYTICS_VERSION:
+        analytics = empty_analytics()
+        for r in project.get('resumes', []):
+            apply_resume_to_analytics(analytics, r, 1)
+        project['analytics'] = analytics
+    return analytics
+
+def add_resume_to_project(project, resume):
+    """Appends a resume record and updates the stats/aggregates to match."""
+    analytics = project_analytics(project)
+    project.setdefault('resumes', []).append(resume)
+    apply_resume_to_analytics(analytics, resume, 1)
+    stats = project.setdefault('stats', {})
+    stats['total_uploaded'] = stats.get('total_uploaded', 0) + 1
+
+def remove_resume_from_project(project, resume_id):
+    """Removes a resume record, updating the stats/aggregates. Returns the record or None."""
+    resumes = project.get('resumes', [])
+    resume = next((r for r in resumes if r.get('id') == resume_id), None)
+    if resume is None:
+        return None
+    analytics = project_analytics(project)
+    project['resumes'] = [r for r in resumes if r.get('id') != resume_id]
+    apply_resume_to_analytics(analytics, resume, -1)
+    invalidate_comparisons([resume_id])
+    stats = project.setdefault('stats', {})
+    stats['total_uploaded'] = max(0, stats.get('total_uploaded', 0) - 1)
+    return resume
+
+# -------------------- Content-addressed resume blobs (Supabase Storage) --------------------
+# PDFs live at blobs/<sha256[:2]>/<sha256>.pdf, so identical files share one object across
+# projects. Table 'resume_blob_refs' columns: resume_id (PK, text), blob_hash (text),
+# project_id (text), created_at (text). A blob is removed only when its last reference is gone.
+RESUME_BLOB_REFS_TABLE = "resume_blob_refs"
+BLOB_PREFIX = "blobs"
+_signed_url_cache = {}
+_blob_lock = threading.Lock()
+
+def blob_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def blob_path(digest):
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest}.pdf"
+
+def upload_blob(data, digest=None):
+    """Stores one PDF under its content hash. An existing object counts as success."""
+    digest = digest or blob_hash(data)
+    path = blob_path(digest)
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        supabase.storage.from_(SUPABASE_BUCKET_NAME).upload(
+            file=data,
+            path=path,
+            file_options={"content-type": "application/pdf"}
+        )
+    except Exception as e:
+        message = str(e).lower()
+        if "exists" not in message and "duplicate" not in message and "409" not in message:
+            print(f"Supabase Storage upload failed for blob {digest}: {e}")
+            return None
+    return path
+
+def store_blobs(payloads):
+    """Uploads PDFs through a bounded pool, once per distinct content.
+    Returns {digest: storage_path}, with None for uploads that failed."""
+    by_digest = {}
+    for data in payloads:
+        by_digest.setdefault(blob_hash(data), data)
+    if len(by_digest) <= 1:
+        return {digest: upload_blob(data, digest) for digest, data in by_digest.items()}
+    with ThreadPoolExecutor(max_workers=max(1, min(BLOB_UPLOAD_CONCURRENCY, len(by_digest)))) as pool:
+        futures = {digest: pool.submit(upload_blob, data, digest) for digest, data in by_digest.items()}
+        return {digest: f.result() for digest, f in futures.items()}
+
+def add_blob_refs(refs):
+    """Records [(resume_id, blob_hash, project_id)] references in one upsert."""
+    supabase = get_supabase()
+    if not supabase or not refs: return False
+    try:
+        now = datetime.utcnow().isoformat() + 'Z'
+        rows = [{'resume_id': rid, 'blob_hash': digest, 'project_id': pid, 'created_at': now} for rid, digest, pid in refs]
+        supabase.table(RESUME_BLOB_REFS_TABLE).upsert(rows, on_conflict="resume_id").execute()
+        return True
+    except Exception as e:
+        print(f"Supabase failed to save blob references: {e}")
+        return False
+
+def reserve_blobs(holder, project_id, digests):
+    """Records a pending reference "pending:<holder>:<hash>" for each blob an ingestion is
+    about to upload or reuse. Taken under _blob_lock before the upload, so a concurrent
+    release_resume_blobs() either sees the reference or has already removed the object,
+    which the upload then writes again. Returns the pending reference ids."""
+    supabase = get_supabase()
+    ref_ids = [f"pending:{holder}:{digest}" for digest in digests]
+    if not supabase or not ref_ids: return ref_ids
+    now = datetime.utcnow().isoformat() + 'Z'
+    rows = [{'resume_id': rid, 'blob_hash': digest, 'project_id': project_id, 'created_at': now}
+            for rid, digest in zip(ref_ids, digests)]
+    try:
+        with _blob_lock:
+            supabase.table(RESUME_BLOB_REFS_TABLE).upsert(rows, on_conflict="resume_id").execute()
+    except Exception as e:
+        print(f"Supabase failed to save pending blob references: {e}")
+    return ref_ids
+
+def drop_blob_refs(ref_ids):
+    """Deletes references by id without removing any blob (pending references, or the
+    references of a project save that failed)."""
+    supabase = get_supabase()
+    if not supabase or not ref_ids: return
+    try:
+        supabase.table(RESUME_BLOB_REFS_TABLE).delete().in_("resume_id", list(ref_ids)).execute()
+    except Exception as e:
+        print(f"Warning: Failed to drop blob references: {e}")
+
+def release_resume_blobs(resumes):
+    """Drops the references held by deleted resumes, then removes every blob left without
+    references (plus legacy per-upload paths) in a single batched remove() call."""
+    supabase = get_supabase()
+    if not supabase or not resumes: return
+    resume_ids = [r.get('id') for r in resumes if r.get('id')]
+    digests = {r['blob_hash'] for r in resumes if r.get('blob_hash')}
+    legacy_paths = [r['storage_path'] for r in resumes if r.get('storage_path') and not r.get('blob_hash')]
+    try:
+        with _blob_lock:
+            if resume_ids:
+                supabase.table(RESUME_BLOB_REFS_TABLE).delete().in_("resume_id", resume_ids).execute()
+            orphaned = set()
+            if digests:
+                response = supabase.table(RESUME_BLOB_REFS_TABLE).select("blob_hash").in_("blob_hash", list(digests)).execute()
+                orphaned = digests - {row['blob_hash'] for row in (response.data or [])}
+            paths = [blob_path(d) for d in orphaned] + legacy_paths
+            if paths:
+                supabase.storage.from_(SUPABASE_BUCKET_NAME).remove(paths)
+                for path in paths:
+                    _signed_url_cache.pop(path, None)
+    except Exception as e:
+        print(f"Warning: Failed to release resume blobs: {e}")
+
+def signed_resume_url(storage_path):
+    """Short-lived download URL, cached until 80% of its TTL has passed."""
+    now = time.time()
+    with _blob_lock:
+        cached = _signed_url_cache.get(storage_path)
+        if cached and cached[1] > now:
+            return cached[0]
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        response = supabase.storage.from_(SUPABASE_BUCKET_NAME).create_signed_url(storage_path, SIGNED_URL_TTL_SECONDS)
+    except Exception as e:
+        print(f"Supabase Storage signed URL failed for {storage_path}: {e}")
+        return None
+    url = response.get('signedURL') or response.get('signedUrl')
+    if url:
+        with _blob_lock:
+            if len(_signed_url_cache) > 1024:
+                for path in [p for p, (_, expires) in _signed_url_cache.items() if expires <= now]:
+                    del _signed_url_cache[path]
+            _signed_url_cache[storage_path] = (url, now + SIGNED_URL_TTL_SECONDS * 0.8)
+    return url
+
+# -------------------- Resumable ingestion --------------------
+# Upload and Gmail fetch requests that carry an Idempotency-Key header are tracked as a
+# batch of items, each moving through INGESTION_STAGES. The batch is checkpointed after the
+# stages that cost something (storage upload, LLM evaluation), so a retry with the same key
+# resumes where the last attempt stopped and a finished request is answered from the stored
+# response. Requests without a key run the same pipeline without checkpoints.
+# Table 'ingestion_batches' columns: id (PK, text), project_id (text), status (text),
+# fingerprint (text), items (text), response (text), error (text), created_at (text), updated_at (text)
+INGESTION_TABLE = "ingestion_batches"
+INGESTION_STAGES = ['downloaded', 'extracted', 'stored', 'evaluated', 'committed']
+
+def request_fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def iso_age_seconds(value):
+    try:
+        return (datetime.now(UTC) - datetime.fromisoformat(value.replace('Z', '+00:00'))).total_seconds()
+    except Exception:
+        return float('inf')
+
+def load_ingestion_batch(batch_id):
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        response = supabase.table(INGESTION_TABLE).select("*").eq("id", batch_id).execute()
+        if not response.data:
+            return None
+        batch = dict(response.data[0])
+        batch['items'] = decode_resume_detail(batch.get('items')) or {}
+        batch['response'] = decode_resume_detail(batch.get('response')) if batch.get('response') else None
+        return batch
+    except Exception as e:
+        print(f"Supabase failed to load ingestion batch {batch_id}: {e}")
+        return None
+
+def save_ingestion_batch(batch, create=False):
+    """Checkpoints a batch. With create=True the row must not exist yet (claims the key)."""
+    if not batch.get('id'):
+        return True
+    supabase = get_supabase()
+    if not supabase: return False
+    batch['updated_at'] = datetime.utcnow().isoformat() + 'Z'
+    row = {
+        **batch,
+        'items': encode_resume_detail(batch['items']),
+        'response': encode_resume_detail(batch['response']) if batch.get('response') else None
+    }
+    try:
+        table = supabase.table(INGESTION_TABLE)
+        (table.insert(row) if create else table.upsert(row, on_conflict="id")).execute()
+        return True
+    except Exception as e:
+        if not create:
+            print(f"Supabase failed to checkpoint ingestion batch {batch['id']}: {e}")
+        return False
+
+def begin_ingestion(scope, project_id, fingerprint):
+    """Returns (batch, early_response). `early_response` is set when the request must not
+    run: a finished batch with the same key (replayed), a batch still running within its
+    lease (409), or a key reused for a different payload (422)."""
+    now = datetime.utcnow().isoformat() + 'Z'
+    batch = {'id': None, 'project_id': project_id, 'status': 'running', 'fingerprint': fingerprint,
+             'items': {}, 'response': None, 'error': None, 'created_at': now, 'updated_at': now}
+    key = (request.headers.get('Idempotency-Key') or '').strip()
+    if not key:
+        return batch, None
+    if len(key) > 200:
+        return batch, (jsonify({'error': 'Idempotency-Key must be at most 200 characters'}), 400)
+
+    batch_id = f"{scope}:{request_owner()}:{key}"
+    existing = load_ingestion_batch(batch_id)
+    if existing and iso_age_seconds(existing.get('created_at')) > INGESTION_TTL_SECONDS:
+        existing = None
+    if existing is None:
+        batch['id'] = batch_id
+        if save_ingestion_batch(batch, create=True):
+            return batch, None
+        existing = load_ingestion_batch(batch_id)
+        if existing is None:
+            return batch, (jsonify({'error': 'Could not record the ingestion batch'}), 500)
+
+    if existing.get('fingerprint') != fingerprint:
+        return existing, (jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422)
+    if existing.get('status') == 'completed' and existing.get('response'):
+        stored = existing['response']
+        response = jsonify(stored['body'])
+        response.status_code = stored.get('status', 200)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return existing, response
+    if existing.get('status') == 'running' and iso_age_seconds(existing.get('updated_at')) < INGESTION_LEASE_SECONDS:
+        response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '5'
+        return existing, response
+    existing['status'] = 'running'
+    existing['error'] = None
+    save_ingestion_batch(existing)
+    return existing, None
+
+def item_reached(batch, key, stage):
+    item = batch['items'].get(key)
+    return bool(item) and INGESTION_STAGES.index(item['state']) >= INGESTION_STAGES.index(stage)
+
+def advance_item(batch, key, stage, **fields):
+    item = batch['items'].setdefault(key, {})
+    item.update(fields)
+    item['state'] = stage
+    return item
+
+def reserve_item_blobs(batch, keyed_digests):
+    """Pins the blobs of [(item key, hash)] with pending references held by this batch until
+    it finishes. Requests without an Idempotency-Key use a per-request holder id."""
+    holder = batch.get('id') or batch.setdefault('holder', f"local:{uuid.uuid4()}")
+    for key, digest in keyed_digests:
+        batch['items'][key]['blob_hash'] = digest
+    reserve_blobs(holder, batch.get('project_id'), sorted({digest for _, digest in keyed_digests}))
+
+def release_item_blobs(batch):
+    holder = batch.get('id') or batch.get('holder')
+    digests = {item['blob_hash'] for item in batch['items'].values() if item.get('blob_hash')}
+    if holder and digests:
+        drop_blob_refs([f"pending:{holder}:{digest}" for digest in digests])
+
+def finish_ingestion(batch, body, status=200):
+    batch['status'] = 'completed'
+    batch['response'] = {'body': body, 'status': status}
+    save_ingestion_batch(batch)
+    release_item_blobs(batch)
+    return jsonify(body), status
+
+def fail_ingestion(batch, error):
+    batch['status'] = 'failed'
+    batch['error'] = str(error)
+    save_ingestion_batch(batch)
+    if not batch.get('id'):
+        # Nothing can resume a request without a key; keyed batches keep their blobs pinned
+        release_item_blobs(batch)
+
+def load_item_text(item):
+    """Re-extracts the text of an item that already reached 'stored' from its blob."""
+    supabase = get_supabase()
+    if not supabase or not item.get('storage_path'): return None
+    try:
+        data = supabase.storage.from_(SUPABASE_BUCKET_NAME).download(item['storage_path'])
+    except Exception as e:
+        print(f"Supabase Storage download failed for {item['storage_path']}: {e}")
+        return None
+    return extract_text_from_pdf_bytes(data)
+
+# -------------------- Orphan blob sweeper --------------------
+def select_all_rows(table, columns, page_size=1000):
+    """Reads a whole table through PostgREST's row limit, one range() page at a time."""
+    supabase = get_supabase()
+    rows, start = [], 0
+    while True:
+        page = supabase.table(table).select(columns).range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+def list_blob_objects(page_size=1000):
+    """Yields (path, created_at) for every object under BLOB_PREFIX/<shard>/."""
+    bucket = get_supabase().storage.from_(SUPABASE_BUCKET_NAME)
+
+    def entries(folder):
+        offset = 0
+        while True:
+            page = bucket.list(folder, {"limit": page_size, "offset": offset}) or []
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    for shard in entries(BLOB_PREFIX):
+        if shard.get('id') is not None:
+            continue
+        for obj in entries(f"{BLOB_PREFIX}/{shard['name']}"):
+            if obj.get('id') is not None:
+                yield f"{BLOB_PREFIX}/{shard['name']}/{obj['name']}", obj.get('created_at')
+
+def ingestion_blob_state():
+    """(hashes of blobs that unexpired, unfinished batches still point to, expired batch ids)."""
+    in_flight, expired_batches = set(), []
+    for row in select_all_rows(INGESTION_TABLE, "id, status, items, created_at"):
+        if iso_age_seconds(row.get('created_at')) > INGESTION_TTL_SECONDS:
+            expired_batches.append(row['id'])
+        elif row.get('status') != 'completed':
+            for item in (decode_resume_detail(row.get('items')) or {}).values():
+                if item.get('blob_hash') and item.get('state') != 'committed':
+                    in_flight.add(item['blob_hash'])
+    return in_flight, expired_batches
+
+def stale_pending_ref(row):
+    """A pending reference outlives its request only if that request died; after the batch
+    TTL nothing can resume it."""
+    return row['resume_id'].startswith('pending:') and iso_age_seconds(row.get('created_at')) > INGESTION_TTL_SECONDS
+
+def sweep_orphan_blobs(dry_run=False):
+    """Removes blobs that no resume or pending reference holds and no unfinished ingestion
+    batch still points to, once they are older than BLOB_ORPHAN_GRACE_SECONDS. Expired
+    ingestion batches and stale pending references are deleted in the same pass."""
+    supabase = get_supabase()
+    if not supabase:
+        raise RuntimeError("Supabase client is not initialized")
+    refs = select_all_rows(RESUME_BLOB_REFS_TABLE, "resume_id, blob_hash, created_at")
+    stale_refs = [row['resume_id'] for row in refs if stale_pending_ref(row)]
+    referenced = {row['blob_hash'] for row in refs if not stale_pending_ref(row)}
+    in_flight, expired_batches = ingestion_blob_state()
+
+    scanned, candidates = 0, {}
+    for path, created_at in list_blob_objects():
+        scanned += 1
+        digest = path.rsplit('/', 1)[-1].split('.', 1)[0]
+        if digest not in referenced and digest not in in_flight and iso_age_seconds(created_at) > BLOB_ORPHAN_GRACE_SECONDS:
+            candidates[digest] = path
+
+    removed = []
+    with _blob_lock:
+        # Re-check right before removing: a batch may have started, or a reference been
+        # added, while the bucket was being listed
+        in_flight = ingestion_blob_state()[0]
+        digests = [d for d in candidates if d not in in_flight]
+        for i in range(0, len(digests), 100):
+            chunk = digests[i:i + 100]
+            still = supabase.table(RESUME_BLOB_REFS_TABLE).select("resume_id, blob_hash, created_at").in_("blob_hash", chunk).execute().data or []
+            held = {r['blob_hash'] for r in still if not stale_pending_ref(r)}
+            paths = [candidates[d] for d in chunk if d not in held]
+            if paths and not dry_run:
+                supabase.storage.from_(SUPABASE_BUCKET_NAME).remove(paths)
+                for path in paths:
+                    _signed_url_cache.pop(path, None)
+            removed.extend(paths)
+    if not dry_run:
+        drop_blob_refs(stale_refs)
+        if expired_batches:
+            supabase.table(INGESTION_TABLE).delete().in_("id", expired_batches).execute()
+    return {'scanned': scanned, 'removed': removed, 'expired_batches': len(expired_batches),
+            'stale_pending_refs': len(stale_refs), 'dry_run': dry_run}
+
+def touch_project(project):
+    """Bumps the project's version; call on every change so its ETag changes too."""
+    project['version'] = int(project.get('version') or 0) + 1
+    project['updated_at'] = datetime.utcnow().isoformat() + 'Z'
+    return project
+
+def project_etag(project):
+    return f"{project.get('id')}.v{project.get('version', 0)}.s{project.get('schema_version', 1)}"
+
+# -------------------- Compact resume records --------------------
+# A project stores a small "index" record per resume (identity, contact, scores, hashes,
+# storage_path). The bulky LLM sections live in RESUME_DETAILS_TABLE as one zstd-compressed
+# JSON document per resume and are loaded on demand; `top_resumes` holds resume ids only.
+# Table 'resume_details' columns: resume_id (PK, text), project_id (text), detail (text)
+RESUME_DETAILS_TABLE = "resume_details"
+PROJECT_SCHEMA_VERSION = 2
+RESUME_INDEX_SECTION_FIELDS = ['ats_score', 'hr_score', 'matched_keywords', 'resume_hash', 'jd_hash']
+RESUME_DETAIL_SECTION_FIELDS = ['basic_info', 'strengths_weaknesses', 'hr_summary', 'justification',
+                                'recommendation', 'interview_questions', 'llm_route']
+
+def resume_field(resume, key):
+    """Reads a field from either a compact index record or a legacy full record."""
+    if key in resume:
+        return resume[key]
+    return (resume.get('sections') or {}).get(key)
+
+def encode_resume_detail(detail):
+    import zstandard
+    raw = json.dumps(detail, separators=(",", ":")).encode("utf-8")
+    return "zstd:" + base64.b64encode(zstandard.ZstdCompressor(level=9).compress(raw)).decode("ascii")
+
+def decode_resume_detail(blob):
+    if isinstance(blob, dict):
+        return blob
+    if blob and blob.startswith("zstd:"):
+        import zstandard
+        raw = zstandard.ZstdDecompressor().decompress(base64.b64decode(blob[5:]))
+        return json.loads(raw)
+    return json.loads(blob) if blob else {}
+
+def split_resume_record(resume):
+    """Returns (index_record, detail) for a full record, or (record, None) if already compact."""
+    sections = resume.get('sections')
+    if sections is None:
+        return resume, None
+    index_record = {k: v for k, v in resume.items() if k != 'sections'}
+    for key in RESUME_INDEX_SECTION_FIELDS:
+        index_record[key] = sections.get(key, resume.get(key))
+    detail = {k: sections[k] for k in RESUME_DETAIL_SECTION_FIELDS if sections.get(k) not in (None, '')}
+    return index_record, detail
+
+def compact_project(project):
+    """Converts a project to the compact layout in place. Returns the detail documents
+    [(resume_id, project_id, detail)] that still have to be persisted."""
+    details = []
+    resumes = []
+    for r in project.get('resumes', []):
+        index_record, detail = split_resume_record(r)
+        if detail is not None:
+            details.append((index_record.get('id'), project.get('id'), detail))
+        resumes.append(index_record)
+    project['resumes'] = resumes
+    project['top_resumes'] = [t.get('id') if isinstance(t, dict) else t for t in project.get('top_resumes', [])]
+    project['schema_version'] = PROJECT_SCHEMA_VERSION
+    return details
+
+def hydrate_resume(index_record, detail):
+    """Rebuilds the full record (with `sections`) the API has always returned."""
+    if 'sections' in index_record:
+        return index_record
+    sections = dict(detail or {})
+    for key in RESUME_INDEX_SECTION_FIELDS:
+        sections[key] = index_record.get(key)
+    sections['hr_summary_justification'] = (
+        f"**HR Summary:**\n{sections.get('hr_summary', '')}\n\n**Justification:**\n{sections.get('justification', '')}"
+    )
+    sections['ats_json'] = json.dumps([{
+        'name': index_record.get('name'), 'ats_score': sections.get('ats_score'), 'hr_score': sections.get('hr_score')
+    }])
+    record = {k: v for k, v in index_record.items() if k not in RESUME_INDEX_SECTION_FIELDS}
+    record['sections'] = sections
+    return record
+
+def save_resume_details(details):
+    supabase = get_supabase()
+    if not supabase: return False
+    try:
+        rows = [{'resume_id': rid, 'project_id': pid, 'detail': encode_resume_detail(d)} for rid, pid, d in details]
+        supabase.table(RESUME_DETAILS_TABLE).upsert(rows, on_conflict="resume_id").execute()
+        return True
+    except Exception as e:
+        print(f"Supabase failed to save resume details: {e}")
+        return False
+
+def load_resume_detail(resume_id):
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        response = supabase.table(RESUME_DETAILS_TABLE).select("detail").eq("resume_id", resume_id).single().execute()
+        if response.data and response.data.get('detail'):
+            return decode_resume_detail(response.data['detail'])
+        return None
+    except Exception:
+        # single() raises when the row does not exist
+        return None
+
+def load_resume_details(resume_ids):
+    """Batch form of load_resume_detail(): {resume_id: (project_id, detail)} in one query."""
+    supabase = get_supabase()
+    if not supabase or not resume_ids: return {}
+    try:
+        response = supabase.table(RESUME_DETAILS_TABLE).select("resume_id, project_id, detail").in_("resume_id", list(resume_ids)).execute()
+        return {row['resume_id']: (row.get('project_id'), decode_resume_detail(row.get('detail'))) for row in (response.data or [])}
+    except Exception as e:
+        print(f"Supabase failed to load resume details: {e}")
+        return {}
+
+def delete_resume_details(resume_ids):
+    supabase = get_supabase()
+    if not supabase or not resume_ids: return
+    try:
+        supabase.table(RESUME_DETAILS_TABLE).delete().in_("resume_id", list(resume_ids)).execute()
+    except Exception as e:
+        print(f"Supabase failed to delete resume details: {e}")
+
+def resume_ats_score(resume):
+    try:
+        return int(resume_field(resume, 'ats_score') or 0)
+    except Exception:
+        return 0
+
 def keep_top_resumes_for_project(project, top_n=3):
     resumes = project.get('resumes', [])
-    def score(r):
-        try:
-            return int(r.get('sections', {}).get('ats_score') or 0)
-        except Exception:
-            return 0
-    resumes_sorted = sorted(resumes, key=score, reverse=True)
-    project['top_resumes'] = resumes_sorted[:top_n]
+    resumes_sorted = sorted(resumes, key=resume_ats_score, reverse=True)
+    project['top_resumes'] = [r.get('id') for r in resumes_sorted[:top_n]]
     return project
 
 # ==================== GMAIL & RESUME PROCESSING LOGIC ====================
-def get_llm():
-    """Initializes and returns the Groq LLM instance."""
+_llms = {}
+_llm_lock = threading.Lock()
+_llm_slots = {}
+
+def get_llm(model_name=None):
+    """Returns the shared Groq LLM instance for `model_name`, creating it on first use."""
+    model_name = model_name or LLM_FAST_MODEL
+    llm = _llms.get(model_name)
+    if llm is not None:
+        return llm
+    with _llm_lock:
+        if model_name not in _llms:
+            try:
+                from langchain_groq import ChatGroq
+                _llms[model_name] = ChatGroq(
+                    groq_api_key=GROQ_API_KEY,
+                    model_name=model_name,
+                    temperature=LLM_TEMPERATURE
+                )
+            except Exception as e:
+                print(f"Failed to initialize LLM: {str(e)}")
+                return None
+    return _llms[model_name]
+
+def llm_slot(model_name):
+    """Returns the semaphore bounding in-flight requests to `model_name`."""
+    with _llm_lock:
+        if model_name not in _llm_slots:
+            limit = LLM_MODEL_CONCURRENCY.get(model_name, LLM_DEFAULT_CONCURRENCY)
+            _llm_slots[model_name] = threading.BoundedSemaphore(max(1, limit))
+        return _llm_slots[model_name]
+
+# -------------------- Admission control --------------------
+ADMISSION_PRIORITIES = {'chat': 0, 'upload': 1, 'bulk': 2}
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+class PriorityLimiter:
+    """Counting semaphore that hands free slots to the waiter with the lowest priority
+    number first (FIFO within a priority)."""
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def acquire(self, priority, timeout=None):
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not (self._waiters[0] == entry and self.active < self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiters)
+            self.active += 1
+            # The next waiter may fit into a remaining free slot
+            self._cond.notify_all()
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+_llm_limiter = PriorityLimiter(LLM_GLOBAL_CONCURRENCY)
+_admission_state = threading.local()
+_owner_inflight = {}
+_admission_lock = threading.Lock()
+
+@contextmanager
+def llm_admission(kind=None):
+    """Holds one global LLM slot. Defaults to the class of the current request; background
+    threads run as "bulk". Only chat gives up waiting (after LLM_CHAT_QUEUE_TIMEOUT)."""
+    kind = kind or getattr(_admission_state, 'kind', None) or 'bulk'
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    timeout = LLM_CHAT_QUEUE_TIMEOUT if kind == 'chat' else None
+    if not _llm_limiter.acquire(ADMISSION_PRIORITIES[kind], timeout):
+        raise AdmissionRejected("The assistant is busy. Please retry shortly.", ADMISSION_RETRY_AFTER.get(kind, 5))
     try:
-        return ChatGroq(
-            groq_api_key=GROQ_API_KEY,
-            model_name="llama-3.1-8b-instant",
-            temperature=0.18
-        )
+        yield
+    finally:
+        _llm_limiter.release()
+
+def client_address():
+    # Vercel replaces X-Forwarded-For with the real client address; remote_addr is the proxy
+    forwarded = (request.headers.get('X-Forwarded-For') or '').split(',')[0].strip()
+    return forwarded or request.remote_addr or 'unknown'
+
+def request_owner():
+    """The session the admission caps and idempotency keys are scoped to. A request that
+    brought no owner cookie gets one for next time, but is counted against its Google
+    session or client address, so a client that drops cookies cannot dodge the caps."""
+    owner = session.get('owner_id')
+    if owner:
+        return owner
+    session['owner_id'] = str(uuid.uuid4())
+    if session.get('auth_sid'):
+        return f"auth:{auth_session_key(session['auth_sid'])[:16]}"
+    return f"ip:{client_address()}"
+
+def admit(kind, owner=None):
+    """Reserves one in-flight `kind` request for the session, or raises AdmissionRejected.
+    Pass the returned ticket to release_admission() when the work is finished."""
+    if not ADMISSION_ENABLED:
+        return None
+    retry_after = ADMISSION_RETRY_AFTER.get(kind, 5)
+    if kind != 'chat' and _llm_limiter.waiting >= LLM_QUEUE_MAX:
+        raise AdmissionRejected("The server is busy evaluating resumes. Please retry shortly.", retry_after)
+    ticket = (owner or request_owner(), kind)
+    with _admission_lock:
+        if _owner_inflight.get(ticket, 0) >= ADMISSION_OWNER_LIMITS.get(kind, 1):
+            raise AdmissionRejected(f"Too many concurrent {kind} requests for this session.", retry_after)
+        _owner_inflight[ticket] = _owner_inflight.get(ticket, 0) + 1
+    return ticket
+
+def release_admission(ticket):
+    if ticket is None:
+        return
+    with _admission_lock:
+        remaining = _owner_inflight.get(ticket, 0) - 1
+        if remaining > 0:
+            _owner_inflight[ticket] = remaining
+        else:
+            _owner_inflight.pop(ticket, None)
+
+def admission_controlled(kind):
+    """Route decorator: admits the request as `kind` and tags its LLM calls with that class.
+    Streamed responses keep their slot until the stream is closed."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            ticket = admit(kind)
+            _admission_state.kind = kind
+            held_by_stream = False
+            try:
+                response = app.make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    response.call_on_close(lambda: release_admission(ticket))
+                    held_by_stream = True
+                return response
+            finally:
+                _admission_state.kind = None
+                if not held_by_stream:
+                    release_admission(ticket)
+        return wrapper
+    return decorator
+
+def is_rate_limit_error(e):
+    return "rate_limit" in str(e).lower() or "429" in str(e)
+
+def invoke_llm(prompt, model_name=None, max_retries=3):
+    """Invokes the model under its concurrency limit. On 429 switches to the configured
+    fallback model if there is one, otherwise backs off and retries. Raises on failure."""
+    model_name = model_name or LLM_FAST_MODEL
+    for attempt in range(max_retries):
+        llm = get_llm(model_name)
+        if not llm:
+            raise RuntimeError("LLM initialization failed")
+        try:
+            with llm_admission(), llm_slot(model_name):
+                return llm.invoke(prompt)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries - 1:
+                raise
+            fallback = LLM_FALLBACKS.get(model_name)
+            if fallback and fallback != model_name:
+                print(f"Rate limit reached on {model_name}. Falling back to {fallback}...")
+                model_name = fallback
+                continue
+            wait_time = (attempt + 1) * 5
+            print(f"Rate limit reached. Waiting {wait_time} seconds before retry...")
+            time.sleep(wait_time)
+
+def local_fit_score(job_description, matched_keywords):
+    """Percentage of the JD's domain keywords found in the resume, or None if the JD has none."""
+    jd_keywords = {kw for words in keyword_match(job_description or "").values() for kw in words}
+    if not jd_keywords:
+        return None
+    resume_keywords = {kw for words in (matched_keywords or {}).values() for kw in words}
+    return round(100 * len(jd_keywords & resume_keywords) / len(jd_keywords))
+
+def quick_fit_score(job_description, resume_text):
+    """Short fast-model call returning a 0-100 fit score, or None if it fails."""
+    prompt = (
+        "Rate how well this resume fits the job description on a 0-100 scale. "
+        "Reply with the number only.\n"
+        f"Job Description: {(job_description or '')[:2000]}\n"
+        f"Resume: {(resume_text or '')[:3000]}"
+    )
+    try:
+        reply = invoke_llm(prompt, LLM_FAST_MODEL, max_retries=1).content
+        m = re.search(r"\d{1,3}", reply or "")
+        return min(100, int(m.group(0))) if m else None
     except Exception as e:
-        print(f"Failed to initialize LLM: {str(e)}")
+        print(f"Quick fit scoring failed: {e}")
         return None
 
+def route_candidate(job_description, resume_text, matched_keywords):
+    """Decides which model and prompt size evaluates a resume. Returns a small dict that is
+    stored with the resume's sections for later quality review."""
+    if not ROUTER_ENABLED:
+        return {'tier': 'standard', 'model': LLM_FAST_MODEL, 'first_pass_score': None, 'source': 'disabled'}
+    score, source = local_fit_score(job_description, matched_keywords), 'keywords'
+    if score is None and ROUTER_QUICK_SCORE_CALL:
+        score, source = quick_fit_score(job_description, resume_text), 'llm'
+    if score is None:
+        tier, model = 'standard', LLM_FAST_MODEL
+    elif score < ROUTER_QUICK_BELOW:
+        tier, model = 'quick', LLM_FAST_MODEL
+    elif ROUTER_ESCALATE_MIN <= score <= ROUTER_ESCALATE_MAX:
+        tier, model = 'escalate', LLM_STRONG_MODEL
+    else:
+        tier, model = 'standard', LLM_FAST_MODEL
+    return {'tier': tier, 'model': model, 'first_pass_score': score, 'source': source}
+
+def build(*args, **kwargs):
+    """Lazy wrapper around googleapiclient.discovery.build."""
+    from googleapiclient.discovery import build as discovery_build
+    return discovery_build(*args, **kwargs)
+
 def send_email(to_email: str, subject: str, body: str) -> bool:
     """Send a plain-text email. Returns True if successful."""
     try:
@@ -286,8 +1394,129 @@ def is_valid_sender(sender):
     sender_lower = sender.lower()
     return not any(exclude in sender_lower for exclude in EXCLUDE_SENDERS)
 
-def download_resumes_from_gmail(creds, days_filter=30, search_query=""):
-    """Downloads resumes from Gmail as PDF attachments."""
+def decode_mime_header(value):
+    """Decodes RFC 2047 encoded words in a raw (compat32) header value."""
+    if not value:
+        return ""
+    try:
+        return str(email.header.make_header(email.header.decode_header(value)))
+    except Exception:
+        return str(value)
+
+MIME_MAX_DEPTH = 8
+
+def split_mime_headers(raw, start, end):
+    """Returns (header_end, body_start) of the MIME entity raw[start:end]."""
+    for blank in (b"\r\n", b"\n"):
+        if raw.startswith(blank, start):
+            return start, start + len(blank)
+    candidates = [(raw.find(sep, start, end), sep) for sep in (b"\r\n\r\n", b"\n\n")]
+    candidates = [(pos, sep) for pos, sep in candidates if pos != -1]
+    if not candidates:
+        return end, end
+    pos, sep = min(candidates)
+    return pos + len(sep) // 2, pos + len(sep)
+
+def find_mime_boundary(raw, delimiter, start, end):
+    """Finds the next boundary line in raw[start:end]; `start` must be a line start. Returns
+    (position, closing) or (-1, False). As in the stdlib parser, the delimiter only counts
+    when the rest of its line is "--" (closing) and/or spaces and tabs, so a body line that
+    merely begins with the delimiter is not a boundary."""
+    pos = start if raw.startswith(delimiter, start, end) else -1
+    while True:
+        if pos == -1:
+            found = raw.find(b"\n" + delimiter, start, end)
+            if found == -1:
+                return -1, False
+            pos = found + 1
+        after = pos + len(delimiter)
+        line_end = raw.find(b"\n", after, end)
+        rest = raw[after:end if line_end == -1 else line_end].rstrip(b"\r")
+        closing = rest.startswith(b"--")
+        if not (rest[2:] if closing else rest).strip(b" \t"):
+            return pos, closing
+        start, pos = after, -1
+
+def iter_mime_leaves(raw, start, end, headers, body_start, depth=0):
+    """Yields (headers, body_start, body_end) for every leaf part of a raw MIME message.
+    Parts are located with bytes.find on the multipart boundaries and only their header
+    blocks are parsed, so attachment bodies are never copied, split into lines or decoded."""
+    if headers.get_content_type() == 'message/rfc822' and depth < MIME_MAX_DEPTH:
+        # Forwarded mail: descend into the attached message like Message.walk() does
+        header_end, inner_body = split_mime_headers(raw, body_start, end)
+        inner_headers = email.parser.BytesHeaderParser(policy=email.policy.compat32).parsebytes(raw[body_start:header_end])
+        yield from iter_mime_leaves(raw, body_start, end, inner_headers, inner_body, depth + 1)
+        return
+    boundary = headers.get_boundary() if headers.get_content_maintype() == 'multipart' else None
+    if not boundary or depth >= MIME_MAX_DEPTH:
+        yield headers, body_start, end
+        return
+    delimiter = b"--" + boundary.encode("ascii", "surrogateescape")
+    pos, closing = find_mime_boundary(raw, delimiter, body_start, end)
+    while pos != -1 and not closing:
+        line_end = raw.find(b"\n", pos, end)
+        if line_end == -1:
+            return
+        part_start = line_end + 1
+        next_pos, next_closing = find_mime_boundary(raw, delimiter, part_start, end)
+        # The line break before a boundary belongs to the boundary
+        part_end = end if next_pos == -1 else max(part_start, next_pos - 1 - (raw[next_pos - 2:next_pos - 1] == b"\r"))
+        header_end, part_body = split_mime_headers(raw, part_start, part_end)
+        part_headers = email.parser.BytesHeaderParser(policy=email.policy.compat32).parsebytes(raw[part_start:header_end])
+        yield from iter_mime_leaves(raw, part_start, part_end, part_headers, part_body, depth + 1)
+        pos, closing = next_pos, next_closing
+
+def decode_mime_body(headers, body):
+    encoding = (headers.get('Content-Transfer-Encoding') or '').strip().lower()
+    if encoding == 'base64':
+        # Non-alphabet bytes (line breaks) are discarded by the default, non-validating decoder
+        return base64.b64decode(body)
+    if encoding == 'quoted-printable':
+        import binascii
+        return binascii.a2b_qp(body)
+    return body
+
+def parse_resume_message(raw_msg, known_senders=()):
+    """MIME stage of the Gmail scan: returns (sender, subject, [(filename, pdf_bytes)]), or None
+    when the sender is filtered out. Only header blocks are parsed; a part's body is sliced
+    and decoded only when it is a resume PDF (by filename and subject) within
+    GMAIL_MAX_ATTACHMENT_BYTES, so large non-resume attachments cost one boundary search."""
+    if isinstance(raw_msg, str):
+        raw_msg = raw_msg.encode('ASCII')
+    raw_msg = base64.urlsafe_b64decode(raw_msg)
+
+    header_end, body_start = split_mime_headers(raw_msg, 0, len(raw_msg))
+    headers = email.parser.BytesHeaderParser(policy=email.policy.compat32).parsebytes(raw_msg[:header_end])
+    sender = decode_mime_header(headers.get('From', '')).lower()
+    subject = decode_mime_header(headers.get('Subject')) or '(No Subject)'
+    if not is_valid_sender(sender) or sender in known_senders:
+        return None
+
+    attachments = []
+    for part_headers, part_start, part_end in iter_mime_leaves(raw_msg, 0, len(raw_msg), headers, body_start):
+        filename = decode_mime_header(part_headers.get_filename())
+        if not filename.lower().endswith('.pdf') or not is_resume_file(filename, subject):
+            continue
+        size = part_end - part_start
+        if (part_headers.get('Content-Transfer-Encoding') or '').strip().lower() == 'base64':
+            size = size * 3 // 4
+        if size > GMAIL_MAX_ATTACHMENT_BYTES:
+            print(f"Skipping attachment {filename}: larger than {GMAIL_MAX_ATTACHMENT_BYTES} bytes")
+            continue
+        data = decode_mime_body(part_headers, raw_msg[part_start:part_end])
+        if data:
+            attachments.append((filename, data))
+    return sender, subject, attachments
+
+def download_resumes_from_gmail(creds, days_filter=30, search_query="", skip_messages=None):
+    """Downloads resumes from Gmail as PDF attachments. `skip_messages` maps message ids
+    whose attachments are already stored (by a resumed ingestion batch) to their sender.
+
+    Messages are fetched by a small thread pool (googleapiclient services are not thread-safe,
+    so each fetch thread builds its own) and every raw message is handed straight to the MIME
+    pool, so parsing overlaps the remaining fetches. Results are consumed in listing order,
+    which keeps "first message per sender wins" deterministic."""
+    from googleapiclient.errors import HttpError
     try:
         gmail_service = build('gmail', 'v1', credentials=creds)
         timestamp = get_timestamp_days_ago(days_filter)
@@ -299,54 +1528,61 @@ def download_resumes_from_gmail(creds, days_filter=30, search_query=""):
         results = gmail_service.users().messages().list(userId='me', q=query).execute()
         messages = results.get('messages', [])
         downloaded_files = []
-        processed_senders = set()
+        skip_messages = skip_messages or {}
+        processed_senders = set(skip_messages.values())
+        known_senders = frozenset(processed_senders)
         os.makedirs(TEMPORARY_FOLDER, exist_ok=True)
-        
-        for msg in messages[:20]:
-            try:
-                msg_data = gmail_service.users().messages().get(
+
+        wanted = [msg['id'] for msg in messages[:20] if msg['id'] not in skip_messages]
+        if not wanted:
+            return downloaded_files
+        local = threading.local()
+
+        with ThreadPoolExecutor(max_workers=GMAIL_DECODE_WORKERS) as decode_pool, \
+                ThreadPoolExecutor(max_workers=GMAIL_FETCH_CONCURRENCY) as fetch_pool:
+            def fetch_and_queue(message_id):
+                if not hasattr(local, 'service'):
+                    local.service = build('gmail', 'v1', credentials=creds)
+                msg_data = local.service.users().messages().get(
                     userId='me', 
-                    id=msg['id'], 
+                    id=message_id, 
                     format='raw'
                 ).execute()
                 raw_msg = msg_data.get('raw')
                 if not raw_msg:
+                    return None
+                return decode_pool.submit(parse_resume_message, raw_msg, known_senders)
+
+            fetches = [(message_id, fetch_pool.submit(fetch_and_queue, message_id)) for message_id in wanted]
+            for message_id, fetch in fetches:
+                try:
+                    decoding = fetch.result()
+                    parsed = decoding.result() if decoding is not None else None
+                    if parsed is None:
+                        continue
+                    sender, subject, attachments = parsed
+                    if sender in processed_senders:
+                        continue
+                    processed_senders.add(sender)
+
+                    for filename, file_data in attachments:
+                        sender_hash = hash(sender) % 10000
+                        safe_filename = f"{sender_hash}_{filename}"
+                        filepath = os.path.join(TEMPORARY_FOLDER, safe_filename)
+                        if os.path.exists(filepath):
+                            continue
+                        with open(filepath, 'wb') as f:
+                            f.write(file_data)
+                        downloaded_files.append({
+                            'filepath': filepath, 
+                            'sender': sender, 
+                            'subject': subject,
+                            'original_filename': filename,
+                            'message_id': message_id
+                        })
+                except Exception as e:
+                    print(f"Skipping message due to error: {str(e)}")
                     continue
-                if isinstance(raw_msg, str):
-                    raw_msg = raw_msg.encode('ASCII')
-                
-                raw_msg = base64.urlsafe_b64decode(raw_msg)
-                mime_msg = email.message_from_bytes(raw_msg, policy=email.policy.default)
-                
-                sender = mime_msg.get('From', '').lower()
-                subject = mime_msg.get('Subject', '(No Subject)')
-
-                if not is_valid_sender(sender) or sender in processed_senders:
-                    continue
-                processed_senders.add(sender)
-                
-                for part in mime_msg.walk():
-                    filename = part.get_filename()
-                    if filename and filename.lower().endswith('.pdf'):
-                        if is_resume_file(filename, subject):
-                            file_data = part.get_payload(decode=True)
-                            sender_hash = hash(sender) % 10000
-                            safe_filename = f"{sender_hash}_{filename}"
-                            filepath = os.path.join(TEMPORARY_FOLDER, safe_filename)
-                            if os.path.exists(filepath):
-                                continue
-                            with open(filepath, 'wb') as f:
-                                f.write(file_data)
-                            downloaded_files.append({
-                                'filepath': filepath, 
-                                'sender': sender, 
-                                'subject': subject,
-                                'original_filename': filename
-                            })
-                            
-            except Exception as e:
-                print(f"Skipping message due to error: {str(e)}")
-                continue
         return downloaded_files
     except HttpError as e:
         print(f"Google API error: {str(e)}")
@@ -357,6 +1593,7 @@ def download_resumes_from_gmail(creds, days_filter=30, search_query=""):
 
 def extract_text_from_pdf(pdf_path):
     """Extracts text from a PDF file using PyMuPDF."""
+    import fitz  # PyMuPDF
     try:
         doc = fitz.open(pdf_path)
         text = ""
@@ -410,13 +1647,51 @@ def extract_contact_info(text):
             break
     return email_val, phone
 
-def generate_candidate_profile_hr(job_description, resume_text, matched_keywords, name, email, phone):
-    """Generates an HR profile for a candidate using an LLM."""
+def extract_resume_profile(resume_text):
+    """Phase one: extracts JD-independent facts from a resume as a compact dict (None on failure)."""
+    prompt = f"""
+Extract the candidate's facts from the resume below. Return only JSON, no commentary, in exactly this shape:
+{{"name": "", "total_experience_years": 0, "highest_education": "", "most_recent_role": "",
+ "roles": [{{"title": "", "employer": "", "duration": "", "highlights": ["short evidence"]}}],
+ "skills": [""], "projects": [{{"name": "", "summary": "", "technologies": [""]}}],
+ "certifications": [""], "achievements": ["quantified impact where available"]}}
+Keep every string short and factual; copy numbers and names exactly as written.
+Resume Text: {resume_text}
+"""
+    try:
+        reply = invoke_llm(prompt, LLM_FAST_MODEL).content
+        json_match = re.search(r'\{[\s\S]*\}', reply or "")
+        profile = json.loads(json_match.group(0)) if json_match else None
+        return profile if isinstance(profile, dict) else None
+    except Exception as e:
+        print(f"Resume profile extraction failed: {e}")
+        return None
+
+def get_resume_profile(cleaned_text):
+    """Returns (resume_hash, profile), running phase one only for resumes not seen before."""
+    resume_hash = resume_text_hash(cleaned_text)
+    profile = load_resume_profile(resume_hash)
+    if profile is None:
+        profile = extract_resume_profile(cleaned_text)
+        if profile is not None:
+            save_resume_profile(resume_hash, profile)
+    return resume_hash, profile
+
+def generate_candidate_profile_hr(job_description, resume_text, matched_keywords, name, email, phone, route=None, resume_profile=None):
+    """Generates an HR profile for a candidate using an LLM. `route` comes from route_candidate();
+    when `resume_profile` is given it replaces the full resume text in the prompt."""
+    route = route or {'tier': 'standard', 'model': LLM_FAST_MODEL}
+    if resume_profile:
+        evidence_label = "Candidate Profile (structured facts extracted from the resume)"
+        evidence = json.dumps(resume_profile, separators=(",", ":"))
+    else:
+        evidence_label = "Resume Text"
+        evidence = resume_text[:QUICK_RESUME_CHARS] if route.get('tier') == 'quick' else resume_text
     prompt = f"""
 You are a senior HR analyst and technical recruiter. Your job is to analyze the resume evidence deeply and compare it with the job description, providing uniquely detailed, non-repetitive, and actionable HR insights. Use different evidence for each section and avoid repeating sentences or phrasing.
 Inputs:
 Job Description: {job_description}
-Resume Text: {resume_text}
+{evidence_label}: {evidence}
 Matched Keywords: {json.dumps(matched_keywords, indent=2)}
 Candidate Name: {name}
 Candidate Email: {email}
@@ -459,23 +1734,15 @@ Generate 4-5 highly relevant, domain-specific interview questions based on the J
 
 Your output must have these sections clearly separated, each detailed and actionable, with minimal repetition.
 """
-    llm = get_llm()
+    llm = get_llm(route['model'])
     if not llm:
         return "LLM initialization failed"
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = llm.invoke(prompt)
-            return response.content
-        except Exception as e:
-            if "rate_limit" in str(e).lower() or "429" in str(e):
-                wait_time = (attempt + 1) * 5
-                print(f"Rate limit reached. Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-                continue
-            else:
-                return f"Error generating profile: {str(e)}"
-    return "Failed to generate profile after multiple attempts"
+    try:
+        return invoke_llm(prompt, route['model']).content
+    except Exception as e:
+        if is_rate_limit_error(e):
+            return "Failed to generate profile after multiple attempts"
+        return f"Error generating profile: {str(e)}"
 
 def parse_hr_response_sections(response_text):
     """Parses the LLM response text into structured sections."""
@@ -529,9 +1796,610 @@ def style_recommendation_subheadings(recommendation):
     rec_out = re.sub(r"(?<!\*)\s*Additional Future Potential\s*:(?!\*)", "\n\n**Additional Future Potential:**", rec_out, flags=re.IGNORECASE)
     return rec_out
 
+def evaluate_resume(job_description, cleaned_text, candidate_name, candidate_email, candidate_phone,
+                    resume_hash=None, matched_keywords=None):
+    """Runs routing, both evaluation phases and parsing for one resume. Returns the sections
+    dict stored on the resume record, or None if the LLM could not produce a profile.
+
+    `cleaned_text` may be None when re-scoring a stored resume: the cached phase-one profile
+    for `resume_hash` is used instead (None is returned if it is not available)."""
+    resume_profile = None
+    if cleaned_text is None:
+        resume_profile = load_resume_profile(resume_hash) if resume_hash else None
+        if not resume_profile:
+            return None
+    elif TWO_PHASE_ENABLED:
+        resume_hash, resume_profile = get_resume_profile(cleaned_text)
+    resume_text = cleaned_text if cleaned_text is not None else json.dumps(resume_profile)
+    if matched_keywords is None:
+        matched_keywords = keyword_match(resume_text)
+    route = route_candidate(job_description, resume_text, matched_keywords)
+
+    profile = generate_candidate_profile_hr(
+        job_description, resume_text, matched_keywords,
+        candidate_name, candidate_email, candidate_phone,
+        route=route, resume_profile=resume_profile
+    )
+
+    if profile.startswith("Error") or profile.startswith("Failed") or profile == "LLM initialization failed":
+        print(f"Failed to generate profile for {candidate_name}: {profile}")
+        return None
+
+    sections = parse_hr_response_sections(profile)
+    summary, justification = extract_subsections_hr_summary_justification(sections.get("hr_summary_justification", ""))
+    sections["hr_summary"] = summary
+    sections["justification"] = justification
+    sections["recommendation"] = style_recommendation_subheadings(sections.get("recommendation", ""))
+
+    ats_score, hr_score = None, None
+    try:
+        ats_list = json.loads(sections.get("ats_json", "[]"))
+        if ats_list and isinstance(ats_list[0], dict):
+            ats_score = ats_list[0].get("ats_score")
+            hr_score = ats_list[0].get("hr_score")
+    except Exception as e:
+        print(f"Could not parse ATS JSON for {candidate_name}: {e}")
+
+    sections["ats_score"] = ats_score
+    sections["hr_score"] = hr_score
+    sections["llm_route"] = route
+    sections["resume_hash"] = resume_hash
+    sections["matched_keywords"] = matched_keywords
+    sections["jd_hash"] = job_description_hash(job_description)
+    return sections
+
+def job_description_hash(job_description):
+    return hashlib.sha256((job_description or "").strip().encode("utf-8")).hexdigest()
+
+# ==================== BULK RE-EVALUATION ====================
+# POST /projects/<id>/reevaluate re-scores every resume in a project against its (new) job
+# description on a background thread. Resumes already scored against the same JD (matching
+# sections.jd_hash) are skipped, so re-posting after an interruption resumes where it stopped.
+# Progress is kept in memory and persisted on the project as `reevaluation` with every batch.
+REEVAL_CONCURRENCY = int(os.getenv("REEVAL_CONCURRENCY", "4"))
+REEVAL_BATCH_SIZE = int(os.getenv("REEVAL_BATCH_SIZE", "10"))
+
+_reeval_jobs = {}
+_reeval_lock = threading.Lock()
+
+def extract_text_from_pdf_bytes(data):
+    """Extracts text from in-memory PDF bytes using PyMuPDF."""
+    import fitz  # PyMuPDF
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+        text = ""
+        for page in doc:
+            text += page.get_text()
+        return text
+    except Exception as e:
+        print(f"Error reading PDF bytes: {str(e)}")
+        return ""
+
+def reevaluate_resume(resume, job_description):
+    """Re-scores one stored resume. Uses the cached phase-one profile when possible and
+    falls back to downloading and re-extracting the PDF from Supabase Storage."""
+    resume_hash = resume_field(resume, 'resume_hash')
+    matched_keywords = resume_field(resume, 'matched_keywords')
+    name, email_val, phone = resume.get('name', ''), resume.get('email', ''), resume.get('phone', '')
+    if resume_hash and matched_keywords is not None and load_resume_profile(resume_hash):
+        sections = evaluate_resume(job_description, None, name, email_val, phone,
+                                   resume_hash=resume_hash, matched_keywords=matched_keywords)
+        if sections is not None:
+            return sections
+
+    storage_path = resume.get('storage_path')
+    supabase = get_supabase()
+    if not storage_path or not supabase:
+        return None
+    try:
+        data = supabase.storage.from_(SUPABASE_BUCKET_NAME).download(storage_path)
+    except Exception as e:
+        print(f"Supabase Storage download failed for {storage_path}: {e}")
+        return None
+    raw_text = extract_text_from_pdf_bytes(data)
+    if not raw_text:
+        return None
+    return evaluate_resume(job_description, clean_text(raw_text), name, email_val, phone)
+
+def commit_reevaluation_batch(project_id, results, job):
+    """Merges re-scored sections into the latest copy of the project and saves it. The save
+    is conditional on the version that was read, so a resume added by a concurrent upload is
+    never overwritten; on a mismatch the merge is redone on a fresh copy."""
+    with _reeval_lock:
+        for _ in range(PROJECT_SAVE_RETRIES):
+            project = find_project(project_id)
+            if not project:
+                return False
+            read_version = project.get('version')
+            analytics = project_analytics(project)
+            for r in project.get('resumes', []):
+                if r.get('id') in results:
+                    apply_resume_to_analytics(analytics, r, -1)
+                    r['sections'] = results[r['id']]
+                    for key in RESUME_INDEX_SECTION_FIELDS:
+                        # Drop stale compact fields so the new sections win
+                        r.pop(key, None)
+                    apply_resume_to_analytics(analytics, r, 1)
+            project = keep_top_resumes_for_project(project, top_n=3)
+            project.setdefault('stats', {})['top_kept'] = len(project.get('top_resumes', []))
+            project['reevaluation'] = dict(job)
+            if save_project_if_version(touch_project(project), read_version):
+                break
+        else:
+            return False
+        invalidate_comparisons(results.keys())
+    for resume_id, sections in results.items():
+        record_event('reevaluated', project_id, resume_id, ats_score=sections.get('ats_score'),
+                     hr_score=sections.get('hr_score'), jd_hash=sections.get('jd_hash'))
+    return True
+
+def run_reevaluation_job(job, resumes, job_description, force=False, ticket=None):
+    """Background worker: re-scores `resumes` with bounded concurrency, committing in batches.
+    Releases the owner's admission `ticket` when it finishes."""
+    pending = [r for r in resumes if force or resume_field(r, 'jd_hash') != job['jd_hash']]
+    job['skipped'] = len(resumes) - len(pending)
+    batch = {}
+
+    def touch():
+        job['updated_at'] = datetime.utcnow().isoformat() + 'Z'
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, REEVAL_CONCURRENCY)) as pool:
+            futures = {pool.submit(reevaluate_resume, r, job_description): r for r in pending}
+            for future in as_completed(futures):
+                resume = futures[future]
+                try:
+                    sections = future.result()
+                except Exception as e:
+                    print(f"Re-evaluation failed for resume {resume.get('id')}: {e}")
+                    sections = None
+                if sections is None:
+                    job['failed'] += 1
+                else:
+                    batch[resume['id']] = sections
+                    job['done'] += 1
+                touch()
+                if len(batch) >= REEVAL_BATCH_SIZE:
+                    if not commit_reevaluation_batch(job['project_id'], batch, job):
+                        raise RuntimeError("Failed to save re-evaluation batch")
+                    batch = {}
+        job['status'] = 'completed'
+        touch()
+        commit_reevaluation_batch(job['project_id'], batch, job)
+    except Exception as e:
+        print(f"Re-evaluation job {job['id']} failed: {e}")
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        touch()
+        commit_reevaluation_batch(job['project_id'], batch, job)
+    finally:
+        release_admission(ticket)
+
+def get_reevaluation_job(project_id):
+    """Returns the live job for a project, or its last persisted state."""
+    job = _reeval_jobs.get(project_id)
+    if job:
+        return dict(job)
+    project = find_project(project_id)
+    job = (project or {}).get('reevaluation')
+    if job and job.get('status') == 'running':
+        # Persisted as running but no worker in this process: the job was interrupted.
+        job = dict(job, status='interrupted')
+    return job
+
+
+# ==================== GOOGLE CREDENTIAL STORE (Supabase) ====================
+# The session cookie only carries an opaque `auth_sid`. The credentials live in table
+# 'auth_sessions' (id PK text = sha256 of the sid, creds_json text, expiry text, updated_at text)
+# so every worker sees the same, already refreshed, tokens.
+AUTH_SESSIONS_TABLE = "auth_sessions"
+_credential_cache = OrderedDict()  # sid -> (cached_at, Credentials)
+_credential_lock = threading.Lock()
+_refresh_locks = {}
+_token_refresher_started = False
+
+def auth_session_key(sid):
+    """Row id for a sid; the raw sid never reaches the database."""
+    return hashlib.sha256(sid.encode("utf-8")).hexdigest()
+
+def credentials_from_json(creds_json):
+    from google.oauth2.credentials import Credentials
+    return Credentials.from_authorized_user_info(json.loads(creds_json), SCOPES)
+
+def token_expires_in(creds):
+    """Seconds until the access token expires (inf when Google gave no expiry)."""
+    if not creds.expiry:
+        return float('inf')
+    return (creds.expiry - datetime.utcnow()).total_seconds()
+
+def cache_credentials(sid, creds):
+    with _credential_lock:
+        _credential_cache[sid] = (time.time(), creds)
+        _credential_cache.move_to_end(sid)
+        while len(_credential_cache) > CREDENTIAL_CACHE_MAX_ENTRIES:
+            _credential_cache.popitem(last=False)
+
+def fetch_stored_credentials(sid):
+    supabase = get_supabase()
+    if not supabase: return None
+    try:
+        response = supabase.table(AUTH_SESSIONS_TABLE).select("creds_json").eq("id", auth_session_key(sid)).execute()
+    except Exception as e:
+        print(f"Supabase failed to load auth session: {e}")
+        return None
+    if not response.data:
+        return None
+    return credentials_from_json(response.data[0]['creds_json'])
+
+def save_credentials(sid, creds):
+    cache_credentials(sid, creds)
+    supabase = get_supabase()
+    if not supabase: return False
+    try:
+        supabase.table(AUTH_SESSIONS_TABLE).upsert({
+            'id': auth_session_key(sid),
+            'creds_json': creds.to_json(),
+            'expiry': creds.expiry.isoformat() + 'Z' if creds.expiry else None,
+            'updated_at': datetime.utcnow().isoformat() + 'Z'
+        }, on_conflict="id").execute()
+        return True
+    except Exception as e:
+        print(f"Supabase failed to save auth session: {e}")
+        return False
+
+def load_credentials(sid):
+    """Cached credentials for a sid, re-read from the store once the cache entry is stale."""
+    with _credential_lock:
+        hit = _credential_cache.get(sid)
+    if hit and time.time() - hit[0] < CREDENTIAL_CACHE_TTL_SECONDS:
+        return hit[1]
+    creds = fetch_stored_credentials(sid)
+    if creds is None:
+        # Keep serving the cached copy if the store is unreachable or the row was never written
+        return hit[1] if hit else None
+    cache_credentials(sid, creds)
+    return creds
+
+def refresh_credentials(sid, creds, margin=TOKEN_REFRESH_MARGIN_SECONDS):
+    """Refreshes the token unless someone already did. Threads on this instance serialise on
+    a per-sid lock, and the stored row is checked first in case another worker refreshed."""
+    from google.auth.transport.requests import Request
+    with _credential_lock:
+        lock = _refresh_locks.setdefault(sid, threading.Lock())
+    with lock:
+        for current in (load_credentials(sid), fetch_stored_credentials(sid)):
+            if current is not None and current.token and token_expires_in(current) > margin:
+                cache_credentials(sid, current)
+                return current
+        creds.refresh(Request())
+        save_credentials(sid, creds)
+        return creds
+
+def session_credentials():
+    """Returns (creds, None) for the signed-in session, or (None, error_response)."""
+    sid = session.get('auth_sid')
+    if not sid and 'creds' in session:
+        # Sessions from before the store carry the credentials in the cookie; move them over.
+        try:
+            creds = credentials_from_json(session['creds'])
+        except Exception as e:
+            return None, (jsonify({"error": "Invalid stored credentials", "details": str(e)}), 401)
+        sid = secrets.token_urlsafe(32)
+        save_credentials(sid, creds)
+        session.pop('creds')
+        session['auth_sid'] = sid
+    if not sid:
+        return None, (jsonify({"error": "Authentication required"}), 401)
+
+    try:
+        creds = load_credentials(sid)
+    except Exception as e:
+        return None, (jsonify({"error": "Invalid stored credentials", "details": str(e)}), 401)
+    if creds is None:
+        session.pop('auth_sid', None)
+        return None, (jsonify({"error": "Authentication required"}), 401)
+
+    if not creds.token or token_expires_in(creds) <= TOKEN_REFRESH_MARGIN_SECONDS:
+        if not creds.refresh_token:
+            return None, (jsonify({"error": "Authentication token expired or invalid. Please re-authenticate."}), 401)
+        try:
+            creds = refresh_credentials(sid, creds)
+        except Exception as e:
+            return None, (jsonify({"error": "Failed to refresh token", "details": str(e)}), 401)
+    ensure_token_refresher()
+    return creds, None
+
+def refresh_expiring_credentials():
+    """One background pass: refreshes cached sessions whose token expires soon and drops
+    entries that have not been used within the cache TTL."""
+    now = time.time()
+    with _credential_lock:
+        for sid in [sid for sid, (cached_at, _) in _credential_cache.items()
+                    if now - cached_at >= CREDENTIAL_CACHE_TTL_SECONDS]:
+            del _credential_cache[sid]
+            _refresh_locks.pop(sid, None)
+        entries = list(_credential_cache.items())
+    refreshed = 0
+    for sid, (_, creds) in entries:
+        if creds.refresh_token and token_expires_in(creds) <= TOKEN_REFRESH_AHEAD_SECONDS:
+            try:
+                refresh_credentials(sid, creds, margin=TOKEN_REFRESH_AHEAD_SECONDS)
+                refreshed += 1
+            except Exception as e:
+                print(f"Background token refresh failed: {e}")
+    return refreshed
+
+def _token_refresher_loop():
+    while True:
+        time.sleep(TOKEN_REFRESH_INTERVAL_SECONDS)
+        try:
+            refresh_expiring_credentials()
+        except Exception as e:
+            print(f"Token refresher pass failed: {e}")
+
+def ensure_token_refresher():
+    global _token_refresher_started
+    if _token_refresher_started or not TOKEN_REFRESHER_ENABLED:
+        return
+    with _credential_lock:
+        if _token_refresher_started:
+            return
+        _token_refresher_started = True
+    threading.Thread(target=_token_refresher_loop, daemon=True).start()
+
+
+# ==================== WRITE-BEHIND AUDIT LOG (Supabase) ====================
+# Evaluations, deletions and email sends are recorded as events in table 'evaluation_log'
+# (log_id PK text, event, status, project_id, resume_id, actor, detail jsonb, created_at) and
+# counted in table 'usage_counters' (id PK text = "<scope>:<name>", scope, name, value bigint,
+# updated_at). Each event carries the counters it bumps; the SQL function record_audit_events
+# (docs/BLUEPRINT.md) inserts events on log_id and increments counters only for the events it
+# actually inserted, in one transaction, so a replayed batch is never counted twice.
+# Request handlers only append to an in-memory buffer; a background thread writes batches.
+EVALUATION_LOG_TABLE = "evaluation_log"
+USAGE_COUNTERS_TABLE = "usage_counters"
+AUDIT_EVENTS_FUNCTION = "record_audit_events"
+USAGE_COUNTERS_FUNCTION = "increment_usage_counters"  # loose deltas from older spill files
+AUDIT_WRITE_CHUNK = 500
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def audit_row(entry):
+    return {k: v for k, v in entry.items() if k not in ('kind', 'counters')}
+
+def write_audit_batch(events, counters):
+    """Stores one flush. Each chunk of events and their counters is one RPC keyed by log_id,
+    so writing a batch twice, or replaying part of one, changes nothing. `counters` holds
+    only loose deltas replayed from spill files written before events carried their counters."""
+    supabase = get_supabase()
+    if not supabase: return False
+    try:
+        for start in range(0, len(events), AUDIT_WRITE_CHUNK):
+            rows = [{k: v for k, v in e.items() if k != 'kind'} for e in events[start:start + AUDIT_WRITE_CHUNK]]
+            supabase.rpc(AUDIT_EVENTS_FUNCTION, {'events': rows}).execute()
+        if counters:
+            deltas = [{'scope': scope, 'name': name, 'delta': delta} for (scope, name), delta in counters.items() if delta]
+            supabase.rpc(USAGE_COUNTERS_FUNCTION, {'deltas': deltas}).execute()
+        return True
+    except Exception as e:
+        print(f"Supabase failed to write audit batch: {e}")
+        return False
+
+class WriteBehindBuffer:
+    """Accumulates audit events and counter deltas and writes them in batches.
+
+    Each entry is appended to write-behind-<pid>-<boot>.ndjson before add() returns, where
+    <boot> is random per process start, since a restarted container often gets its old pid
+    back. A flush renames that file to an .inflight file and deletes it once the batch is
+    stored; after a failed flush the entries go back to memory and their file is kept. A new
+    process replays every file it did not write whose process is gone, so a crash loses
+    nothing that was added."""
+
+    def __init__(self, spill_dir, max_events, interval):
+        self.spill_dir = spill_dir
+        self.max_events = max_events
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.events = []
+        self.counters = defaultdict(int)  # (scope, name) -> delta
+        self.carried_files = []  # spill files of entries put back after a failed flush
+        self.spill = None
+        self.sequence = 0
+        self.boot = uuid.uuid4().hex[:12]
+        self.started = False
+
+    def spill_path(self, suffix="ndjson"):
+        return os.path.join(self.spill_dir, f"write-behind-{os.getpid()}-{self.boot}.{suffix}")
+
+    def orphaned(self, path):
+        """True for a spill file that no running process will flush: not ours, and either
+        from a previous process with our pid or from a pid that is no longer alive."""
+        owner = os.path.basename(path)[len("write-behind-"):].split(".")[0]
+        pid, _, boot = owner.partition("-")
+        if not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            return boot != self.boot
+        return not process_alive(int(pid))
+
+    def _apply(self, entry):
+        if entry['kind'] == 'counter':
+            self.counters[(entry['scope'], entry['name'])] += entry['delta']
+        else:
+            self.events.append(entry)
+
+    def _spill(self, entry):
+        # Caller holds self.lock
+        try:
+            if self.spill is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self.spill = open(self.spill_path(), "a", encoding="utf-8")
+            self.spill.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.spill.flush()
+        except OSError as e:
+            print(f"Audit spill file write failed: {e}")
+
+    def add(self, *entries):
+        self.start()
+        with self.lock:
+            for entry in entries:
+                self._apply(entry)
+                self._spill(entry)
+            full = len(self.events) >= self.max_events
+        if full:
+            self.wakeup.set()
+
+    def pending(self):
+        """Snapshot of what has not been written yet: (events, counters)."""
+        with self.lock:
+            counters = defaultdict(int, self.counters)
+            for event in self.events:
+                for scope, name in event.get('counters') or []:
+                    counters[(scope, name)] += 1
+            return list(self.events), dict(counters)
+
+    def flush(self):
+        """Writes everything buffered so far. Returns False, keeping the entries, on failure."""
+        with self.flush_lock:
+            with self.lock:
+                if not self.events and not self.counters:
+                    return True
+                events, counters, files = self.events, self.counters, self.carried_files
+                self.events, self.counters, self.carried_files = [], defaultdict(int), []
+                if self.spill is not None:
+                    self.spill.close()
+                    self.spill = None
+                    self.sequence += 1
+                    inflight = self.spill_path(f"{self.sequence}.inflight")
+                    try:
+                        os.replace(self.spill_path(), inflight)
+                        files.append(inflight)
+                    except OSError as e:
+                        print(f"Audit spill file rotation failed: {e}")
+            if write_audit_batch(events, counters):
+                for path in files:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                return True
+            with self.lock:
+                self.events[:0] = events
+                for key, delta in counters.items():
+                    self.counters[key] += delta
+                self.carried_files.extend(files)
+            return False
+
+    def replay_spill_files(self):
+        """Loads the entries spilled by processes that exited without flushing."""
+        replayed = 0
+        for path in glob.glob(os.path.join(self.spill_dir, "write-behind-*")):
+            if not self.orphaned(path):
+                continue
+            # Claim the file first so two new workers cannot both replay it
+            with self.lock:
+                self.sequence += 1
+                claimed = self.spill_path(f"{self.sequence}.replay")
+            try:
+                os.replace(path, claimed)
+                with open(claimed, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            entries = []
+            for line in lines:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    pass  # torn last line from the crash
+            with self.lock:
+                for entry in entries:
+                    self._apply(entry)
+                    self._spill(entry)
+            os.unlink(claimed)
+            replayed += len(entries)
+        if replayed:
+            print(f"Replayed {replayed} audit entries from spill files.")
+        return replayed
+
+    def start(self):
+        if self.started:
+            return
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        self.replay_spill_files()
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                if not self.flush():
+                    time.sleep(self.interval)  # datastore down: don't retry on every add()
+            except Exception as e:
+                print(f"Audit flush failed: {e}")
+
+_audit_buffer = WriteBehindBuffer(AUDIT_SPILL_DIR, AUDIT_FLUSH_MAX_EVENTS, AUDIT_FLUSH_SECONDS)
+
+def record_event(event, project_id=None, resume_id=None, status=None, **detail):
+    """Buffers an audit event and bumps its counters ("<event>" and "<event>:<status>")
+    for the global scope and, if given, the project."""
+    if not AUDIT_LOG_ENABLED:
+        return
+    names = [event] + ([f"{event}:{status}"] if status else [])
+    scopes = ['global'] + ([f"project:{project_id}"] if project_id else [])
+    _audit_buffer.add({
+        'kind': 'event', 'log_id': str(uuid.uuid4()), 'event': event, 'status': status,
+        'project_id': project_id, 'resume_id': resume_id,
+        'actor': session.get('owner_id') if has_request_context() else None,
+        'detail': detail, 'created_at': datetime.utcnow().isoformat() + 'Z',
+        'counters': [[scope, name] for scope in scopes for name in names]
+    })
+
+def load_project_activity(project_id, limit):
+    """Counters and most recent events of a project, including entries not yet flushed."""
+    _audit_buffer.start()
+    scope = f"project:{project_id}"
+    counters = defaultdict(int)
+    # Holding the flush lock keeps a concurrent flush from counting entries both as pending and stored
+    with _audit_buffer.flush_lock:
+        pending_events, pending_counters = _audit_buffer.pending()
+        events = [audit_row(e) for e in pending_events if e.get('project_id') == project_id]
+        supabase = get_supabase()
+        if supabase:
+            try:
+                for row in supabase.table(USAGE_COUNTERS_TABLE).select("name, value").eq("scope", scope).execute().data or []:
+                    counters[row['name']] += row.get('value') or 0
+                stored = (supabase.table(EVALUATION_LOG_TABLE).select("*").eq("project_id", project_id)
+                          .order("created_at", desc=True).limit(limit).execute().data or [])
+                seen = {e['log_id'] for e in events}
+                events.extend(e for e in stored if e.get('log_id') not in seen)
+            except Exception as e:
+                print(f"Supabase failed to load activity for project {project_id}: {e}")
+    for (counter_scope, name), delta in pending_counters.items():
+        if counter_scope == scope:
+            counters[name] += delta
+    events.sort(key=lambda e: e.get('created_at') or '', reverse=True)
+    return dict(counters), events[:limit]
+
+
 # ==================== FLASK ROUTES ====================
 @app.route("/")
 def index():
+    request_owner()  # Issue the owner cookie before the page makes any API call
     try:
         return render_template("index.html")
     except Exception as e:
@@ -540,6 +2408,7 @@ def index():
 @app.route("/authenticate")
 def authenticate():
     """Start OAuth flow using web Flow"""
+    from google_auth_oauthlib.flow import Flow
     flow = Flow.from_client_config(CLIENT_CONFIG, SCOPES)
     flow.redirect_uri = url_for("callback", _external=True)
     authorization_url, state = flow.authorization_url(access_type="offline", include_granted_scopes="true", prompt="consent")
@@ -548,6 +2417,7 @@ def authenticate():
 
 @app.route("/callback")
 def callback():
+    from google_auth_oauthlib.flow import Flow
     state = session.get('oauth_state')
     if not state or state != request.args.get('state'):
         return jsonify({"error": "Authentication state lost."}), 400
@@ -560,8 +2430,10 @@ def callback():
     except Exception as e:
         return jsonify({"error": "Failed to fetch token", "details": str(e)}), 500
 
-    creds = flow.credentials
-    session['creds'] = creds.to_json()
+    sid = secrets.token_urlsafe(32)
+    save_credentials(sid, flow.credentials)
+    session.pop('creds', None)
+    session['auth_sid'] = sid
     return redirect(url_for('auth_success'))
 
 @app.route("/auth_success")
@@ -570,27 +2442,18 @@ def auth_success():
     return render_template("auth_callback.html")
 
 @app.route("/fetch_resumes", methods=["POST"])
+@admission_controlled('bulk')
 def fetch_resumes():
-    if 'creds' not in session:
+    if not session.get('auth_sid') and 'creds' not in session:
         return jsonify({"error": "Authentication required"}), 401
     
+    supabase = get_supabase()
     if not supabase:
         return jsonify({"error": "Database connection failed. Supabase client is not initialized."}), 500
 
-    try:
-        creds = Credentials.from_authorized_user_info(json.loads(session['creds']), SCOPES)
-    except Exception as e:
-        return jsonify({"error": "Invalid stored credentials", "details": str(e)}), 401
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                session['creds'] = creds.to_json()
-            except Exception as e:
-                return jsonify({"error": "Failed to refresh token", "details": str(e)}), 401
-        else:
-            return jsonify({"error": "Authentication token expired or invalid. Please re-authenticate."}), 401
+    creds, auth_error = session_credentials()
+    if auth_error is not None:
+        return auth_error
 
     data = request.json or {}
     job_description = data.get("job_description", "")
@@ -598,25 +2461,38 @@ def fetch_resumes():
     days_filter = int(data.get("days_filter", 30))
     project_id = data.get('project_id')
 
-    downloaded_resumes = download_resumes_from_gmail(creds, days_filter, job_role)
-
-    if not downloaded_resumes:
-        return jsonify({"message": "No new resumes found."})
-
-    candidates = []
-    
     current_project = find_project(project_id) if project_id else None
-    projects = load_projects()
+    batch, early_response = begin_ingestion(
+        'fetch_resumes', project_id, request_fingerprint(job_description, job_role, days_filter, project_id))
+    if early_response is not None:
+        return early_response
+    try:
+        return ingest_gmail_resumes(batch, creds, job_description, job_role, days_filter, current_project)
+    except Exception as e:
+        fail_ingestion(batch, e)
+        raise
+
+def ingest_gmail_resumes(batch, creds, job_description, job_role, days_filter, current_project):
+    """fetch_resumes pipeline. Items are keyed "<message id>:<filename>"; attachments that a
+    previous attempt of the same batch already stored are not downloaded again."""
+    stored_before = {it['message_id']: it.get('sender', '') for it in batch['items'].values()
+                     if INGESTION_STAGES.index(it['state']) >= INGESTION_STAGES.index('stored')}
+    downloaded_resumes = download_resumes_from_gmail(creds, days_filter, job_role, skip_messages=stored_before)
+
+    if not downloaded_resumes and not batch['items']:
+        return finish_ingestion(batch, {"message": "No new resumes found."})
     
-    for i, meta in enumerate(downloaded_resumes):
+    # Read and extract every attachment first so the storage uploads can run as one parallel batch
+    prepared, payloads, texts = [], [], {}
+    for meta in downloaded_resumes:
         filepath = meta.get("filepath")
         if not filepath or not os.path.exists(filepath):
             continue
+        key = f"{meta['message_id']}:{meta.get('original_filename')}"
+        advance_item(batch, key, 'downloaded', message_id=meta['message_id'], sender=meta.get('sender', ''),
+                     subject=meta.get('subject', ''), original_filename=meta.get('original_filename', ''))
 
         raw_text = extract_text_from_pdf(filepath)
-        
-        # --- File Storage Upload Logic (for Gmail fetched files) ---
-        file_data_bytes = None
         try:
             with open(filepath, 'rb') as f:
                 file_data_bytes = f.read()
@@ -630,106 +2506,128 @@ def fetch_resumes():
 
         if not raw_text:
             continue
-
-        # Generate unique path for Supabase Storage
-        file_uuid = str(uuid.uuid4())
-        # Use a generic path if no project is selected
-        storage_path = f"{project_id or 'gmail_fetch'}/{file_uuid}_{meta.get('original_filename')}"
-        
-        try:
-            # Upload file to Supabase Storage
-            supabase.storage.from_(SUPABASE_BUCKET_NAME).upload(
-                file=file_data_bytes,
-                path=storage_path,
-                file_options={"content-type": "application/pdf"}
-            )
-        except Exception as e:
-            print(f"Supabase Storage upload failed for {meta.get('original_filename')}: {e}")
-            continue # Skip this candidate if file upload fails
+        advance_item(batch, key, 'extracted')
+        texts[key] = raw_text
+        prepared.append((key, blob_hash(file_data_bytes)))
+        payloads.append(file_data_bytes)
+
+    reserve_item_blobs(batch, prepared)
+    stored_paths = store_blobs(payloads)
+    del payloads
+    for key, file_digest in prepared:
+        storage_path = stored_paths.get(file_digest)
+        if storage_path: # Items whose upload failed stay 'extracted' and are retried next time
+            advance_item(batch, key, 'stored', blob_hash=file_digest, storage_path=storage_path)
+    save_ingestion_batch(batch)
+
+    for key, item in batch['items'].items():
+        if item['state'] != 'stored':
+            continue
+        raw_text = texts.get(key) or load_item_text(item)
+        if not raw_text:
+            continue
 
         cleaned_text = clean_text(raw_text)
-        matched_keywords = keyword_match(cleaned_text)
         # Use meta data to reconstruct candidate name, as filepath is deleted
-        candidate_name = extract_candidate_name(meta.get("original_filename")) 
+        candidate_name = extract_candidate_name(item.get("original_filename")) 
         if not candidate_name or 'unknown' in candidate_name.lower():
             first_line = cleaned_text.splitlines()[0].strip() if cleaned_text else ""
             if first_line and len(first_line) < 60:
                 candidate_name = first_line
             else:
-                candidate_name = os.path.splitext(meta.get('original_filename', 'Unknown'))[0]
+                candidate_name = os.path.splitext(item.get('original_filename') or 'Unknown')[0]
 
-        email_from_sender = parse_email_from_sender(meta.get("sender", ""))
+        email_from_sender = parse_email_from_sender(item.get("sender", ""))
         email_from_text, phone_from_text = extract_contact_info(cleaned_text)
         candidate_email = email_from_sender or email_from_text
         candidate_phone = phone_from_text
 
-        profile = generate_candidate_profile_hr(
-            job_description, cleaned_text, matched_keywords,
-            candidate_name, candidate_email, candidate_phone
-        )
-
-        if profile.startswith("Error") or profile.startswith("Failed") or profile == "LLM initialization failed":
-            print(f"Failed to generate profile for {candidate_name}: {profile}")
+        sections = evaluate_resume(job_description, cleaned_text, candidate_name, candidate_email, candidate_phone)
+        if sections is None:
             continue
 
-        sections = parse_hr_response_sections(profile)
-        summary, justification = extract_subsections_hr_summary_justification(sections.get("hr_summary_justification", ""))
-        sections["hr_summary"] = summary
-        sections["justification"] = justification
-        sections["recommendation"] = style_recommendation_subheadings(sections.get("recommendation", ""))
-
-        ats_score, hr_score = None, None
-        try:
-            ats_list = json.loads(sections.get("ats_json", "[]"))
-            if ats_list and isinstance(ats_list[0], dict):
-                ats_score = ats_list[0].get("ats_score")
-                hr_score = ats_list[0].get("hr_score")
-        except Exception as e:
-            print(f"Could not parse ATS JSON for {candidate_name}: {e}")
-
-        sections["ats_score"] = ats_score
-        sections["hr_score"] = hr_score
-
         candidate_data = {
+            "id": str(int(time.time() * 1000)) + str(random.randint(10,99)),
             "name": candidate_name, "email": candidate_email, "phone": candidate_phone,
-            "filename": meta.get("original_filename", ""), "sender": meta.get("sender", ""),
-            "subject": meta.get("subject", ""), "sections": sections,
-            "storage_path": storage_path # New field to store Supabase Storage path
+            "filename": item.get("original_filename", ""), "sender": item.get("sender", ""),
+            "subject": item.get("subject", ""), "sections": sections,
+            "storage_path": item['storage_path'], "blob_hash": item['blob_hash'],
+            "uploaded_at": datetime.utcnow().isoformat() + 'Z'
         }
-        candidates.append(candidate_data)
+        # Checkpoint after every LLM evaluation: a retry never pays for it twice
+        advance_item(batch, key, 'evaluated', candidate=candidate_data)
+        save_ingestion_batch(batch)
 
+    candidates = [it['candidate'] for it in batch['items'].values() if it.get('candidate')]
     saved_project = None
-    if current_project and candidates:
-        # Update the project object in the 'projects' list
-        for p in projects:
-            if p.get('id') == project_id:
-                for c in candidates:
-                    p.setdefault('resumes', []).append({
-                        'id': str(int(time.time() * 1000)) + str(random.randint(10,99)),
-                        **c, 'uploaded_at': datetime.utcnow().isoformat() + 'Z'
-                    })
-                    p['stats']['total_uploaded'] = p['stats'].get('total_uploaded', 0) + 1
-                p = keep_top_resumes_for_project(p, top_n=3)
-                p['stats']['top_kept'] = len(p.get('top_resumes', []))
-                saved_project = p
-                break
-        
-        if saved_project:
-            save_projects(projects)
+    if current_project:
+        saved_project = commit_ingested_items(batch, current_project['id'])
+        if saved_project is None:
+            fail_ingestion(batch, 'Failed to save project')
+            return jsonify({'error': 'Failed to save project data to database. Retry with the same Idempotency-Key to resume.',
+                            'candidates': candidates}), 500
+    else:
+        for item in batch['items'].values():
+            if item['state'] == 'evaluated':
+                item['state'] = 'committed'
 
     resp = {'candidates': candidates}
     if saved_project:
         resp['project'] = saved_project
-    return jsonify(resp)
+    return finish_ingestion(batch, resp)
+
+def commit_ingested_items(batch, project_id):
+    """Adds every evaluated, uncommitted item to the project and saves it with a version
+    check. Items whose id is already in the project (saved by an attempt that died before its
+    checkpoint) are only marked committed. Every item gets its blob reference before the
+    save, so a retry after a save that did land still leaves its blobs referenced. Returns
+    the saved project, or None if it could not be saved."""
+    pending = [item for item in batch['items'].values() if item['state'] == 'evaluated']
+    if pending and not add_blob_refs([(it['candidate']['id'], it['candidate']['blob_hash'], project_id) for it in pending]):
+        return None
+    for _ in range(PROJECT_SAVE_RETRIES):
+        project = find_project(project_id)
+        if not project:
+            return None
+        if not pending:
+            return project
+        read_version = project.get('version')
+        existing_ids = {r.get('id') for r in project.get('resumes', [])}
+        added = [it for it in pending if it['candidate']['id'] not in existing_ids]
+        if not added:
+            break
+        for item in added:
+            add_resume_to_project(project, dict(item['candidate']))
+        project = keep_top_resumes_for_project(project, top_n=3)
+        project['stats']['top_kept'] = len(project.get('top_resumes', []))
+        if save_project_if_version(touch_project(project), read_version):
+            break
+    else:
+        # Roll back only the references of resumes the stored project really lacks; the
+        # batch's pending references keep the blobs for a retry
+        stored = find_project(project_id)
+        if stored is not None:
+            held = {r.get('id') for r in stored.get('resumes', [])}
+            drop_blob_refs([it['candidate']['id'] for it in pending if it['candidate']['id'] not in held])
+        return None
+    for item in pending:
+        item['state'] = 'committed'
+    for item in added:
+        candidate = item['candidate']
+        record_event('evaluated', project_id, candidate['id'], status='gmail' if item.get('message_id') else 'upload',
+                     ats_score=resume_field(candidate, 'ats_score'), hr_score=resume_field(candidate, 'hr_score'))
+    return project
 
 # -------------------- Project API endpoints --------------------
 @app.route('/projects', methods=['GET'])
 def list_projects():
     projects = load_projects()
-    return jsonify({'projects': projects})
+    etag = hashlib.sha1(",".join(project_etag(p) for p in projects).encode("utf-8")).hexdigest()
+    return json_with_etag({'projects': projects}, etag)
 
 @app.route('/projects', methods=['POST'])
 def create_project():
+    supabase = get_supabase()
     if not supabase:
         return jsonify({"error": "Database connection failed."}), 500
         
@@ -742,7 +2640,9 @@ def create_project():
         'owner': data.get('owner') or 'default',
         'created_at': datetime.utcnow().isoformat() + 'Z',
         'resumes': [], 'top_resumes': [],
-        'stats': {'total_uploaded': 0, 'top_kept': 0}
+        'stats': {'total_uploaded': 0, 'top_kept': 0},
+        'analytics': empty_analytics(),
+        'version': 1, 'updated_at': datetime.utcnow().isoformat() + 'Z'
     }
     
     try:
@@ -764,110 +2664,107 @@ def get_project(project_id):
     project = find_project(project_id)
     if not project:
         return jsonify({'error': 'Project not found'}), 404
-    return jsonify({'project': project})
-
-# --- NEW: Standalone Resume Upload Route (Called by frontend when no project is selected) ---
-@app.route('/upload_resume', methods=['POST'])
-def upload_resume_standalone():
-    if not supabase:
-        return jsonify({'error': 'Database connection failed.'}), 500
-
-    if 'resume' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    file = request.files['resume']
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
-
-    # Ensure job_description is retrieved from form data
-    job_description = request.form.get('job_description', '')
-    if not job_description:
-        return jsonify({'error': 'Job description is required for analysis.'}), 400
-
-    filename = secure_filename(file.filename)
-    
-    # --- Step 1: Save temporarily for text extraction ---
-    filepath = os.path.join(TEMPORARY_FOLDER, filename)
-    os.makedirs(TEMPORARY_FOLDER, exist_ok=True)
-    file.save(filepath)
+    return json_with_etag({'project': project}, project_etag(project))
+
+# -------------------- Upload ingestion --------------------
+def ingest_uploaded_file(batch, filename, file_bytes, job_description):
+    """Single-file pipeline shared by both upload routes; the item key is the file's
+    content hash. Returns (candidate, None) or (None, error_response)."""
+    key = blob_hash(file_bytes)
+    if key not in batch['items']:
+        advance_item(batch, key, 'downloaded', original_filename=filename)
+    item = batch['items'][key]
+    if item_reached(batch, key, 'evaluated'):
+        return item['candidate'], None
+
+    # --- Step 1: Extract text straight from the uploaded bytes ---
+    raw_text = extract_text_from_pdf_bytes(file_bytes)
+    if raw_text and not item_reached(batch, key, 'extracted'):
+        advance_item(batch, key, 'extracted')
+
+    # --- Step 2: Upload to Supabase Storage (content-addressed, reused on retries) ---
+    if not item_reached(batch, key, 'stored'):
+        reserve_item_blobs(batch, [(key, key)])
+        storage_path = upload_blob(file_bytes, key)
+        if not storage_path:
+            return None, (jsonify({'error': 'Failed to store file in Supabase Storage.'}), 500)
+        advance_item(batch, key, 'stored', blob_hash=key, storage_path=storage_path)
+        save_ingestion_batch(batch)
 
-    raw_text = extract_text_from_pdf(filepath)
-    
-    # --- Step 2: Upload to Supabase Storage ---
-    # Since this is a standalone analysis (no project), we save it under a generic path
-    file_data_bytes = None
-    try:
-        with open(filepath, 'rb') as f:
-            file_data_bytes = f.read()
-    except Exception as e:
-        print(f"Error reading local file before Supabase upload: {e}")
-        os.remove(filepath)
-        return jsonify({'error': 'Could not read temporary file for storage upload'}), 500
-        
-    resume_uuid = str(uuid.uuid4())
-    storage_path = f"standalone/{resume_uuid}_{filename}" # Generic standalone path
-    
-    try:
-        supabase.storage.from_(SUPABASE_BUCKET_NAME).upload(
-            file=file_data_bytes,
-            path=storage_path,
-            file_options={"content-type": "application/pdf"}
-        )
-    except Exception as e:
-        os.remove(filepath)
-        print(f"Supabase Storage upload failed for {filename}: {e}")
-        return jsonify({'error': f'Failed to store file in Supabase Storage: {e}'}), 500
-        
-    os.remove(filepath) # Delete temporary local file
-    
     if not raw_text:
-        return jsonify({'error': 'Could not extract text from PDF for analysis.'}), 500
+        # File is saved in storage, but analysis failed.
+        return None, (jsonify({'error': 'Could not extract text from PDF for analysis. File saved to storage.'}), 500)
 
     # --- Step 3: Run AI analysis and prepare metadata ---
     cleaned_text = clean_text(raw_text)
-    matched_keywords = keyword_match(cleaned_text)
-    candidate_name = extract_candidate_name(filepath)
+    candidate_name = extract_candidate_name(filename)
     email_from_text, phone_from_text = extract_contact_info(cleaned_text)
 
-    profile = generate_candidate_profile_hr(
-        job_description, cleaned_text, matched_keywords,
-        candidate_name, email_from_text, phone_from_text
-    )
-
-    if profile.startswith('Error') or profile.startswith('Failed') or profile == 'LLM initialization failed':
-        print(f"Failed to generate profile for {candidate_name}: {profile}")
-        return jsonify({'error': 'Failed to generate AI profile.'}), 500
-
-    sections = parse_hr_response_sections(profile)
-    summary, justification = extract_subsections_hr_summary_justification(sections.get('hr_summary_justification', ''))
-    sections['hr_summary'] = summary
-    sections['justification'] = justification
-    sections['recommendation'] = style_recommendation_subheadings(sections.get('recommendation', ''))
-
-    ats_score, hr_score = None, None
-    try:
-        ats_list = json.loads(sections.get('ats_json', '[]'))
-        if ats_list and isinstance(ats_list[0], dict):
-            ats_score = ats_list[0].get('ats_score')
-            hr_score = ats_list[0].get('hr_score')
-    except Exception as e:
-        print(f"Could not parse ATS JSON for {candidate_name}: {e}")
-
-    sections['ats_score'] = ats_score
-    sections['hr_score'] = hr_score
+    sections = evaluate_resume(job_description, cleaned_text, candidate_name, email_from_text, phone_from_text)
+    if sections is None:
+        return None, (jsonify({'error': 'Failed to generate AI profile.'}), 500)
 
     candidate = {
         'id': str(int(time.time() * 1000)) + str(random.randint(10,99)),
         'name': candidate_name, 'email': email_from_text, 'phone': phone_from_text,
         'filename': filename, 'sections': sections,
         'uploaded_at': datetime.utcnow().isoformat() + 'Z',
-        'storage_path': storage_path # Store the Supabase Storage path
+        'storage_path': item['storage_path'], 'blob_hash': key
     }
+    advance_item(batch, key, 'evaluated', candidate=candidate)
+    save_ingestion_batch(batch)
+    return candidate, None
 
-    # Return the candidate data wrapped in a list for the frontend to handle
-    return jsonify({'candidates': [candidate], 'message': 'Resume analyzed successfully.'})
+def read_uploaded_resume():
+    """Returns (filename, bytes) of the 'resume' form file, or (None, error_response)."""
+    if 'resume' not in request.files:
+        return None, (jsonify({'error': 'No file part'}), 400)
+    file = request.files['resume']
+    if file.filename == '':
+        return None, (jsonify({'error': 'No selected file'}), 400)
+    return secure_filename(file.filename), file.read()
+
+# --- NEW: Standalone Resume Upload Route (Called by frontend when no project is selected) ---
+@app.route('/upload_resume', methods=['POST'])
+@admission_controlled('upload')
+def upload_resume_standalone():
+    supabase = get_supabase()
+    if not supabase:
+        return jsonify({'error': 'Database connection failed.'}), 500
+
+    filename, file_bytes = read_uploaded_resume()
+    if filename is None:
+        return file_bytes
+
+    # Ensure job_description is retrieved from form data
+    job_description = request.form.get('job_description', '')
+    if not job_description:
+        return jsonify({'error': 'Job description is required for analysis.'}), 400
+
+    # Since this is a standalone analysis (no project), nothing references the stored blob;
+    # the orphan sweeper removes it after BLOB_ORPHAN_GRACE_SECONDS.
+    batch, early_response = begin_ingestion(
+        'upload', None, request_fingerprint(job_description, filename, blob_hash(file_bytes)))
+    if early_response is not None:
+        return early_response
+    try:
+        candidate, error = ingest_uploaded_file(batch, filename, file_bytes, job_description)
+        if error is not None:
+            fail_ingestion(batch, error[0].get_json().get('error'))
+            return error
+        batch['items'][candidate['blob_hash']]['state'] = 'committed'
+        record_event('evaluated', None, candidate['id'], status='upload',
+                     ats_score=resume_field(candidate, 'ats_score'), hr_score=resume_field(candidate, 'hr_score'))
+        # Return the candidate data wrapped in a list for the frontend to handle
+        return finish_ingestion(batch, {'candidates': [candidate], 'message': 'Resume analyzed successfully.'})
+    except Exception as e:
+        fail_ingestion(batch, e)
+        raise
 
 @app.route('/projects/<project_id>/upload_resume', methods=['POST'])
+@admission_controlled('upload')
 def upload_resume_to_project(project_id):
+    supabase = get_supabase()
     if not supabase:
         return jsonify({"error": "Database connection failed."}), 500
         
@@ -875,165 +2772,581 @@ def upload_resume_to_project(project_id):
     if not project:
         return jsonify({'error': 'Project not found'}), 404
 
-    if 'resume' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    file = request.files['resume']
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+    filename, file_bytes = read_uploaded_resume()
+    if filename is None:
+        return file_bytes
 
     job_description = request.form.get('job_description', project.get('description', ''))
     if not job_description:
         return jsonify({'error': 'Job description is required'}), 400
 
-    filename = secure_filename(file.filename)
-    
-    # --- Step 1: Save temporarily for text extraction ---
-    filepath = os.path.join(TEMPORARY_FOLDER, filename)
-    os.makedirs(TEMPORARY_FOLDER, exist_ok=True)
-    file.save(filepath)
-
-    raw_text = extract_text_from_pdf(filepath)
-    
-    # --- Step 2: Upload to Supabase Storage ---
-    file_data_bytes = None
-    try:
-        with open(filepath, 'rb') as f:
-            file_data_bytes = f.read()
-    except Exception as e:
-        print(f"Error reading local file before Supabase upload: {e}")
-        # Clean up local file even if storage fails
-        os.remove(filepath)
-        return jsonify({'error': 'Could not read temporary file for storage upload'}), 500
-        
-    # Generate unique path
-    resume_uuid = str(uuid.uuid4())
-    storage_path = f"{project_id}/{resume_uuid}_{filename}"
-    
+    batch, early_response = begin_ingestion(
+        f'upload:{project_id}', project_id, request_fingerprint(project_id, job_description, filename, blob_hash(file_bytes)))
+    if early_response is not None:
+        return early_response
     try:
-        supabase.storage.from_(SUPABASE_BUCKET_NAME).upload(
-            file=file_data_bytes,
-            path=storage_path,
-            file_options={"content-type": "application/pdf"}
-        )
+        candidate, error = ingest_uploaded_file(batch, filename, file_bytes, job_description)
+        if error is not None:
+            fail_ingestion(batch, error[0].get_json().get('error'))
+            return error
+
+        # --- Step 4: Update project metadata in Supabase Database ---
+        updated_project = commit_ingested_items(batch, project_id)
+        if updated_project is None:
+            fail_ingestion(batch, 'Failed to save project')
+            return jsonify({'error': 'Failed to save project data to database after successful upload.'}), 500
+        return finish_ingestion(batch, {'candidate': candidate, 'project': updated_project})
     except Exception as e:
-        # Clean up local file even if storage fails
-        os.remove(filepath)
-        print(f"Supabase Storage upload failed for {filename}: {e}")
-        return jsonify({'error': f'Failed to store file in Supabase Storage: {e}'}), 500
-        
-    # --- Step 3: Delete temporary local file ---
-    os.remove(filepath) 
+        fail_ingestion(batch, e)
+        raise
 
-    if not raw_text:
-        # File is saved in storage, but analysis failed.
-        return jsonify({'error': 'Could not extract text from PDF for analysis. File saved to storage.'}), 500
 
-    # --- Step 4: Run AI analysis and prepare metadata ---
-    cleaned_text = clean_text(raw_text)
-    matched_keywords = keyword_match(cleaned_text)
-    candidate_name = extract_candidate_name(filepath) # filepath is filename only here
-    email_from_text, phone_from_text = extract_contact_info(cleaned_text)
+# -------------------- Paginated resume listing --------------------
+RESUME_PAGE_DEFAULT = 30
+RESUME_PAGE_MAX = 200
+RESUME_SORT_KEYS = {
+    'score': resume_ats_score,
+    'date': lambda r: r.get('uploaded_at') or '',
+    'name': lambda r: (r.get('name') or '').lower(),
+}
 
-    profile = generate_candidate_profile_hr(
-        job_description, cleaned_text, matched_keywords,
-        candidate_name, email_from_text, phone_from_text
-    )
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, sort):
+    """Decodes a listing cursor to (sort key, resume id). Raises ValueError when the cursor
+    does not have the shape encode_cursor() produces for this sort."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    key_type = int if sort == 'score' else str
+    if (not isinstance(values, list) or len(values) != 2
+            or type(values[0]) is not key_type or not isinstance(values[1], str)):
+        raise ValueError("cursor does not match the sort")
+    return tuple(values)
+
+def filter_resumes(resumes, args):
+    """Applies the listing filters: min_score, max_score, q (name/email/filename), keyword."""
+    min_score = args.get('min_score', type=int)
+    max_score = args.get('max_score', type=int)
+    q = (args.get('q') or '').strip().lower()
+    keyword = (args.get('keyword') or '').strip().lower()
+    out = []
+    for r in resumes:
+        score = resume_ats_score(r)
+        if min_score is not None and score < min_score:
+            continue
+        if max_score is not None and score > max_score:
+            continue
+        if q and not any(q in (r.get(f) or '').lower() for f in ('name', 'email', 'filename')):
+            continue
+        if keyword:
+            keywords = {kw.lower() for words in (r.get('matched_keywords') or {}).values() for kw in words}
+            if keyword not in keywords:
+                continue
+        out.append(r)
+    return out
+
+@app.route('/projects/<project_id>/resumes', methods=['GET'])
+def list_project_resumes(project_id):
+    """Cursor-paginated index records. Query: limit, cursor, sort=score|date|name,
+    order=desc|asc, plus the filters understood by filter_resumes(). Reads only the resume
+    index and version; the index is one jsonb value, so a page still costs O(resumes) to
+    filter and sort, but only `limit` records are sent."""
+    project = find_project_fields(project_id, ['resumes', 'version', 'schema_version'])
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    project['id'] = project_id
 
-    if profile.startswith('Error') or profile.startswith('Failed') or profile == 'LLM initialization failed':
-        print(f"Failed to generate profile for {candidate_name}: {profile}")
-        return jsonify({'error': 'Failed to generate AI profile.'}), 500
+    sort = request.args.get('sort', 'score')
+    if sort not in RESUME_SORT_KEYS:
+        return jsonify({'error': f"Invalid sort. Use one of: {', '.join(RESUME_SORT_KEYS)}"}), 400
+    descending = request.args.get('order', 'desc') != 'asc'
+    limit = max(1, min(request.args.get('limit', RESUME_PAGE_DEFAULT, type=int), RESUME_PAGE_MAX))
 
-    sections = parse_hr_response_sections(profile)
-    summary, justification = extract_subsections_hr_summary_justification(sections.get('hr_summary_justification', ''))
-    sections['hr_summary'] = summary
-    sections['justification'] = justification
-    sections['recommendation'] = style_recommendation_subheadings(sections.get('recommendation', ''))
+    sort_key = RESUME_SORT_KEYS[sort]
+    records = filter_resumes([split_resume_record(r)[0] for r in project.get('resumes') or []], request.args)
+    keyed = sorted(((sort_key(r), r.get('id') or '', r) for r in records), key=lambda t: (t[0], t[1]), reverse=descending)
 
-    ats_score, hr_score = None, None
-    try:
-        ats_list = json.loads(sections.get('ats_json', '[]'))
-        if ats_list and isinstance(ats_list[0], dict):
-            ats_score = ats_list[0].get('ats_score')
-            hr_score = ats_list[0].get('hr_score')
-    except Exception as e:
-        print(f"Could not parse ATS JSON for {candidate_name}: {e}")
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort)
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        keyed = [t for t in keyed if ((t[0], t[1]) < after if descending else (t[0], t[1]) > after)]
+
+    page = keyed[:limit]
+    next_cursor = encode_cursor([page[-1][0], page[-1][1]]) if len(keyed) > limit else None
+    etag = hashlib.sha1(f"{project_etag(project)}?{request.query_string.decode('utf-8')}".encode("utf-8")).hexdigest()
+    return json_with_etag({
+        'resumes': [t[2] for t in page],
+        'next_cursor': next_cursor,
+        'total': len(records)
+    }, etag)
+
+@app.route('/projects/<project_id>/analytics', methods=['GET'])
+def get_project_analytics(project_id):
+    """Dashboard aggregates, served from the maintained counters (no resume scan)."""
+    project = find_project_fields(project_id, ['analytics', 'stats', 'version', 'schema_version'])
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    project['id'] = project_id
+    a = project.get('analytics')
+    if not a or a.get('version') != ANALYTICS_VERSION:
+        # Legacy project: aggregate its index for this response only. A GET never writes;
+        # the aggregates are stored by the next change or POST /admin/compact_projects.
+        project = find_project(project_id)
+        if not project:
+            return jsonify({'error': 'Project not found'}), 404
+        a = project_analytics(project)
+    count = a['count']
+    return json_with_etag({'analytics': {
+        'project_id': project_id,
+        'total_resumes': count,
+        'top_kept': (project.get('stats') or {}).get('top_kept', 0),
+        'average_ats_score': round(a['score_sum'] / count, 1) if count else None,
+        'average_hr_score': round(a['hr_score_sum'] / count, 1) if count else None,
+        'score_histogram': a['score_histogram'],
+        'domain_coverage': a['domain_coverage'],
+        'domain_keywords': a['domain_keywords'],
+        'sender_domains': a['sender_domains'],
+        'intake_per_day': dict(sorted(a['intake_per_day'].items()))
+    }}, f"{project_etag(project)}.analytics")
+
+@app.route('/projects/<project_id>/activity', methods=['GET'])
+def get_project_activity(project_id):
+    """Audit trail of a project: event counters and the most recent events (limit, max 200)."""
+    project = find_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    counters, events = load_project_activity(project_id, limit)
+    return jsonify({'activity': {'project_id': project_id, 'counters': counters, 'events': events}})
+
+# -------------------- Streaming export --------------------
+# GET /projects/<id>/export streams the project's resumes EXPORT_CHUNK_SIZE rows at a time, so
+# the response is never built in memory and the header row goes out before any detail lookup.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "200"))
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORT_DEFAULT_COLUMNS = ['name', 'email', 'phone', 'ats_score', 'hr_score', 'matched_keywords', 'uploaded_at']
+# Columns read from the resume_details documents; only loaded (per chunk) when requested.
+EXPORT_DETAIL_COLUMNS = ['recommendation', 'hr_summary']
+EXPORT_COLUMNS = ['id', 'filename', 'sender'] + EXPORT_DEFAULT_COLUMNS + EXPORT_DETAIL_COLUMNS
+
+def export_keywords(resume):
+    """Flattened, de-duplicated matched keywords in domain order."""
+    seen = []
+    for words in (resume_field(resume, 'matched_keywords') or {}).values():
+        seen.extend(w for w in words if w not in seen)
+    return seen
+
+def export_row(resume, detail, columns):
+    row = {}
+    for col in columns:
+        if col == 'matched_keywords':
+            row[col] = export_keywords(resume)
+        elif col in ('ats_score', 'hr_score'):
+            value = resume_field(resume, col)
+            row[col] = int(value) if isinstance(value, (int, float)) or str(value or '').isdigit() else None
+        elif col in EXPORT_DETAIL_COLUMNS:
+            row[col] = (detail or {}).get(col) or (resume.get('sections') or {}).get(col)
+        else:
+            row[col] = resume.get(col)
+    return row
+
+def export_rows(resumes, columns):
+    """Yields lists of rows, one list per chunk; detail documents are fetched per chunk."""
+    need_details = any(col in EXPORT_DETAIL_COLUMNS for col in columns)
+    for start in range(0, len(resumes), EXPORT_CHUNK_SIZE):
+        chunk = resumes[start:start + EXPORT_CHUNK_SIZE]
+        details = load_resume_details([r.get('id') for r in chunk if 'sections' not in r]) if need_details else {}
+        yield [export_row(r, details.get(r.get('id'), (None, None))[1], columns) for r in chunk]
+
+def csv_cell(value):
+    if isinstance(value, list):
+        value = '; '.join(value)
+    value = '' if value is None else str(value)
+    # Spreadsheets evaluate cells starting with these characters as formulas
+    if value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        value = "'" + value
+    return value
+
+def stream_csv(columns, chunks):
+    import csv
+    import io
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in itertools.chain([[]], chunks):
+        for row in rows:
+            writer.writerow([csv_cell(row[c]) for c in columns])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+def stream_ndjson(columns, chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+class _ChunkSink:
+    """Write-only file object that hands what ParquetWriter wrote back to the generator."""
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+def stream_parquet(columns, chunks):
+    """One row group per chunk. Requires pyarrow (optional, not in requirements.txt)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    types = {'ats_score': pa.int32(), 'hr_score': pa.int32(), 'matched_keywords': pa.list_(pa.string())}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for rows in chunks:
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def gzip_stream(parts):
+    """Compresses a byte stream on the fly, flushing after every part so rows keep flowing."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for part in parts:
+        data = compressor.compress(part) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/projects/<project_id>/export', methods=['GET'])
+def export_project_resumes(project_id):
+    """Streams resumes as CSV, NDJSON or Parquet. Query: format, columns (comma separated),
+    sort/order as in list_project_resumes(), plus the filters understood by filter_resumes().
+    The resume index is one jsonb value, so filtering and sorting it is O(resumes) in memory;
+    only the rows and their detail documents are streamed."""
+    project = find_project_fields(project_id, ['title', 'resumes'])
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
 
-    sections['ats_score'] = ats_score
-    sections['hr_score'] = hr_score
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()] or EXPORT_DEFAULT_COLUMNS
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        return jsonify({'error': f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(EXPORT_COLUMNS)}"}), 400
+    sort = request.args.get('sort', 'score')
+    if sort not in RESUME_SORT_KEYS:
+        return jsonify({'error': f"Invalid sort. Use one of: {', '.join(RESUME_SORT_KEYS)}"}), 400
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return jsonify({'error': 'Parquet export is not available on this server (pyarrow is not installed).'}), 501
+
+    resumes = filter_resumes(project.get('resumes') or [], request.args)
+    resumes.sort(key=lambda r: (RESUME_SORT_KEYS[sort](r), r.get('id') or ''),
+                 reverse=request.args.get('order', 'desc') != 'asc')
+    writer = {'csv': stream_csv, 'ndjson': stream_ndjson, 'parquet': stream_parquet}[fmt]
+    body = writer(columns, export_rows(resumes, columns))
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{secure_filename(project.get("title") or "project") or "project"}-resumes.{fmt}"',
+        'X-Total-Count': str(len(resumes)),
+        'Cache-Control': 'no-store',
+    }
+    accepted = {part.split(";")[0].strip().lower() for part in request.headers.get("Accept-Encoding", "").split(",")}
+    if fmt != 'parquet' and 'gzip' in accepted:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+@app.route('/projects/<project_id>/resumes/<resume_id>', methods=['GET'])
+def get_resume_from_project(project_id, resume_id):
+    """Full evaluation record for one resume (index record + detail document)."""
+    project = find_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    resume = next((r for r in project.get('resumes', []) if r.get('id') == resume_id), None)
+    if not resume:
+        return jsonify({'error': 'Resume not found in project'}), 404
+    detail = None if 'sections' in resume else load_resume_detail(resume_id)
+    return json_with_etag({'resume': hydrate_resume(resume, detail)}, f"{project_etag(project)}.{resume_id}")
 
-    candidate = {
-        'id': str(int(time.time() * 1000)) + str(random.randint(10,99)),
-        'name': candidate_name, 'email': email_from_text, 'phone': phone_from_text,
-        'filename': filename, 'sections': sections,
-        'uploaded_at': datetime.utcnow().isoformat() + 'Z',
-        'storage_path': storage_path # Store the Supabase Storage path
+@app.route('/projects/<project_id>/resumes/<resume_id>/file', methods=['GET'])
+def download_resume_file(project_id, resume_id):
+    """Redirects to a short-lived signed URL for the stored PDF."""
+    project = find_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    resume = next((r for r in project.get('resumes', []) if r.get('id') == resume_id), None)
+    if not resume or not resume.get('storage_path'):
+        return jsonify({'error': 'Resume file not found'}), 404
+    url = signed_resume_url(resume['storage_path'])
+    if not url:
+        return jsonify({'error': 'Could not create download link'}), 502
+    return redirect(url)
+
+# -------------------- Candidate comparison --------------------
+# GET /api/compare?ids=a,b[,c...][&project_id=p] aligns stored sections of a few resumes.
+# Results are cached per id set; entries are dropped when one of their resumes is deleted
+# or re-scored on this instance, and expire after COMPARE_CACHE_TTL_SECONDS everywhere else.
+COMPARE_MAX_IDS = int(os.getenv("COMPARE_MAX_IDS", "10"))
+COMPARE_CACHE_TTL_SECONDS = int(os.getenv("COMPARE_CACHE_TTL_SECONDS", "600"))
+COMPARE_CACHE_MAX_ENTRIES = int(os.getenv("COMPARE_CACHE_MAX_ENTRIES", "256"))
+_compare_cache = OrderedDict()
+_compare_lock = threading.Lock()
+
+def invalidate_comparisons(resume_ids):
+    resume_ids = set(resume_ids)
+    with _compare_lock:
+        for key in [k for k in _compare_cache if resume_ids.intersection(k)]:
+            del _compare_cache[key]
+
+def parse_strengths_weaknesses(text):
+    strengths_part, _, weaknesses_part = (text or '').partition('- **Weakness:**')
+    strengths = [s.strip() for s in strengths_part.split('- **Strength:**')[1:] if s.strip()]
+    weaknesses = [w.strip() for w in ('- **Weakness:**' + weaknesses_part).split('- **Weakness:**')[1:] if w.strip()]
+    return strengths, weaknesses
+
+def parse_interview_questions(text):
+    """[{question, match_level, explanation}] from the numbered interview-question block."""
+    questions = []
+    for chunk in re.split(r"(?:^|\n)\s*\d+\.\s+", text or '')[1:]:
+        lines = [line.strip() for line in chunk.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+        level = re.search(r"Match level:\s*\**\s*([A-Za-z ]+)", chunk)
+        explanation = re.search(r"Explanation:\s*\**\s*(.+)", chunk, re.S)
+        question = re.sub(r"^\**\s*Question\s*\**\s*:\s*\**\s*", "", lines[0], flags=re.I)
+        question = re.split(r"\s*\[?\**\s*Match level:", question)[0].strip()
+        questions.append({
+            'question': question,
+            'match_level': level.group(1).strip() if level else None,
+            'explanation': explanation.group(1).strip() if explanation else None
+        })
+    return questions
+
+def build_comparison(records):
+    """Aligned comparison of hydrated resume records, ranked by ATS score."""
+    records = sorted(records, key=resume_ats_score, reverse=True)
+    candidates, keyword_sets, strengths, weaknesses, questions = [], [], [], [], []
+    keyword_domains = {}
+    for r in records:
+        sections = r.get('sections') or {}
+        candidates.append({
+            'id': r.get('id'), 'name': r.get('name'), 'email': r.get('email'),
+            'filename': r.get('filename'), 'ats_score': sections.get('ats_score'),
+            'hr_score': sections.get('hr_score'), 'recommendation': sections.get('recommendation')
+        })
+        found = set()
+        for domain, words in (sections.get('matched_keywords') or {}).items():
+            for word in words:
+                keyword_domains.setdefault(word, domain)
+                found.add(word)
+        keyword_sets.append(found)
+        s, w = parse_strengths_weaknesses(sections.get('strengths_weaknesses'))
+        strengths.append(s)
+        weaknesses.append(w)
+        questions.append(parse_interview_questions(sections.get('interview_questions')))
+
+    all_keywords = sorted(keyword_domains, key=lambda kw: (-sum(kw in ks for ks in keyword_sets), kw.lower()))
+    shared = set.intersection(*keyword_sets) if keyword_sets else set()
+    match_levels = []
+    for qs in questions:
+        counts = {}
+        for q in qs:
+            level = (q['match_level'] or 'Unknown').title()
+            counts[level] = counts.get(level, 0) + 1
+        match_levels.append(counts)
+
+    return {
+        'candidates': candidates,
+        'scores': {
+            'ats': [c['ats_score'] for c in candidates],
+            'hr': [c['hr_score'] for c in candidates]
+        },
+        'keywords': {
+            'matrix': [{'keyword': kw, 'domain': keyword_domains[kw], 'present': [kw in ks for ks in keyword_sets]}
+                       for kw in all_keywords],
+            'shared': [kw for kw in all_keywords if kw in shared],
+            'unique': [sorted(ks - set.union(*(o for j, o in enumerate(keyword_sets) if j != i)), key=str.lower)
+                       if len(keyword_sets) > 1 else sorted(ks, key=str.lower)
+                       for i, ks in enumerate(keyword_sets)]
+        },
+        'strengths': strengths,
+        'weaknesses': weaknesses,
+        'interview_questions': [
+            {'index': i + 1, 'items': [qs[i] if i < len(qs) else None for qs in questions]}
+            for i in range(max((len(qs) for qs in questions), default=0))
+        ],
+        'match_levels': match_levels
     }
 
-    # --- Step 5: Update project metadata in Supabase Database ---
-    projects = load_projects()
-    updated_project = None
-    for p in projects:
-        if p.get('id') == project_id:
-            p.setdefault('resumes', []).append(candidate)
-            p['stats']['total_uploaded'] = p['stats'].get('total_uploaded', 0) + 1
-            p = keep_top_resumes_for_project(p, top_n=3)
-            p['stats']['top_kept'] = len(p.get('top_resumes', []))
-            updated_project = p
-            break
-    
-    if save_projects(projects):
-        return jsonify({'candidate': candidate, 'project': updated_project})
-    else:
-        return jsonify({'error': 'Failed to save project data to database after successful upload.'}), 500
+@app.route('/api/compare', methods=['GET'])
+def compare_resumes():
+    ids = list(dict.fromkeys(i.strip() for i in request.args.get('ids', '').split(',') if i.strip()))
+    if len(ids) < 2 or len(ids) > COMPARE_MAX_IDS:
+        return jsonify({'error': f'Provide between 2 and {COMPARE_MAX_IDS} resume ids.'}), 400
+    project_id = request.args.get('project_id')
+    key = tuple(sorted(ids))
+
+    with _compare_lock:
+        cached = _compare_cache.get(key)
+        if cached and cached[0] > time.time() and (not project_id or cached[1]['project_id'] == project_id):
+            _compare_cache.move_to_end(key)
+            return jsonify({**cached[1], 'cached': True})
+
+    details = load_resume_details(ids)
+    if not project_id:
+        owners = {pid for pid, _ in details.values() if pid}
+        if len(owners) != 1:
+            return jsonify({'error': 'project_id is required unless all resumes belong to one project.'}), 400
+        project_id = owners.pop()
+    project = find_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
 
+    by_id = {r.get('id'): r for r in project.get('resumes', []) if r.get('id') in key}
+    missing = [i for i in ids if i not in by_id]
+    if missing:
+        return jsonify({'error': 'Resume not found in project', 'missing': missing}), 404
+    records = [hydrate_resume(by_id[i], (details.get(i) or (None, None))[1]) for i in ids]
+
+    payload = {'project_id': project_id, 'ids': list(key), **build_comparison(records)}
+    with _compare_lock:
+        _compare_cache[key] = (time.time() + COMPARE_CACHE_TTL_SECONDS, payload)
+        _compare_cache.move_to_end(key)
+        while len(_compare_cache) > COMPARE_CACHE_MAX_ENTRIES:
+            _compare_cache.popitem(last=False)
+    return jsonify({**payload, 'cached': False})
+
+@app.route('/admin/compact_projects', methods=['POST'])
+def compact_all_projects():
+    """One-off migration: rewrites every project in the compact layout."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    projects = load_projects()
+    legacy = [p for p in projects if p.get('schema_version', 1) < PROJECT_SCHEMA_VERSION]
+    for p in legacy:
+        project_analytics(p)
+        keep_top_resumes_for_project(p, top_n=3)
+        touch_project(p)
+    if legacy and not save_projects(legacy):
+        return jsonify({'error': 'Failed to save compacted projects'}), 500
+    return jsonify({'success': True, 'compacted': len(legacy)})
+
+@app.route('/admin/sweep_blobs', methods=['POST'])
+def sweep_blobs():
+    """Removes resume blobs no project or live ingestion batch refers to; meant for a cron."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    return jsonify({'success': True, **sweep_orphan_blobs(dry_run=dry_run)})
 
 @app.route('/projects/<project_id>/resumes/<resume_id>', methods=['DELETE'])
 def delete_resume_from_project(project_id, resume_id):
+    supabase = get_supabase()
     if not supabase:
         return jsonify({"error": "Database connection failed."}), 500
         
-    projects = load_projects()
-    found = False
-    updated_project = None
-    storage_path_to_delete = None
-    
-    for p in projects:
-        if p.get('id') == project_id:
-            resumes = p.get('resumes', [])
-            
-            # Find the resume to get the storage_path
-            resume_to_delete = next((r for r in resumes if r.get('id') == resume_id), None)
-            if resume_to_delete:
-                storage_path_to_delete = resume_to_delete.get('storage_path')
-
-            new_resumes = [r for r in resumes if r.get('id') != resume_id]
-            
-            if len(new_resumes) != len(resumes):
-                p['resumes'] = new_resumes
-                p = keep_top_resumes_for_project(p, top_n=3)
-                p['stats']['total_uploaded'] = max(0, p['stats'].get('total_uploaded', 0) - 1)
-                p['stats']['top_kept'] = len(p.get('top_resumes', []))
-                found = True
-                updated_project = p
+    # Versioned save, so a concurrent upload or re-evaluation commit is never overwritten
+    for _ in range(PROJECT_SAVE_RETRIES):
+        project = find_project(project_id)
+        # Keep the record so its blob reference can be released
+        resume_to_delete = remove_resume_from_project(project, resume_id) if project else None
+        if not resume_to_delete:
+            return jsonify({'error': 'Resume not found in project'}), 404
+        read_version = project.get('version')
+        project = keep_top_resumes_for_project(project, top_n=3)
+        project['stats']['top_kept'] = len(project.get('top_resumes', []))
+        if save_project_if_version(touch_project(project), read_version):
             break
-            
-    if not found:
-        return jsonify({'error': 'Resume not found in project'}), 404
-        
-    # Update the project metadata in the Supabase Database
-    if save_projects(projects):
-        # Delete file from Supabase Storage (optional, but good practice)
-        if storage_path_to_delete:
-            try:
-                # The remove method takes a list of paths
-                supabase.storage.from_(SUPABASE_BUCKET_NAME).remove([storage_path_to_delete])
-            except Exception as e:
-                print(f"Warning: Failed to delete file from Supabase Storage ({storage_path_to_delete}): {e}")
-                
-        return jsonify({'success': True, 'project': updated_project}), 200
     else:
         return jsonify({'error': 'Failed to update project data in database'}), 500
 
+    delete_resume_details([resume_id])
+    # The PDF is only removed from storage when no other resume still references it
+    release_resume_blobs([resume_to_delete])
+    record_event('deleted', project_id, resume_id, name=resume_to_delete.get('name'))
+    return jsonify({'success': True, 'project': project}), 200
+
+
+@app.route('/projects/<project_id>/reevaluate', methods=['POST'])
+def reevaluate_project(project_id):
+    supabase = get_supabase()
+    if not supabase:
+        return jsonify({"error": "Database connection failed."}), 500
+
+    project = find_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+
+    data = request.json or {}
+    job_description = data.get('job_description') or project.get('description', '')
+    if not job_description:
+        return jsonify({'error': 'Job description is required'}), 400
+
+    # The background job holds the session's bulk slot until it finishes
+    ticket = admit('bulk')
+    with _reeval_lock:
+        running = _reeval_jobs.get(project_id)
+        if running and running.get('status') == 'running':
+            release_admission(ticket)
+            return jsonify({'error': 'Re-evaluation already running', 'job': dict(running)}), 409
+        job = {
+            'id': str(uuid.uuid4()), 'project_id': project_id,
+            'jd_hash': job_description_hash(job_description), 'status': 'running',
+            'total': len(project.get('resumes', [])), 'done': 0, 'skipped': 0, 'failed': 0,
+            'started_at': datetime.utcnow().isoformat() + 'Z', 'updated_at': datetime.utcnow().isoformat() + 'Z'
+        }
+        _reeval_jobs[project_id] = job
+
+    if job_description != project.get('description'):
+        project['description'] = job_description
+    project['reevaluation'] = dict(job)
+    if not save_projects([touch_project(project)]):
+        _reeval_jobs.pop(project_id, None)
+        release_admission(ticket)
+        return jsonify({'error': 'Failed to save project data to database.'}), 500
+
+    threading.Thread(
+        target=run_reevaluation_job,
+        args=(job, project.get('resumes', []), job_description, bool(data.get('force')), ticket),
+        daemon=True
+    ).start()
+    return jsonify({'job': dict(job)}), 202
+
+@app.route('/projects/<project_id>/reevaluate', methods=['GET'])
+def reevaluation_status(project_id):
+    job = get_reevaluation_job(project_id)
+    if not job:
+        return jsonify({'error': 'No re-evaluation job for this project'}), 404
+    return jsonify({'job': job})
 
 @app.route("/send_email", methods=["POST"])
 def send_email_route():
@@ -1055,29 +3368,24 @@ def send_email_route():
     else:
         return jsonify({"success": False, "message": "Invalid email type."}), 400
 
-    if send_email(candidate_email, subject, body):
+    sent = send_email(candidate_email, subject, body)
+    # The ids come from the client; only log them if the resume really is in that project
+    project_id, resume_id = data.get('project_id'), data.get('resume_id')
+    if AUDIT_LOG_ENABLED and project_id:
+        project = find_project_fields(str(project_id), ['resumes'])
+        if not project or resume_id not in {r.get('id') for r in project.get('resumes') or []}:
+            project_id = resume_id = None
+    else:
+        project_id = resume_id = None
+    record_event('email_sent' if sent else 'email_failed', project_id, resume_id,
+                 status=email_type, to=candidate_email, job_title=job_title)
+    if sent:
         return jsonify({"success": True, "message": f"{email_type.capitalize()} email sent successfully!"})
     else:
         return jsonify({"success": False, "message": "Failed to send email."})
 
-@app.route("/chat", methods=["POST"])
-def chat():
-    data = request.json
-    user_message = data.get("message", "")
-    if not user_message:
-        return jsonify({"response": "Please provide a message."})
-
-    session_id = session.get('chat_session_id')
-    if not session_id:
-        session_id = str(uuid.uuid4())
-        session['chat_session_id'] = session_id
-    chat_history = load_chat_history(session_id)
-
-    llm = get_llm()
-    if not llm:
-        return jsonify({"response": "I'm sorry, my AI assistant is currently unavailable."})
-
-    system_prompt = """
+# -------------------- Chat assistant --------------------
+CHAT_SYSTEM_PROMPT = """
     Introlligent Assistant Rules
     Role: Support job seekers & recruiters with concise, structured answers.
     Features: Resume evaluation | Gmail resume fetch | ATS scoring | JD optimization | Networking support.
@@ -1085,10 +3393,12 @@ def chat():
     Constraints: Only Introlligent features | Keep brief & targeted | Prioritize clarity.
     Job Description Prompting: If a user asks for a JD, always ask for: Years of experience, Notice period constraints, Location, Salary range.
     """
-    
+
+def get_scripted_reply(user_message):
+    """Returns the canned reply for the built-in keywords, or None."""
     keyword = user_message.strip().lower()
     if keyword == "help":
-        script = (
+        return (
             "How can I assist you?\n\n"
             "**Resume Fetch & Evaluation Guide:**\n"
             "1. **Enter Job Description:** Be specific about the role, skills, and experience.\n"
@@ -1102,44 +3412,281 @@ def chat():
             "- **JD Optimization:** Get tips to improve your job descriptions."
         )
     elif keyword == "devops team":
-        script = (
+        return (
             "**DevOps Team Support**\n\n"
             "- Manages CI/CD pipelines, automation, and infrastructure monitoring.\n"
             "- Ensures high availability, scalability, and security.\n"
             "- Tools: Jenkins, Docker, Kubernetes, Terraform, Azure DevOps, AWS, GCP."
         )
     elif keyword == "ml team":
-        script = (
+        return (
             "**Machine Learning (ML) Team Support**\n\n"
             "- Builds, trains, and deploys machine learning models.\n"
             "- Handles data preprocessing, feature engineering, and model evaluation.\n"
             "- Tools: Python, TensorFlow, PyTorch, scikit-learn, and cloud ML platforms."
         )
-    else:
-        script = None
+    return None
+
+def get_chat_session_id():
+    session_id = session.get('chat_session_id')
+    if not session_id:
+        session_id = str(uuid.uuid4())
+        session['chat_session_id'] = session_id
+    return session_id
+
+def build_chat_messages(chat_history, user_message):
+    messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
+    for m in chat_history[-18:]:
+        messages.append({"role": m["role"], "content": m["content"]})
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+def save_chat_history_async(session_id, history):
+    """Persists chat history on a background thread so it stays out of the response path."""
+    threading.Thread(target=save_chat_history, args=(session_id, history), daemon=True).start()
+
+def sse_event(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+# -------------------- Chat response cache --------------------
+# First-turn questions (no history) are answered from an in-process cache when a previous
+# question matches: exactly after normalisation, or by cosine similarity of hashed
+# character-trigram vectors. Entries expire after CHAT_CACHE_TTL_SECONDS and the least
+# recently used ones are evicted beyond CHAT_CACHE_MAX_ENTRIES. A similarity hit is only
+# accepted when questions_compatible() finds no difference that changes the answer.
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "1") == "1"
+CHAT_CACHE_TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "500"))
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.9"))
+CHAT_CACHE_DIMENSIONS = 1024
+
+# Words that may be added, dropped or swapped without changing what is being asked
+CHAT_CACHE_STOPWORDS = frozenset(
+    "a an the for of to in on with and or please me my i we can could you your what how is are "
+    "do does some give write tell about need want".split())
+# Words that make two otherwise similar questions different (seniority, counts)
+CHAT_CACHE_PROTECTED_WORDS = frozenset(
+    "junior senior lead principal staff intern internship entry mid head chief associate "
+    "manager director vp fresher trainee one two three four five six seven eight nine ten".split())
+CHAT_CACHE_TYPO_RATIO = 0.8
+
+_chat_cache = OrderedDict()
+_chat_cache_lock = threading.Lock()
+
+def normalize_question(text):
+    text = re.sub(r"[^a-z0-9 ]+", " ", (text or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+def question_vector(normalized):
+    """Sparse, L2-normalised vector of hashed character trigrams."""
+    padded = f"  {normalized} "
+    counts = defaultdict(float)
+    for i in range(len(padded) - 2):
+        counts[zlib.crc32(padded[i:i + 3].encode("utf-8")) % CHAT_CACHE_DIMENSIONS] += 1.0
+    norm = sum(v * v for v in counts.values()) ** 0.5 or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+def questions_compatible(a, b):
+    """Token-level guard for a similarity hit between two normalised questions. Numbers
+    must match exactly, seniority/count words must not differ, and every other differing
+    word must be a near spelling of one on the other side (a typo, not a different role)."""
+    tokens_a = set(a.split()) - CHAT_CACHE_STOPWORDS
+    tokens_b = set(b.split()) - CHAT_CACHE_STOPWORDS
+    if {t for t in tokens_a if any(c.isdigit() for c in t)} != {t for t in tokens_b if any(c.isdigit() for c in t)}:
+        return False
+    only_a, only_b = tokens_a - tokens_b, tokens_b - tokens_a
+    if (only_a | only_b) & CHAT_CACHE_PROTECTED_WORDS:
+        return False
+    for words, others in ((only_a, only_b), (only_b, only_a)):
+        for word in words:
+            if not any(difflib.SequenceMatcher(None, word, other).ratio() >= CHAT_CACHE_TYPO_RATIO for other in others):
+                return False
+    return True
+
+def chat_cache_lookup(user_message):
+    """Returns a cached reply for a similar first-turn question, or None."""
+    if not CHAT_CACHE_ENABLED:
+        return None
+    key = normalize_question(user_message)
+    if not key:
+        return None
+    now = time.time()
+    with _chat_cache_lock:
+        for k in [k for k, e in _chat_cache.items() if now - e['created_at'] > CHAT_CACHE_TTL_SECONDS]:
+            del _chat_cache[k]
+        entry = _chat_cache.get(key)
+        if entry is None:
+            vector = question_vector(key)
+            best, best_score = None, CHAT_CACHE_SIMILARITY
+            for k, e in _chat_cache.items():
+                score = _cosine(vector, e['vector'])
+                if score >= best_score and questions_compatible(key, k):
+                    best, best_score = k, score
+            if best is None:
+                return None
+            key, entry = best, _chat_cache[best]
+        _chat_cache.move_to_end(key)
+        entry['hits'] += 1
+        entry['last_hit_at'] = now
+        return entry['response']
+
+def chat_cache_store(user_message, response):
+    if not CHAT_CACHE_ENABLED or not response:
+        return
+    key = normalize_question(user_message)
+    if not key:
+        return
+    with _chat_cache_lock:
+        _chat_cache[key] = {
+            'question': user_message, 'response': response, 'vector': question_vector(key),
+            'created_at': time.time(), 'last_hit_at': None, 'hits': 0
+        }
+        _chat_cache.move_to_end(key)
+        while len(_chat_cache) > CHAT_CACHE_MAX_ENTRIES:
+            _chat_cache.popitem(last=False)
 
+@app.route("/chat", methods=["POST"])
+@admission_controlled('chat')
+def chat():
+    data = request.json
+    user_message = data.get("message", "")
+    if not user_message:
+        return jsonify({"response": "Please provide a message."})
+
+    session_id = get_chat_session_id()
+    chat_history = load_chat_history(session_id)
+
+    script = get_scripted_reply(user_message)
     if script is not None:
         chat_history.append({"role": "user", "content": user_message})
         chat_history.append({"role": "assistant", "content": script})
         save_chat_history(session_id, chat_history)
         return jsonify({"response": script})
 
-    messages = [{"role": "system", "content": system_prompt}]
-    for m in chat_history[-18:]:
-        messages.append({"role": m["role"], "content": m["content"]})
-    messages.append({"role": "user", "content": user_message})
+    # Cached answers are served before the LLM client is built, so they work without it
+    first_turn = not chat_history
+    cached = chat_cache_lookup(user_message) if first_turn else None
+    if cached is not None:
+        chat_history.append({"role": "user", "content": user_message})
+        chat_history.append({"role": "assistant", "content": cached})
+        save_chat_history(session_id, chat_history)
+        return jsonify({"response": cached, "cached": True})
+
+    llm = get_llm(LLM_CHAT_MODEL)
+    if not llm:
+        return jsonify({"response": "I'm sorry, my AI assistant is currently unavailable."})
+
+    messages = build_chat_messages(chat_history, user_message)
 
     try:
-        response = llm.invoke(messages)
+        response = invoke_llm(messages, LLM_CHAT_MODEL, max_retries=2)
         assistant_reply = response.content
+        if first_turn:
+            chat_cache_store(user_message, assistant_reply)
         chat_history.append({"role": "user", "content": user_message})
         chat_history.append({"role": "assistant", "content": assistant_reply})
         save_chat_history(session_id, chat_history)
         return jsonify({"response": assistant_reply})
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Error during chat: {e}")
         return jsonify({"response": "I'm sorry, I encountered an error. Please try again later."})
 
+@app.route("/chat/stream", methods=["POST"])
+@admission_controlled('chat')
+def chat_stream():
+    """Same as /chat, but relays tokens as Server-Sent Events as soon as Groq produces them.
+    Events: {"token": "..."} per chunk, then {"done": true} (or {"error": "..."})."""
+    data = request.json or {}
+    user_message = data.get("message", "")
+    if not user_message:
+        return jsonify({"response": "Please provide a message."})
+
+    session_id = get_chat_session_id()
+    chat_history = load_chat_history(session_id)
+
+    first_turn = not chat_history
+    script = get_scripted_reply(user_message)
+    if script is None and first_turn:
+        script = chat_cache_lookup(user_message)
+    llm = get_llm(LLM_CHAT_MODEL) if script is None else None
+    if script is None and not llm:
+        return jsonify({"response": "I'm sorry, my AI assistant is currently unavailable."})
+
+    def generate():
+        if script is not None:
+            reply = script
+            yield sse_event({"token": script})
+        else:
+            messages = build_chat_messages(chat_history, user_message)
+            parts = []
+            model_name = LLM_CHAT_MODEL
+            while True:
+                try:
+                    with llm_admission('chat'), llm_slot(model_name):
+                        for chunk in get_llm(model_name).stream(messages):
+                            if chunk.content:
+                                parts.append(chunk.content)
+                                yield sse_event({"token": chunk.content})
+                    break
+                except AdmissionRejected as e:
+                    yield sse_event({"error": str(e), "retry_after": e.retry_after})
+                    return
+                except Exception as e:
+                    fallback = LLM_FALLBACKS.get(model_name)
+                    # Only switch models if nothing has been sent to the browser yet.
+                    if not parts and is_rate_limit_error(e) and fallback and fallback != model_name and get_llm(fallback):
+                        print(f"Rate limit reached on {model_name}. Falling back to {fallback}...")
+                        model_name = fallback
+                        continue
+                    print(f"Error during chat stream: {e}")
+                    yield sse_event({"error": "I'm sorry, I encountered an error. Please try again later."})
+                    return
+            reply = "".join(parts)
+            if first_turn:
+                chat_cache_store(user_message, reply)
+        yield sse_event({"done": True})
+        save_chat_history_async(session_id, chat_history + [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": reply},
+        ])
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/admin/chat_cache", methods=["GET"])
+def list_chat_cache():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    now = time.time()
+    with _chat_cache_lock:
+        entries = [{
+            'key': k, 'question': e['question'], 'response': e['response'], 'hits': e['hits'],
+            'age_seconds': int(now - e['created_at']),
+            'ttl_remaining_seconds': max(0, int(CHAT_CACHE_TTL_SECONDS - (now - e['created_at'])))
+        } for k, e in reversed(_chat_cache.items())]
+    return jsonify({'entries': entries, 'size': len(entries), 'max_entries': CHAT_CACHE_MAX_ENTRIES})
+
+@app.route("/admin/chat_cache", methods=["DELETE"])
+def purge_chat_cache():
+    """Purges one entry (?key=<normalised question>) or the whole cache."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    key = request.args.get('key')
+    with _chat_cache_lock:
+        if key:
+            removed = 1 if _chat_cache.pop(key, None) is not None else 0
+        else:
+            removed = len(_chat_cache)
+            _chat_cache.clear()
+    return jsonify({'success': True, 'removed': removed})
+
 
 if __name__ == "__main__":
     app.run(debug=True)
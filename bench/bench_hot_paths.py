@@ -0,0 +1,184 @@
+"""
+Offline micro-benchmarks for the resume processing hot paths in api/index.py.
+
+Nothing here talks to Groq, Gmail or Supabase: PDFs are generated locally with
+PyMuPDF and LLM responses are rebuilt from the sections recorded in
+data/projects.json.
+
+Usage:
+    python bench/bench_hot_paths.py                  # run and compare against baseline
+    python bench/bench_hot_paths.py --save-baseline  # run and overwrite the baseline
+    python bench/bench_hot_paths.py --check          # exit 1 if any case regressed
+"""
+import os
+import sys
+import gc
+import json
+import time
+import copy
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+import fitz  # PyMuPDF
+import index  # noqa: E402  (api/index.py)
+from shared_fixtures import RESPONSE_HEADERS, RESUME_PARAGRAPH  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+PROJECTS_FIXTURE = os.path.join(ROOT, "data", "projects.json")
+
+# A case is flagged when it is this much slower (or allocates this much more) than the baseline.
+REGRESSION_TOLERANCE = 0.25
+
+# The shared paragraph plus a contact line, so the contact-extraction cases have something to find.
+BENCH_PARAGRAPH = RESUME_PARAGRAPH.rstrip("\n") + " Contact: jane.doe@example.com, 555-123-4567.\n"
+
+# ==================== FIXTURES ====================
+def load_recorded_resumes():
+    """Returns every resume record stored in the projects fixture."""
+    with open(PROJECTS_FIXTURE, "r", encoding="utf-8") as f:
+        projects = json.load(f)
+    return [r for p in projects for r in p.get("resumes", [])]
+
+def build_llm_response(sections):
+    """Rebuilds a raw LLM response from stored sections so the parsers see realistic input."""
+    parts = []
+    for key, header in RESPONSE_HEADERS:
+        parts.append(f"**{header}:**\n{sections.get(key, '')}\n")
+    return "\n".join(parts)
+
+def make_pdf(path, pages):
+    """Writes a synthetic resume PDF with the given number of text-filled pages."""
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), BENCH_PARAGRAPH * 12, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def make_project(resumes, size):
+    """Builds a project with `size` resumes cloned from the recorded ones, with varied scores."""
+    project = {"id": "bench", "resumes": [], "top_resumes": [], "stats": {}}
+    for i in range(size):
+        r = copy.deepcopy(resumes[i % len(resumes)])
+        r["id"] = str(i)
+        r.setdefault("sections", {})["ats_score"] = str((i * 37) % 101)
+        project["resumes"].append(r)
+    return project
+
+# ==================== RUNNER ====================
+def measure(fn, min_time=0.3, max_iterations=100000):
+    """Times `fn` until `min_time` has elapsed and records peak allocations for one call."""
+    fn()  # warm-up (regex caches, lazy imports, etc.)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    iterations = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time and iterations < max_iterations:
+        fn()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+    per_call = elapsed / iterations
+    return {
+        "ops_per_sec": round(1.0 / per_call, 2),
+        "us_per_op": round(per_call * 1e6, 2),
+        "peak_alloc_kb": round(peak / 1024, 2),
+    }
+
+def build_cases(tmpdir):
+    """Returns a list of (name, zero-arg callable) benchmark cases."""
+    resumes = load_recorded_resumes()
+    responses = [build_llm_response(r.get("sections", {})) for r in resumes]
+    summaries = [r.get("sections", {}).get("hr_summary_justification", "") for r in resumes]
+    cases = []
+
+    for pages in (1, 3, 10):
+        path = os.path.join(tmpdir, f"resume_{pages}p.pdf")
+        make_pdf(path, pages)
+        cases.append((f"extract_text_from_pdf[{pages}p]", lambda p=path: index.extract_text_from_pdf(p)))
+
+    for pages in (1, 10):
+        raw = index.extract_text_from_pdf(os.path.join(tmpdir, f"resume_{pages}p.pdf"))
+        cleaned = index.clean_text(raw)
+        cases.append((f"clean_text[{pages}p]", lambda t=raw: index.clean_text(t)))
+        cases.append((f"keyword_match[{pages}p]", lambda t=cleaned: index.keyword_match(t)))
+        cases.append((f"extract_contact_info[{pages}p]", lambda t=cleaned: index.extract_contact_info(t)))
+
+    filenames = ["4051_Aravinnth_Resume (3).pdf", "john-doe_cv_2.pdf", "resume.pdf", "Jane Smith Resume 12.pdf"]
+    cases.append(("extract_candidate_name", lambda: [index.extract_candidate_name(f) for f in filenames]))
+
+    cases.append(("parse_hr_response_sections", lambda: [index.parse_hr_response_sections(r) for r in responses]))
+    cases.append((
+        "extract_subsections_hr_summary_justification",
+        lambda: [index.extract_subsections_hr_summary_justification(s) for s in summaries],
+    ))
+
+    for size in (10, 100, 1000):
+        project = make_project(resumes, size)
+        cases.append((f"keep_top_resumes_for_project[{size}]", lambda p=project: index.keep_top_resumes_for_project(p, top_n=3)))
+    return cases
+
+def compare(results, baseline):
+    """Returns a list of human-readable regression messages."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if cur["us_per_op"] > base["us_per_op"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{name}: {base['us_per_op']}us -> {cur['us_per_op']}us per op")
+        if cur["peak_alloc_kb"] > base["peak_alloc_kb"] * (1 + REGRESSION_TOLERANCE) + 1:
+            regressions.append(f"{name}: {base['peak_alloc_kb']}KB -> {cur['peak_alloc_kb']}KB peak alloc")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite bench/baseline.json with this run")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any case regressed")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=0.3, help="seconds to spend per case")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, fn in build_cases(tmpdir):
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(fn, min_time=args.min_time)
+            r = results[name]
+            base = baseline.get(name)
+            delta = ""
+            if base:
+                delta = f"  ({(r['us_per_op'] / base['us_per_op'] - 1) * 100:+.1f}% vs baseline)"
+            print(f"{name:<50} {r['ops_per_sec']:>12.1f} ops/s {r['us_per_op']:>12.1f} us/op {r['peak_alloc_kb']:>10.1f} KB peak{delta}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_FILE}")
+        return 0
+
+    regressions = compare(results, baseline)
+    for msg in regressions:
+        print(f"REGRESSION {msg}")
+    if args.check and regressions:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Cold-start benchmark for api/index.py.
+
+Each sample runs in a fresh interpreter (like a serverless cold start) and
+reports module import time, time to serve the first `GET /` and `GET /projects`,
+peak RSS, and which heavy SDKs ended up imported.
+
+Usage:
+    python bench/bench_startup.py                 # 5 cold starts, print medians
+    python bench/bench_startup.py --check         # exit 1 if over budget or a heavy SDK loads eagerly
+    python bench/bench_startup.py --budget-ms 600
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Import-time budget for api/index.py on its own (no SDK clients constructed).
+DEFAULT_BUDGET_MS = 400
+
+# SDKs that must only load when a route actually needs them.
+HEAVY_MODULES = ["fitz", "googleapiclient.discovery", "google_auth_oauthlib.flow", "langchain_groq", "supabase"]
+
+CHILD = r"""
+import sys, time, json, resource
+sys.path.insert(0, sys.argv[1])
+t0 = time.perf_counter()
+import index
+t1 = time.perf_counter()
+loaded_after_import = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+client = index.app.test_client()
+client.get("/")
+t2 = time.perf_counter()
+loaded_after_index = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+client.get("/projects")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_index_ms": (t2 - t1) * 1000,
+    "first_projects_ms": (t3 - t2) * 1000,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_after_import": loaded_after_import,
+    "heavy_after_index": loaded_after_index,
+}))
+"""
+
+def cold_start():
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, os.path.join(ROOT, "api"), json.dumps(HEAVY_MODULES)],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="median import-time budget")
+    parser.add_argument("--check", action="store_true", help="exit 1 when the budget or lazy-import rule is broken")
+    args = parser.parse_args()
+
+    samples = [cold_start() for _ in range(args.runs)]
+    for key in ("import_ms", "first_index_ms", "first_projects_ms", "peak_rss_mb"):
+        values = [s[key] for s in samples]
+        print(f"{key:<20} median {statistics.median(values):>9.1f}   min {min(values):>9.1f}   max {max(values):>9.1f}")
+    print(f"{'heavy after import':<20} {samples[-1]['heavy_after_import'] or 'none'}")
+    print(f"{'heavy after GET /':<20} {samples[-1]['heavy_after_index'] or 'none'}")
+
+    failures = []
+    median_import = statistics.median(s["import_ms"] for s in samples)
+    if median_import > args.budget_ms:
+        failures.append(f"import time {median_import:.1f}ms exceeds budget of {args.budget_ms:.0f}ms")
+    if samples[-1]["heavy_after_index"]:
+        failures.append(f"heavy SDKs imported eagerly: {', '.join(samples[-1]['heavy_after_index'])}")
+    for msg in failures:
+        print(f"FAIL {msg}")
+    return 1 if (args.check and failures) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
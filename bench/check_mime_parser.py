@@ -0,0 +1,144 @@
+"""
+Differential check of the Gmail MIME fast path against the standard library.
+
+Builds a corpus of messages (LF and CRLF line endings, preamble/epilogue, nested
+multiparts, forwarded message/rfc822, boundaries that prefix body lines or other
+boundaries, quoted-printable and RFC 2231 filenames) and compares, per message:
+
+- every leaf part found by index.iter_mime_leaves() with the non-multipart parts of
+  email.message_from_bytes(...).walk(): content type, filename and decoded body;
+- the attachments returned by index.parse_resume_message() with the resume PDFs the
+  stdlib walk finds.
+
+Usage:
+    python bench/check_mime_parser.py            # print one line per case
+    python bench/check_mime_parser.py --check    # exit 1 on any mismatch
+"""
+import os
+import sys
+import base64
+import argparse
+import email
+import email.encoders
+import email.parser
+import email.policy
+from email.mime.application import MIMEApplication
+from email.mime.message import MIMEMessage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+import index  # noqa: E402
+
+PDF = b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\n" + bytes(range(256)) * 4 + b"\n%%EOF\n"
+
+
+def pdf_part(filename, encoding="base64"):
+    part = MIMEApplication(PDF, "pdf")
+    if encoding == "quoted-printable":
+        del part["Content-Transfer-Encoding"]
+        part.set_payload(PDF)
+        email.encoders.encode_quopri(part)
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    return part
+
+
+def message(boundary, *parts, subject="Resume for Data Analyst", preamble=None, epilogue=None):
+    msg = MIMEMultipart(boundary=boundary)
+    msg["From"] = "Jane Doe <jane@example.com>"
+    msg["Subject"] = subject
+    if preamble is not None:
+        msg.preamble = preamble
+    if epilogue is not None:
+        msg.epilogue = epilogue
+    for part in parts:
+        msg.attach(part)
+    return msg.as_bytes()
+
+
+def crlf(raw):
+    return raw.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+
+
+def build_cases():
+    cases = {}
+    cases["simple"] = message("b1", MIMEText("Please find my resume."), pdf_part("resume.pdf"))
+    cases["simple-crlf"] = crlf(cases["simple"])
+    cases["preamble-epilogue"] = message(
+        "b2", MIMEText("Hi"), pdf_part("cv.pdf"),
+        preamble="This is a multi-part message in MIME format.\n--b2x is not a boundary",
+        epilogue="trailing text\n--b2 is after the close")
+    cases["preamble-epilogue-crlf"] = crlf(cases["preamble-epilogue"])
+
+    alternative = MIMEMultipart("alternative", boundary="inner")
+    alternative.attach(MIMEText("plain body"))
+    alternative.attach(MIMEText("<p>html body</p>", "html"))
+    cases["nested"] = message("outer", alternative, pdf_part("resume.pdf"), pdf_part("photo.pdf"))
+    cases["nested-crlf"] = crlf(cases["nested"])
+
+    forwarded = email.message_from_bytes(message("fwd-inner", MIMEText("original"), pdf_part("resume.pdf")))
+    cases["forwarded-rfc822"] = message("fwd-outer", MIMEText("Forwarding this resume"), MIMEMessage(forwarded))
+    cases["forwarded-rfc822-crlf"] = crlf(cases["forwarded-rfc822"])
+
+    collision = MIMEText("hello\n--ab cd not a boundary\n--ab c-- neither\n--ab c--x nor this\nbye")
+    cases["boundary-prefix-line"] = message("ab c", collision, pdf_part("resume.pdf"))
+    cases["boundary-prefix-line-crlf"] = crlf(cases["boundary-prefix-line"])
+
+    prefix_inner = MIMEMultipart("mixed", boundary="abcd")
+    prefix_inner.attach(MIMEText("inner text"))
+    prefix_inner.attach(pdf_part("resume.pdf"))
+    cases["boundary-prefix-nested"] = message("abc", MIMEText("outer text"), prefix_inner)
+
+    trailing_ws = message("ws", MIMEText("text"), pdf_part("resume.pdf")).replace(b"--ws\n", b"--ws \t\n")
+    cases["boundary-trailing-whitespace"] = trailing_ws
+
+    cases["quoted-printable"] = message("qp", MIMEText("qp"), pdf_part("resume.pdf", "quoted-printable"))
+    cases["rfc2231-filename"] = message("r2231", pdf_part(("utf-8", "", "résumé Jane.pdf")))
+    cases["no-close-delimiter"] = message("nc", MIMEText("text"), pdf_part("resume.pdf")).rsplit(b"--nc--", 1)[0]
+    return cases
+
+
+def stdlib_leaves(raw):
+    msg = email.message_from_bytes(raw)
+    return [(p.get_content_type(), index.decode_mime_header(p.get_filename()), p.get_payload(decode=True))
+            for p in msg.walk() if not p.is_multipart()]
+
+
+def fast_leaves(raw):
+    header_end, body_start = index.split_mime_headers(raw, 0, len(raw))
+    headers = email.parser.BytesHeaderParser(policy=email.policy.compat32).parsebytes(raw[:header_end])
+    return [(h.get_content_type(), index.decode_mime_header(h.get_filename()), index.decode_mime_body(h, raw[s:e]))
+            for h, s, e in index.iter_mime_leaves(raw, 0, len(raw), headers, body_start)]
+
+
+def stdlib_resumes(raw):
+    msg = email.message_from_bytes(raw)
+    subject = index.decode_mime_header(msg.get("Subject"))
+    return [(name, data) for ctype, name, data in stdlib_leaves(raw)
+            if name.lower().endswith(".pdf") and index.is_resume_file(name, subject) and data]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="exit 1 on any mismatch")
+    args = parser.parse_args()
+
+    failures = 0
+    for name, raw in build_cases().items():
+        leaves_ok = fast_leaves(raw) == stdlib_leaves(raw)
+        parsed = index.parse_resume_message(base64.urlsafe_b64encode(raw))
+        resumes = parsed[2] if parsed else None
+        resumes_ok = resumes == stdlib_resumes(raw)
+        ok = leaves_ok and resumes_ok
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<32} leaves={'same' if leaves_ok else 'DIFF'} "
+              f"resumes={'same' if resumes_ok else 'DIFF'} ({len(resumes or [])} found)")
+    print(f"{failures} mismatching case(s)")
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Fixture text shared by the offline benchmarks (bench/) and the load-test stubs (loadtest/).
+"""
+
+# Section headers exactly as generate_candidate_profile_hr asks the LLM to emit them.
+RESPONSE_HEADERS = [
+    ("basic_info", "Basic Information"),
+    ("strengths_weaknesses", "Strengths & Weaknesses"),
+    ("hr_summary_justification", "HR Summary & Justification"),
+    ("recommendation", "Recommendation"),
+    ("ats_json", "ATS Evaluation JSON"),
+    ("interview_questions", "JD-Based Interview Questions"),
+]
+
+# Body text for synthetic resume PDFs; callers add their own name/contact line.
+RESUME_PARAGRAPH = (
+    "Data analyst with hands-on experience in Python, SQL, Tableau and PySpark. "
+    "Built ETL pipelines on AWS and Azure, shipped dashboards in Power BI and Looker, "
+    "and trained TensorFlow and PyTorch models for NLP use cases. Worked with Docker, "
+    "Kubernetes and Terraform in a CI/CD setup.\n"
+)
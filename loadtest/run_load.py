@@ -0,0 +1,230 @@
+"""
+End-to-end load test for the Flask app with local stand-ins for Groq, Gmail,
+Supabase and SMTP (see loadtest/stubs.py).
+
+The app is served in-process by a threaded Werkzeug server and driven over real
+HTTP by concurrent clients replaying a weighted mix of routes. Per-route
+p50/p95/p99 latency, error counts and throughput are printed at the end.
+
+Usage:
+    python loadtest/run_load.py --concurrency 16 --duration 30
+    python loadtest/run_load.py --llm-latency 1.5 --llm-429-rate 0.1 --mix chat=5,projects=5
+    python loadtest/run_load.py --greedy-clients 10   # one session flooding /fetch_resumes
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import index  # noqa: E402  (api/index.py)
+import stubs  # noqa: E402
+
+DEFAULT_MIX = "fetch_resumes=1,upload=3,projects=4,project_detail=2,chat=2,chat_stream=2,send_email=1"
+
+FAKE_CREDS = {
+    "token": "loadtest-token",
+    "refresh_token": "loadtest-refresh",
+    "client_id": "loadtest-client",
+    "client_secret": "loadtest-secret",
+    "expiry": "2099-01-01T00:00:00Z",
+    "scopes": index.SCOPES,
+}
+
+CHAT_QUESTIONS = [
+    "help",
+    "How does ATS scoring work?",
+    "Write a JD for a senior data analyst",
+    "What does the Gmail fetch need?",
+    "ml team",
+]
+
+# ==================== REPORTING ====================
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+
+    def record(self, route, seconds, ok, rejected=False):
+        """`rejected` marks a 429 from admission control; it is counted apart from errors."""
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if rejected:
+                self.rejected[route] += 1
+            elif not ok:
+                self.errors[route] += 1
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def report(recorder, wall_seconds):
+    print(f"\n{'route':<16}{'count':>8}{'errors':>8}{'429s':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    total = 0
+    for route in sorted(recorder.latencies):
+        vals = sorted(recorder.latencies[route])
+        total += len(vals)
+        print(
+            f"{route:<16}{len(vals):>8}{recorder.errors[route]:>8}{recorder.rejected[route]:>8}{len(vals) / wall_seconds:>9.2f}"
+            f"{percentile(vals, 50) * 1000:>10.1f}{percentile(vals, 95) * 1000:>10.1f}"
+            f"{percentile(vals, 99) * 1000:>10.1f}{vals[-1] * 1000:>10.1f}"
+        )
+    print(f"{'total':<16}{total:>8}{sum(recorder.errors.values()):>8}{sum(recorder.rejected.values()):>8}{total / wall_seconds:>9.2f}")
+
+# ==================== TRAFFIC ====================
+def session_cookie(app, data):
+    """Signs a Flask session cookie value for the in-process app."""
+    return app.session_interface.get_signing_serializer(app).dumps(data)
+
+class Client:
+    def __init__(self, base_url, project_ids, pdfs, recorder=None, owner_id=None):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.project_ids = project_ids
+        self.pdfs = pdfs
+        self.http = requests.Session()
+        # Log in the way /callback does: credentials in the server-side store, only a sid in the cookie
+        sid = f"loadtest-{random.getrandbits(64):x}"
+        index.save_credentials(sid, index.credentials_from_json(json.dumps(FAKE_CREDS)))
+        data = {"auth_sid": sid}
+        if owner_id:
+            # Threads sharing a client must also share one admission-control owner
+            data["owner_id"] = owner_id
+        self.http.cookies.set(
+            index.app.config.get("SESSION_COOKIE_NAME", "session"),
+            session_cookie(index.app, data),
+        )
+
+    def fetch_resumes(self):
+        return self.http.post(f"{self.base_url}/fetch_resumes", json={
+            "job_description": "Looking for a Data Analyst with Python, SQL and Tableau.",
+            "job_role": "", "days_filter": 30, "project_id": random.choice(self.project_ids),
+        })
+
+    def upload(self):
+        name, data = random.choice(self.pdfs)
+        filename = f"{name}_{random.randint(0, 10**9)}.pdf"
+        return self.http.post(
+            f"{self.base_url}/projects/{random.choice(self.project_ids)}/upload_resume",
+            files={"resume": (filename, data, "application/pdf")},
+            data={"job_description": "Looking for a Data Analyst with Python, SQL and Tableau."},
+        )
+
+    def projects(self):
+        return self.http.get(f"{self.base_url}/projects")
+
+    def project_detail(self):
+        return self.http.get(f"{self.base_url}/projects/{random.choice(self.project_ids)}")
+
+    def chat(self):
+        return self.http.post(f"{self.base_url}/chat", json={"message": random.choice(CHAT_QUESTIONS)})
+
+    def chat_stream(self):
+        start = time.perf_counter()
+        resp = self.http.post(f"{self.base_url}/chat/stream", json={"message": random.choice(CHAT_QUESTIONS)}, stream=True)
+        first = True
+        for chunk in resp.iter_content(chunk_size=None):
+            if first and chunk and self.recorder:
+                self.recorder.record("chat_stream_ttft", time.perf_counter() - start, resp.status_code < 400)
+                first = False
+        return resp
+
+    def send_email(self):
+        return self.http.post(f"{self.base_url}/send_email", json={
+            "email": "candidate@example.com", "name": "Candidate", "type": random.choice(["accept", "reject"]),
+            "job_description": "Looking for a Data Analyst",
+        })
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(","):
+        route, _, weight = item.partition("=")
+        if not hasattr(Client, route.strip()):
+            raise SystemExit(f"Unknown route in --mix: {route}")
+        weights[route.strip()] = float(weight or 1)
+    return weights
+
+def worker(client, weights, deadline, recorder, label=None):
+    routes, route_weights = list(weights), list(weights.values())
+    while time.time() < deadline:
+        route = random.choices(routes, weights=route_weights)[0]
+        start = time.perf_counter()
+        try:
+            status = getattr(client, route)().status_code
+        except requests.RequestException:
+            status = 599
+        recorder.record(label or route, time.perf_counter() - start, status < 400, rejected=status == 429)
+        if status == 429:
+            time.sleep(0.2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of traffic to replay")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma separated route=weight pairs")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean fake LLM latency in seconds")
+    parser.add_argument("--llm-429-rate", type=float, default=0.0, help="fraction of LLM calls failing with 429")
+    parser.add_argument("--gmail-corpus", type=int, default=40, help="number of MIME messages in the fake inbox")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="fake Supabase round-trip in seconds")
+    parser.add_argument("--projects", type=int, default=3, help="projects to create before the run")
+    parser.add_argument("--greedy-clients", type=int, default=0,
+                        help="extra threads sharing one session that only call fetch_resumes (noisy neighbour)")
+    args = parser.parse_args()
+
+    fakes = stubs.install(
+        index,
+        llm=stubs.FakeLLM(latency=args.llm_latency, rate_limit_ratio=args.llm_429_rate),
+        gmail=stubs.FakeGmail(corpus_size=args.gmail_corpus),
+        db=stubs.FakeSupabase(latency=args.db_latency),
+    )
+    index.SMTP_SERVER, index.SMTP_PORT = fakes.smtp.host, fakes.smtp.port
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, index.app, threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    project_ids = []
+    for i in range(args.projects):
+        resp = requests.post(f"{base_url}/projects", json={"title": f"Load test {i}", "description": "Data Analyst"})
+        project_ids.append(resp.json()["project"]["id"])
+    pdfs = [(f"Applicant_{i}", stubs.make_pdf_bytes(f"Applicant {i}")) for i in range(10)]
+
+    weights = parse_mix(args.mix)
+    recorder = Recorder()
+    print(f"Replaying {args.mix} with {args.concurrency} clients for {args.duration:.0f}s against {base_url}")
+    started = time.time()
+    deadline = started + args.duration
+    greedy = Client(base_url, project_ids, pdfs, recorder, owner_id="greedy-owner")
+    with ThreadPoolExecutor(max_workers=args.concurrency + args.greedy_clients) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker, Client(base_url, project_ids, pdfs, recorder), weights, deadline, recorder)
+        for _ in range(args.greedy_clients):
+            pool.submit(worker, greedy, {"fetch_resumes": 1}, deadline, recorder, "greedy_fetch")
+    wall = time.time() - started
+
+    report(recorder, wall)
+    print(f"\nLLM calls: {fakes.llm.calls} (429 injected: {fakes.llm.rate_limited}), emails received by sink: {fakes.smtp.received}")
+    server.shutdown()
+    fakes.smtp.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+Local stand-ins for the external services used by api/index.py.
+
+`install(index, ...)` swaps them into an imported `index` module so the Flask app
+can be load-tested without touching Groq, Gmail, Supabase or a real SMTP server:
+
+- FakeLLM:        ChatGroq replacement with configurable latency and 429 injection
+- FakeGmail:      googleapiclient `build('gmail', ...)` replacement serving a MIME corpus
+- FakeSupabase:   in-memory tables + storage buckets supporting the query calls the app makes
+- SmtpSink:       local SMTP server that accepts and counts messages
+"""
+import os
+import sys
+import json
+import time
+import copy
+import random
+import base64
+import smtplib
+import threading
+import socketserver
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from types import SimpleNamespace
+
+import fitz  # PyMuPDF
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PROJECTS_FIXTURE = os.path.join(ROOT, "data", "projects.json")
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from shared_fixtures import RESPONSE_HEADERS, RESUME_PARAGRAPH  # noqa: E402  (bench/shared_fixtures.py)
+
+FAKE_RESUME_PROFILE = {
+    "name": "Candidate", "total_experience_years": 3, "highest_education": "B.Tech",
+    "most_recent_role": "Data Analyst at Example Corp",
+    "roles": [{"title": "Data Analyst", "employer": "Example Corp", "duration": "3 years",
+               "highlights": ["Built ETL pipelines in PySpark", "Shipped Tableau dashboards"]}],
+    "skills": ["Python", "SQL", "Tableau", "PySpark", "AWS"],
+    "projects": [{"name": "Churn model", "summary": "Predicted churn", "technologies": ["Python", "TensorFlow"]}],
+    "certifications": [], "achievements": ["Cut report latency by 40%"],
+}
+
+# ==================== FIXTURES ====================
+def load_recorded_responses():
+    """Rebuilds raw LLM responses from the sections recorded in data/projects.json."""
+    with open(PROJECTS_FIXTURE, "r", encoding="utf-8") as f:
+        projects = json.load(f)
+    responses = []
+    for p in projects:
+        for r in p.get("resumes", []):
+            sections = r.get("sections", {})
+            responses.append("\n".join(f"**{h}:**\n{sections.get(k, '')}\n" for k, h in RESPONSE_HEADERS))
+    return responses or ["Basic Information:\n- Name: Test\nATS Evaluation JSON:\n[{\"ats_score\": \"50\", \"hr_score\": \"5\"}]"]
+
+def make_pdf_bytes(name, pages=2):
+    """Returns the bytes of a synthetic resume PDF for `name`."""
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(40, 40, 560, 800),
+            f"{name}\n{name.lower().replace(' ', '.')}@example.com 555-123-4567\n" + RESUME_PARAGRAPH * 8,
+            fontsize=9,
+        )
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+# ==================== FAKE LLM ====================
+class FakeLLM:
+    """Mimics the subset of ChatGroq used by the app (`invoke` and `stream`)."""
+
+    def __init__(self, latency=0.5, jitter=0.2, rate_limit_ratio=0.0, responses=None, model_name="fake"):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.responses = responses or load_recorded_responses()
+        self.model_name = model_name
+        self.calls = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    # Share of the latency spent before the first streamed token (time-to-first-token).
+    first_token_share = 0.2
+
+    def _latency(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _maybe_rate_limit(self):
+        with self._lock:
+            self.calls += 1
+            limited = random.random() < self.rate_limit_ratio
+            if limited:
+                self.rate_limited += 1
+        if limited:
+            raise Exception("Error code: 429 - rate_limit_exceeded (injected by FakeLLM)")
+
+    def _sleep_or_raise(self):
+        self._maybe_rate_limit()
+        time.sleep(self._latency())
+
+    def _reply_for(self, prompt):
+        if isinstance(prompt, list):
+            return "- Introlligent can fetch resumes from Gmail and score them.\n- Ask me for a JD template."
+        if "Return only JSON" in prompt:
+            return json.dumps(FAKE_RESUME_PROFILE)
+        if "Reply with the number only" in prompt:
+            return str(random.randint(0, 100))
+        return random.choice(self.responses)
+
+    def invoke(self, prompt):
+        self._sleep_or_raise()
+        return SimpleNamespace(content=self._reply_for(prompt))
+
+    def stream(self, prompt):
+        self._maybe_rate_limit()
+        latency = self._latency()
+        words = self._reply_for(prompt).split(" ")
+        time.sleep(latency * self.first_token_share)
+        per_token = latency * (1 - self.first_token_share) / max(1, len(words))
+        for word in words:
+            yield SimpleNamespace(content=word + " ")
+            time.sleep(per_token)
+
+# ==================== FAKE GMAIL ====================
+class _Exec:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+class FakeGmail:
+    """Serves a fixed corpus of raw MIME messages through the Gmail API call shape."""
+
+    def __init__(self, corpus_size=40, latency=0.05, pages=2):
+        self.latency = latency
+        self.corpus = {}
+        for i in range(corpus_size):
+            name = f"Candidate {i:04d}"
+            msg = EmailMessage()
+            msg["From"] = f"{name} <candidate{i:04d}@example.com>"
+            msg["To"] = "hr@example.com"
+            msg["Subject"] = f"Application for Data Analyst - {name}"
+            msg.set_content("Please find my resume attached.")
+            msg.add_attachment(
+                make_pdf_bytes(name, pages), maintype="application", subtype="pdf",
+                filename=f"{name.replace(' ', '_')}_Resume.pdf",
+            )
+            raw = base64.urlsafe_b64encode(msg.as_bytes()).decode("ascii")
+            self.corpus[f"msg{i:04d}"] = raw
+
+    # googleapiclient resource chain: service.users().messages().list(...).execute()
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId="me", q="", **kwargs):
+        def run():
+            time.sleep(self.latency)
+            ids = list(self.corpus.keys())
+            random.shuffle(ids)
+            return {"messages": [{"id": mid} for mid in ids]}
+        return _Exec(run)
+
+    def get(self, userId="me", id=None, format="raw", **kwargs):
+        def run():
+            time.sleep(self.latency)
+            return {"id": id, "raw": self.corpus[id]}
+        return _Exec(run)
+
+    def build(self, service_name, version, credentials=None, **kwargs):
+        """Drop-in for googleapiclient.discovery.build."""
+        return self
+
+# ==================== FAKE SUPABASE ====================
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _json_path(row, col):
+    """Resolves a PostgREST column, including JSON paths: `data->analytics` returns the
+    JSON value, `data->>version` its text form (None stays None)."""
+    if "->" not in col:
+        return row.get(col)
+    parts = col.replace("->>", "->").split("->")
+    value = row.get(parts[0])
+    for key in parts[1:]:
+        value = value.get(key) if isinstance(value, dict) else None
+    if "->>" in col and value is not None:
+        return value if isinstance(value, str) else json.dumps(value)
+    return value
+
+class _Query:
+    """Chainable query builder over a list of dict rows (PostgREST call shape)."""
+
+    def __init__(self, db, table):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._payload = None
+        self._on_conflict = None
+        self._filters = []
+        self._order = None
+        self._range = None
+        self._single = False
+
+    def select(self, columns="*", **kwargs):
+        self._op, self._columns = "select", columns
+        return self
+
+    def insert(self, data, **kwargs):
+        self._op, self._payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict="id", **kwargs):
+        self._op, self._payload, self._on_conflict = "upsert", data, on_conflict
+        return self
+
+    def update(self, data, **kwargs):
+        self._op, self._payload = "update", data
+        return self
+
+    def delete(self, **kwargs):
+        self._op = "delete"
+        return self
+
+    def eq(self, col, val):
+        self._filters.append(lambda r: _json_path(r, col) == val)
+        return self
+
+    def is_(self, col, val):
+        if val not in ("null", None):
+            raise ValueError(f"Unsupported is_ value {val!r}")
+        self._filters.append(lambda r: _json_path(r, col) is None)
+        return self
+
+    def in_(self, col, vals):
+        vals = list(vals)
+        self._filters.append(lambda r: r.get(col) in vals)
+        return self
+
+    def lt(self, col, val):
+        self._filters.append(lambda r: r.get(col) is not None and r.get(col) < val)
+        return self
+
+    def order(self, col, desc=False, **kwargs):
+        self._order = (col, desc)
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def limit(self, n):
+        self._range = (0, n - 1)
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def _project(self, row):
+        if self._columns in ("*", None):
+            return copy.deepcopy(row)
+        out = {}
+        for col in (c.strip() for c in self._columns.split(",")):
+            # "alias:data->key" is returned as `alias`; a bare JSON path as its last key
+            alias, _, col = col.rpartition(":")
+            out[alias or col.replace("->>", "->").split("->")[-1]] = copy.deepcopy(_json_path(row, col))
+        return out
+
+    def execute(self):
+        time.sleep(self._db.latency)
+        with self._db.lock:
+            rows = self._db.tables.setdefault(self._table, [])
+            matches = [r for r in rows if all(f(r) for f in self._filters)]
+            if self._op == "select":
+                if self._order:
+                    col, desc = self._order
+                    matches.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+                if self._range:
+                    matches = matches[self._range[0]:self._range[1] + 1]
+                out = [self._project(r) for r in matches]
+                if self._single:
+                    if len(out) != 1:
+                        raise Exception("JSON object requested, multiple (or no) rows returned")
+                    return _Result(out[0])
+                return _Result(out, count=len(out))
+            if self._op in ("insert", "upsert"):
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                key = self._on_conflict or "id"
+                for item in payload:
+                    existing = next((r for r in rows if key in item and r.get(key) == item.get(key)), None)
+                    if existing is not None and self._op == "upsert":
+                        existing.update(copy.deepcopy(item))
+                    elif existing is not None:
+                        raise Exception(f"duplicate key value violates unique constraint on {key}")
+                    else:
+                        rows.append(copy.deepcopy(item))
+                return _Result(copy.deepcopy(payload))
+            if self._op == "update":
+                for r in matches:
+                    r.update(copy.deepcopy(self._payload))
+                return _Result(copy.deepcopy(matches))
+            if self._op == "delete":
+                self._db.tables[self._table] = [r for r in rows if r not in matches]
+                return _Result(copy.deepcopy(matches))
+        raise ValueError(f"Unsupported operation {self._op}")
+
+class _Bucket:
+    def __init__(self, db, name):
+        self._db = db
+        self._files = db.buckets.setdefault(name, {})
+        self._created = db.bucket_created.setdefault(name, {})
+
+    def upload(self, path=None, file=None, file_options=None, **kwargs):
+        time.sleep(self._db.latency)
+        with self._db.lock:
+            if path in self._files and not (file_options or {}).get("upsert"):
+                raise Exception(f"The resource already exists: {path}")
+            self._files[path] = bytes(file)
+            self._created[path] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        return SimpleNamespace(path=path)
+
+    def download(self, path, **kwargs):
+        time.sleep(self._db.latency)
+        with self._db.lock:
+            if path not in self._files:
+                raise Exception(f"Object not found: {path}")
+            return self._files[path]
+
+    def remove(self, paths):
+        time.sleep(self._db.latency)
+        with self._db.lock:
+            removed = [p for p in paths if self._files.pop(p, None) is not None]
+            for p in removed:
+                self._created.pop(p, None)
+        return [{"name": p} for p in removed]
+
+    def list(self, path="", options=None, **kwargs):
+        """One folder level, like Storage: files carry an id and created_at, sub-folders have id None."""
+        options = options or {}
+        prefix = path.strip("/") + "/" if path.strip("/") else ""
+        entries = {}
+        with self._db.lock:
+            for p, data in self._files.items():
+                if not p.startswith(prefix):
+                    continue
+                head, sep, _ = p[len(prefix):].partition("/")
+                if sep:
+                    entries.setdefault(head, {"name": head, "id": None, "created_at": None, "metadata": None})
+                else:
+                    entries[head] = {"name": head, "id": p, "created_at": self._created.get(p), "metadata": {"size": len(data)}}
+        listed = [entries[k] for k in sorted(entries)]
+        offset = options.get("offset", 0)
+        return listed[offset:offset + options.get("limit", 100)]
+
+    def create_signed_url(self, path, expires_in, **kwargs):
+        return {"signedURL": f"http://fake-storage.local/{path}?exp={int(time.time()) + expires_in}"}
+
+class _Storage:
+    def __init__(self, db):
+        self._db = db
+
+    def from_(self, bucket):
+        return _Bucket(self._db, bucket)
+
+class FakeSupabase:
+    """In-memory replacement for `supabase.Client` (tables + storage)."""
+
+    def __init__(self, latency=0.01, seed_projects=True):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.buckets = {}
+        self.bucket_created = {}
+        self.storage = _Storage(self)
+        if seed_projects and os.path.exists(PROJECTS_FIXTURE):
+            with open(PROJECTS_FIXTURE, "r", encoding="utf-8") as f:
+                self.tables["projects"] = [{"id": p["id"], "data": p} for p in json.load(f)]
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, fn, params=None):
+        """Postgres functions the app calls through PostgREST, implemented over the tables."""
+        def increment(deltas, now):
+            rows = self.tables.setdefault("usage_counters", [])
+            for d in deltas:
+                key = f"{d['scope']}:{d['name']}"
+                row = next((r for r in rows if r["id"] == key), None)
+                if row is None:
+                    rows.append({"id": key, "scope": d["scope"], "name": d["name"], "value": d["delta"], "updated_at": now})
+                else:
+                    row["value"] += d["delta"]
+                    row["updated_at"] = now
+
+        def run():
+            time.sleep(self.latency)
+            now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            with self.lock:
+                if fn == "increment_usage_counters":
+                    increment((params or {}).get("deltas", []), now)
+                elif fn == "record_audit_events":
+                    # Insert on log_id, do nothing on conflict; count only the inserted events
+                    log = self.tables.setdefault("evaluation_log", [])
+                    known = {r["log_id"] for r in log}
+                    for event in (params or {}).get("events", []):
+                        if event["log_id"] in known:
+                            continue
+                        known.add(event["log_id"])
+                        log.append({k: copy.deepcopy(v) for k, v in event.items() if k != "counters"})
+                        increment([{"scope": scope, "name": name, "delta": 1} for scope, name in event.get("counters") or []], now)
+                else:
+                    raise Exception(f"Could not find the function public.{fn}")
+            return _Result(None)
+        return _Exec(run)
+
+# ==================== SMTP SINK ====================
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        self._reply("220 introlligent-loadtest ESMTP sink")
+        in_data = False
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    self.server.sink._record()
+                    self._reply("250 OK: queued")
+                continue
+            cmd = line.split(" ", 1)[0].upper()
+            if cmd in ("EHLO", "HELO"):
+                self._reply("250-introlligent-loadtest")
+                self._reply("250 AUTH PLAIN LOGIN")
+            elif cmd == "DATA":
+                in_data = True
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            elif cmd == "AUTH":
+                self._reply("235 Authentication successful")
+            else:
+                self._reply("250 OK")
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SmtpSink:
+    """Local SMTP server that accepts every message and counts it."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.received = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingTCPServer((host, port), _SmtpHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _record(self):
+        with self._lock:
+            self.received += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def smtp_class(self):
+        """Returns an smtplib.SMTP subclass that talks to this sink (no TLS, any credentials)."""
+        sink = self
+
+        class SinkSMTP(smtplib.SMTP):
+            def __init__(self, host="", port=0, *args, **kwargs):
+                super().__init__(sink.host, sink.port, *args, **kwargs)
+
+            def starttls(self, *args, **kwargs):
+                return (220, b"TLS skipped by load-test sink")
+
+            def login(self, user, password, **kwargs):
+                return (235, b"Authentication successful")
+
+        return SinkSMTP
+
+# ==================== WIRING ====================
+def install(index, llm=None, gmail=None, db=None, smtp=None):
+    """Swaps the stand-ins into an imported api/index.py module. Returns the objects used."""
+    llm = llm or FakeLLM()
+    gmail = gmail or FakeGmail()
+    db = db or FakeSupabase()
+    smtp = smtp or SmtpSink().start()
+
+    index.supabase = db
+    index.get_llm = lambda *args, **kwargs: llm
+    index.build = gmail.build
+    index.smtplib = SimpleNamespace(SMTP=smtp.smtp_class())
+    return SimpleNamespace(llm=llm, gmail=gmail, db=db, smtp=smtp)
@@ -241,8 +241,7 @@ function renderOpenProjectPage() {
                         const r = await fetch(`/projects/${id}`);
                         const d = await r.json();
                         if (r.ok) {
-                            localStorage.setItem('currentProject', JSON.stringify(d.project));
-                            localStorage.setItem('candidates', JSON.stringify(d.project.resumes || d.project.top_resumes || []));
+                            setCurrentProject(d.project);
                             showModal('Project Opened', `Project "${d.project.title}" is now active.`, 'success');
                             navigateTo('upload');
                         } else {
@@ -260,8 +259,7 @@ function renderOpenProjectPage() {
                         const r = await fetch(`/projects/${id}`);
                         const d = await r.json();
                         if (r.ok) {
-                            localStorage.setItem('currentProject', JSON.stringify(d.project));
-                            localStorage.setItem('candidates', JSON.stringify(d.project.resumes || d.project.top_resumes || []));
+                            setCurrentProject(d.project);
                             navigateTo('project_view');
                         } else {
                             showModal('Error', d.error || 'Could not open project', 'error');
@@ -812,6 +810,37 @@ function renderLoadingPage() {
     return page;
 }
 
+// Ingestion calls carry an Idempotency-Key so a retry after a dropped connection, a 5xx or a
+// 429 resumes the same server-side batch instead of re-running the LLM evaluations.
+const INGESTION_MAX_ATTEMPTS = 4;
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+async function fetchIdempotent(url, options = {}) {
+    const key = newIdempotencyKey();
+    let lastError = null;
+    for (let attempt = 1; attempt <= INGESTION_MAX_ATTEMPTS; attempt++) {
+        let response = null;
+        try {
+            response = await fetch(url, { ...options, headers: { ...(options.headers || {}), 'Idempotency-Key': key } });
+        } catch (error) {
+            lastError = error;
+        }
+        const retryable = !response || response.status >= 500 || response.status === 429 || response.status === 409;
+        if (!retryable || attempt === INGESTION_MAX_ATTEMPTS) {
+            if (response) return response;
+            break;
+        }
+        const retryAfter = response ? parseInt(response.headers.get('Retry-After'), 10) : NaN;
+        const delayMs = Number.isFinite(retryAfter) ? retryAfter * 1000 : 1000 * 2 ** (attempt - 1);
+        await new Promise(resolve => setTimeout(resolve, delayMs));
+    }
+    throw lastError || new Error('Request failed');
+}
+
 async function startLoading(flowType, data = {}) {
     navigateTo('loading');
     
@@ -854,7 +883,7 @@ async function startLoading(flowType, data = {}) {
             payload.project_id = data.projectId;
         }
         try {
-            const response = await fetch(fetchUrl, {
+            const response = await fetchIdempotent(fetchUrl, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -864,7 +893,10 @@ async function startLoading(flowType, data = {}) {
             const result = await response.json();
             if (response.ok) {
                 if (result.candidates && result.candidates.length > 0) {
-                    localStorage.setItem('candidates', JSON.stringify(result.candidates));
+                    const candidates = data && data.projectId
+                        ? result.candidates.map(c => ({ ...c, project_id: data.projectId }))
+                        : result.candidates;
+                    localStorage.setItem('candidates', JSON.stringify(candidates));
                     navigateTo('results');
                 } else {
                     showModal('No Resumes Found', result.message || 'No suitable resumes were found in your Gmail account.', 'info');
@@ -883,13 +915,13 @@ async function startLoading(flowType, data = {}) {
         if (data.formData && data.projectId) {
             fetchUrl = `/projects/${data.projectId}/upload_resume`;
             try {
-                const response = await fetch(fetchUrl, {
+                const response = await fetchIdempotent(fetchUrl, {
                     method: 'POST',
                     body: data.formData
                 });
                 const result = await response.json();
                 if (response.ok) {
-                    const candidate = result.candidate ? [result.candidate] : [];
+                    const candidate = result.candidate ? [{ ...result.candidate, project_id: data.projectId }] : [];
                     localStorage.setItem('candidates', JSON.stringify(candidate));
                     navigateTo('results');
                 } else {
@@ -907,7 +939,7 @@ async function startLoading(flowType, data = {}) {
             formData.append('resume', data.file);
             formData.append('job_description', jobDescription);
             try {
-                const response = await fetch(fetchUrl, {
+                const response = await fetchIdempotent(fetchUrl, {
                     method: 'POST',
                     body: formData
                 });
@@ -954,7 +986,10 @@ async function sendEmail(emailType, candidate, event) {
                 email: candidate.email,
                 name: candidate.name,
                 job_description: jobDescription,
-                type: emailType
+                type: emailType,
+                // Only used for the audit log; set only on candidates that came from a project
+                project_id: candidate.project_id || null,
+                resume_id: candidate.project_id ? candidate.id : null
             };
             
             try {
@@ -982,6 +1017,123 @@ async function sendEmail(emailType, candidate, event) {
     });
 }
 
+function getScoreColorClass(score) {
+    const numericScore = parseInt(score, 10);
+    if (isNaN(numericScore)) return 'match-low';
+    if (numericScore >= 80) return 'match-high';
+    if (numericScore >= 50) return 'match-medium';
+    return 'match-low';
+}
+
+function createSkillTags(candidate) {
+    const keywords = candidate.matched_keywords || (candidate.sections && candidate.sections.matched_keywords);
+    let tags = '';
+    let potentialSkills = Object.values(keywords || {}).flat();
+    if (potentialSkills.length === 0) {
+        // Older records without stored keywords: pick capitalised phrases from the summary
+        const hrSummary = candidate.sections && candidate.sections.hr_summary;
+        if (!hrSummary) return '';
+        potentialSkills = hrSummary.match(/([A-Z][a-z]+(\s[A-Z][a-z]+)*)/g) || [];
+    }
+    const uniqueKeywords = [...new Set(potentialSkills)];
+    uniqueKeywords.slice(0, 7).forEach(keyword => {
+        tags += `<span class="skill-tag">${keyword}</span>`;
+    });
+    return tags;
+}
+
+function renderCandidateCard(candidate, index, options = {}) {
+    const cardWrapper = document.createElement('div');
+    cardWrapper.className = `card-wrapper ${getScoreColorClass(getAtsScore(candidate))}`;
+    cardWrapper.dataset.candidateIndex = index;
+    
+    const card = document.createElement('div');
+    card.className = "card bg-card card-hover p-6 md:p-8 animate-on-load";
+    if (options.animate !== false) {
+        card.style.animation = `fadeInUp 0.5s ease-out forwards`;
+        card.style.animationDelay = `${index * 100}ms`;
+    } else {
+        card.style.opacity = '1';
+    }
+    
+    card.innerHTML = `
+    <div class="candidate-card-header">
+    <div class="profile-picture">
+    <i class="fas fa-user text-3xl text-gray-400"></i>
+    </div>
+    <div class="match-score">
+    <div class="score-value">${getAtsScore(candidate) || 'N/A'}%</div>
+    <div class="score-label">MATCH</div>
+    </div>
+    </div>
+    <div class="text-center mt-4">
+    <h3 class="text-2xl font-bold text-heading">${candidate.name || 'Unknown Candidate'}</h3>
+    <p class="text-sm text-muted">${candidate.filename}</p>
+    </div>
+    <div class="candidate-details-list mt-6 space-y-3">
+    <div class="detail-item">
+    <i class="fas fa-envelope fa-fw icon-color"></i>
+    <span>${candidate.email || 'No email provided'}</span>
+    </div>
+    <div class="detail-item">
+    <i class="fas fa-phone fa-fw icon-color"></i>
+    <span>${candidate.phone || 'No phone provided'}</span>
+    </div>
+    </div>
+    <div class="skill-tags-container mt-6">
+    ${createSkillTags(candidate)}
+    </div>
+    `;
+    cardWrapper.appendChild(card);
+    
+    if (options.onDelete) {
+        const deleteBtn = document.createElement('button');
+        deleteBtn.className = 'delete-resume-btn btn-secondary';
+        deleteBtn.style.position = 'absolute';
+        deleteBtn.style.top = '8px';
+        deleteBtn.style.right = '8px';
+        deleteBtn.style.padding = '6px 10px';
+        deleteBtn.style.borderRadius = '8px';
+        deleteBtn.textContent = 'Delete';
+        deleteBtn.addEventListener('click', (ev) => {
+            ev.stopPropagation();
+            const confirmDelete = confirm('Delete this resume from the project? This action cannot be undone.');
+            if (!confirmDelete) return;
+            options.onDelete(candidate);
+        });
+        card.style.position = 'relative';
+        card.appendChild(deleteBtn);
+    }
+    
+    cardWrapper.addEventListener('click', (e) => {
+        if (e.target.closest('.delete-resume-btn')) return;
+        showCandidateDetailModal(candidate);
+    });
+    return cardWrapper;
+}
+
+// Only the resume list is paged; the project record kept in localStorage stays small.
+function setCurrentProject(project) {
+    const { resumes, top_resumes, ...rest } = project;
+    rest.resume_count = (resumes || []).length;
+    localStorage.setItem('currentProject', JSON.stringify(rest));
+    localStorage.removeItem('candidates');
+}
+
+async function deleteProjectResume(projectId, candidate) {
+    try {
+        const resp = await fetch(`/projects/${projectId}/resumes/${candidate.id}`, { method: 'DELETE' });
+        const result = await resp.json();
+        if (resp.ok && result.success) {
+            return true;
+        }
+        showModal('Delete Failed', result.error || 'Could not delete resume', 'error');
+    } catch (err) {
+        showModal('Network Error', 'Delete request failed: ' + err.message, 'error');
+    }
+    return false;
+}
+
 function renderResultsPage() {
     const page = document.createElement('div');
     page.className = 'container mx-auto fade-in-up';
@@ -999,123 +1151,232 @@ function renderResultsPage() {
     
     if (resultsContainer && candidates && candidates.length > 0) {
         candidates.sort((a, b) => {
-            const scoreA = parseInt((a.sections && a.sections.ats_score) || 0, 10) || 0;
-            const scoreB = parseInt((b.sections && b.sections.ats_score) || 0, 10) || 0;
+            const scoreA = parseInt(getAtsScore(a) || 0, 10) || 0;
+            const scoreB = parseInt(getAtsScore(b) || 0, 10) || 0;
             return scoreB - scoreA;
         });
         
+        const currentProject = JSON.parse(localStorage.getItem('currentProject') || 'null');
+        const onDelete = (currentProject && currentProject.id) ? async (candidate) => {
+            if (await deleteProjectResume(currentProject.id, candidate)) {
+                localStorage.setItem('candidates', JSON.stringify(candidates.filter(c => c.id !== candidate.id)));
+                navigateTo('results');
+            }
+        } : null;
+        
         candidates.forEach((candidate, index) => {
-            const getScoreColorClass = (score) => {
-                const numericScore = parseInt(score, 10);
-                if (isNaN(numericScore)) return 'match-low';
-                if (numericScore >= 80) return 'match-high';
-                if (numericScore >= 50) return 'match-medium';
-                return 'match-low';
-            };
-            const scoreColorClass = getScoreColorClass(candidate.sections.ats_score);
-            
-            const createSkillTags = (keywords) => {
-                let tags = '';
-                if (!candidate.sections.hr_summary) return '';
-                const potentialSkills = candidate.sections.hr_summary.match(/([A-Z][a-z]+(\s[A-Z][a-z]+)*)/g) || [];
-                const uniqueKeywords = [...new Set(potentialSkills)];
-                uniqueKeywords.slice(0, 7).forEach(keyword => {
-                    tags += `<span class="skill-tag">${keyword}</span>`;
-                });
-                return tags;
-            };
-            
-            const cardWrapper = document.createElement('div');
-            cardWrapper.className = `card-wrapper ${scoreColorClass}`;
-            cardWrapper.dataset.candidateIndex = index;
-            
-            const card = document.createElement('div');
-            card.className = "card bg-card card-hover p-6 md:p-8 animate-on-load";
-            card.style.animation = `fadeInUp 0.5s ease-out forwards`;
-            card.style.animationDelay = `${index * 100}ms`;
-            
-            card.innerHTML = `
-            <div class="candidate-card-header">
-            <div class="profile-picture">
-            <i class="fas fa-user text-3xl text-gray-400"></i>
-            </div>
-            <div class="match-score">
-            <div class="score-value">${candidate.sections.ats_score || 'N/A'}%</div>
-            <div class="score-label">MATCH</div>
-            </div>
-            </div>
-            <div class="text-center mt-4">
-            <h3 class="text-2xl font-bold text-heading">${candidate.name || 'Unknown Candidate'}</h3>
-            <p class="text-sm text-muted">${candidate.filename}</p>
-            </div>
-            <div class="candidate-details-list mt-6 space-y-3">
-            <div class="detail-item">
-            <i class="fas fa-envelope fa-fw icon-color"></i>
-            <span>${candidate.email || 'No email provided'}</span>
-            </div>
-            <div class="detail-item">
-            <i class="fas fa-phone fa-fw icon-color"></i>
-            <span>${candidate.phone || 'No phone provided'}</span>
-            </div>
-            </div>
-            <div class="skill-tags-container mt-6">
-        ${createSkillTags(candidate.sections.matched_keywords)}
-        </div>
-        `;
+            resultsContainer.appendChild(renderCandidateCard(candidate, index, { onDelete }));
+        });
+    } else {
+        resultsContainer.innerHTML = `<div class="text-center text-muted p-16 col-span-full">No candidates to display.</div>`;
+    }
+    
+    page.appendChild(renderFooter());
+    return page;
+}
+
+// --- Paged, windowed candidate list ---
+// Project views can hold thousands of resumes. Pages are pulled from
+// /projects/<id>/resumes with a cursor as the user scrolls, and only the rows
+// around the viewport are kept in the DOM.
+const VIRTUAL_ROW_HEIGHT = 420;
+const VIRTUAL_OVERSCAN_ROWS = 2;
+const VIRTUAL_PAGE_SIZE = 30;
+
+function virtualColumnCount() {
+    if (window.matchMedia('(min-width: 1024px)').matches) return 3;
+    if (window.matchMedia('(min-width: 768px)').matches) return 2;
+    return 1;
+}
+
+// Only one windowed list is on screen at a time; re-rendering the project view tears
+// down the previous one so its window listeners do not pile up.
+let activeVirtualList = null;
+
+function createVirtualCandidateList(projectId, options = {}) {
+    if (activeVirtualList) activeVirtualList.destroy();
+    const viewport = document.createElement('div');
+    viewport.className = 'virtual-candidate-list';
+    viewport.style.position = 'relative';
+    viewport.style.overflowY = 'auto';
+    viewport.style.height = '75vh';
+    const spacer = document.createElement('div');
+    spacer.style.position = 'relative';
+    viewport.appendChild(spacer);
+    
+    const state = { items: [], total: null, cursor: null, done: false, loading: false, query: {}, columns: virtualColumnCount() };
+    const rendered = new Map();
+    let frame = null;
+    
+    async function loadMore() {
+        if (state.loading || state.done) return;
+        state.loading = true;
+        const params = new URLSearchParams({ limit: VIRTUAL_PAGE_SIZE, ...state.query });
+        if (state.cursor) params.set('cursor', state.cursor);
+        const generation = state.generation;
+        try {
+            const res = await fetch(`/projects/${projectId}/resumes?${params.toString()}`);
+            const data = await res.json();
+            if (generation !== state.generation) return;
+            if (!res.ok) {
+                state.done = true;
+                showModal('Error', data.error || 'Could not load resumes', 'error');
+                return;
+            }
+            state.items.push(...(data.resumes || []));
+            state.total = data.total;
+            state.cursor = data.next_cursor;
+            state.done = !data.next_cursor;
+            options.onPage && options.onPage(state.items, state.total);
+        } catch (err) {
+            state.done = true;
+            showModal('Network Error', 'Failed to load resumes: ' + err.message, 'error');
+        } finally {
+            if (generation === state.generation) {
+                state.loading = false;
+                render();
+            }
+        }
+    }
+    
+    function render() {
+        frame = null;
+        const columns = state.columns;
+        const count = state.total === null ? state.items.length : state.total;
+        spacer.style.height = `${Math.ceil(count / columns) * VIRTUAL_ROW_HEIGHT}px`;
+        if (state.total === 0) {
+            spacer.innerHTML = `<div class="text-center text-muted p-16">${options.emptyText || 'No candidates to display.'}</div>`;
+            spacer.style.height = 'auto';
+            rendered.clear();
+            return;
+        }
         
-        cardWrapper.appendChild(card);
-        resultsContainer.appendChild(cardWrapper);
+        const firstRow = Math.max(0, Math.floor(viewport.scrollTop / VIRTUAL_ROW_HEIGHT) - VIRTUAL_OVERSCAN_ROWS);
+        const lastRow = Math.ceil((viewport.scrollTop + viewport.clientHeight) / VIRTUAL_ROW_HEIGHT) + VIRTUAL_OVERSCAN_ROWS;
+        const start = firstRow * columns;
+        const end = Math.min(count, lastRow * columns);
         
-        const currentProject = JSON.parse(localStorage.getItem('currentProject') || 'null');
-        if (currentProject && currentProject.id) {
-            const deleteBtn = document.createElement('button');
-            deleteBtn.className = 'delete-resume-btn btn-secondary';
-            deleteBtn.style.position = 'absolute';
-            deleteBtn.style.top = '8px';
-            deleteBtn.style.right = '8px';
-            deleteBtn.style.padding = '6px 10px';
-            deleteBtn.style.borderRadius = '8px';
-            deleteBtn.textContent = 'Delete';
-            deleteBtn.addEventListener('click', async (ev) => {
-                ev.stopPropagation();
-                const confirmDelete = confirm('Delete this resume from the project? This action cannot be undone.');
-                if (!confirmDelete) return;
-                try {
-                    const resp = await fetch(`/projects/${currentProject.id}/resumes/${candidate.id}`, { method: 'DELETE' });
-                    const result = await resp.json();
-                    if (resp.ok && result.success) {
-                        const r = await fetch(`/projects/${currentProject.id}`);
-                        const d = await r.json();
-                        if (r.ok) {
-                            localStorage.setItem('currentProject', JSON.stringify(d.project));
-                            localStorage.setItem('candidates', JSON.stringify(d.project.resumes || d.project.top_resumes || []));
-                            navigateTo('results');
-                        } else {
-                            showModal('Error', d.error || 'Failed to refresh project', 'error');
-                        }
-                    } else {
-                        showModal('Delete Failed', result.error || 'Could not delete resume', 'error');
-                    }
-                } catch (err) {
-                    showModal('Network Error', 'Delete request failed: ' + err.message, 'error');
-                }
-            });
-            const cardEl = card;
-            cardEl.style.position = 'relative';
-            cardEl.appendChild(deleteBtn);
+        for (const [index, el] of rendered) {
+            if (index < start || index >= end || !state.items[index]) {
+                el.remove();
+                rendered.delete(index);
+            }
         }
-        
-        cardWrapper.addEventListener('click', (e) => {
-            if (e.target.closest('.delete-resume-btn')) return;
-            showCandidateDetailModal(candidate);
-        });
-    });
-} else {
-    resultsContainer.innerHTML = `<div class="text-center text-muted p-16 col-span-full">No candidates to display.</div>`;
+        for (let i = start; i < end && i < state.items.length; i++) {
+            if (rendered.has(i)) continue;
+            const el = renderCandidateCard(state.items[i], i, { animate: false, onDelete: options.onDelete });
+            el.style.position = 'absolute';
+            el.style.top = `${Math.floor(i / columns) * VIRTUAL_ROW_HEIGHT}px`;
+            el.style.left = `calc(${(i % columns) * 100 / columns}% + 1rem)`;
+            el.style.width = `calc(${100 / columns}% - 2rem)`;
+            el.style.height = `${VIRTUAL_ROW_HEIGHT - 32}px`;
+            el.style.overflow = 'hidden';
+            spacer.appendChild(el);
+            rendered.set(i, el);
+        }
+        if (end > state.items.length || state.total === null) {
+            loadMore();
+        }
+    }
+    
+    function schedule() {
+        if (frame === null) frame = requestAnimationFrame(render);
+    }
+    
+    function reset(query) {
+        state.query = query || state.query;
+        state.items = [];
+        state.total = null;
+        state.cursor = null;
+        state.done = false;
+        state.loading = false;
+        state.generation = (state.generation || 0) + 1;
+        rendered.forEach(el => el.remove());
+        rendered.clear();
+        spacer.innerHTML = '';
+        viewport.scrollTop = 0;
+        schedule();
+    }
+    
+    function relayout() {
+        if (!viewport.isConnected) {
+            destroy();
+            return;
+        }
+        const columns = virtualColumnCount();
+        if (columns === state.columns) return;
+        state.columns = columns;
+        rendered.forEach(el => el.remove());
+        rendered.clear();
+        schedule();
+    }
+    
+    function destroy() {
+        window.removeEventListener('resize', relayout);
+        if (frame !== null) cancelAnimationFrame(frame);
+        frame = null;
+        state.generation = (state.generation || 0) + 1;
+        if (activeVirtualList && activeVirtualList.element === viewport) activeVirtualList = null;
+    }
+    
+    viewport.addEventListener('scroll', schedule, { passive: true });
+    window.addEventListener('resize', relayout);
+    reset(options.query);
+    
+    activeVirtualList = { element: viewport, state, reset, destroy, ensureLoaded: loadMore };
+    return activeVirtualList;
 }
 
-page.appendChild(renderFooter());
-return page;
+// --- Project analytics ---
+// Aggregates are maintained server-side, so this is one small request per view.
+async function loadProjectAnalytics(projectId, container) {
+    try {
+        const res = await fetch(`/projects/${projectId}/analytics`);
+        const data = await res.json();
+        if (!res.ok || !data.analytics || !data.analytics.total_resumes) {
+            container.innerHTML = '';
+            return;
+        }
+        container.innerHTML = renderProjectAnalytics(data.analytics);
+    } catch (err) {
+        console.warn('Could not load project analytics', err);
+        container.innerHTML = '';
+    }
+}
+
+function renderProjectAnalytics(analytics) {
+    const topEntries = (counts, n) => Object.entries(counts || {}).sort((a, b) => b[1] - a[1]).slice(0, n);
+    const histogram = Object.entries(analytics.score_histogram || {});
+    const maxBucket = Math.max(1, ...histogram.map(([, count]) => count));
+    const skills = {};
+    Object.values(analytics.domain_keywords || {}).forEach(words => {
+        Object.entries(words).forEach(([word, count]) => { skills[word] = Math.max(skills[word] || 0, count); });
+    });
+    const bars = histogram.map(([bucket, count]) => `
+    <div class="flex flex-col items-center flex-1" title="${bucket}: ${count}">
+    <div class="w-full rounded-t" style="height:${Math.round(60 * count / maxBucket)}px;background:var(--primary-orange);opacity:${count ? 0.85 : 0.15}"></div>
+    <span class="text-xs text-muted mt-1">${bucket.split('-')[0]}</span>
+    </div>`).join('');
+    const list = (entries) => entries.map(([key, count]) => `<span class="skill-tag">${key} · ${count}</span>`).join('') || '<span class="text-sm text-muted">None yet</span>';
+    return `
+    <div class="bg-card p-6 rounded-xl shadow-lg grid grid-cols-1 md:grid-cols-3 gap-6">
+    <div>
+    <div class="text-sm text-muted">Resumes</div>
+    <div class="text-3xl font-bold text-heading">${analytics.total_resumes}</div>
+    <div class="text-sm text-muted mt-2">Average match ${analytics.average_ats_score ?? 'N/A'}% · HR ${analytics.average_hr_score ?? 'N/A'}/10</div>
+    </div>
+    <div>
+    <div class="text-sm text-muted mb-2">Score distribution</div>
+    <div class="flex items-end gap-1" style="height:80px">${bars}</div>
+    </div>
+    <div>
+    <div class="text-sm text-muted mb-2">Top skills</div>
+    <div class="skill-tags-container">${list(topEntries(skills, 8))}</div>
+    <div class="text-sm text-muted mt-3 mb-2">Sender domains</div>
+    <div class="skill-tags-container">${list(topEntries(analytics.sender_domains, 4))}</div>
+    </div>
+    </div>
+    `;
 }
 
 function renderProjectViewPage() {
@@ -1130,6 +1391,7 @@ page.innerHTML += `
 <main class="py-8">
 <h2 class="text-3xl font-bold text-heading mb-4">Project: ${title}</h2>
 <div class="mb-4 text-sm text-muted">You are viewing stored evaluations for this project. Use Open Recruitment to add more resumes.</div>
+<div id="projectAnalytics" class="mb-6"></div>
 <div class="mb-6 flex flex-col md:flex-row md:items-center md:justify-between gap-4">
 <div class="flex items-center space-x-3">
 <button id="randomCompareBtn" class="btn-secondary">Random Comparison</button>
@@ -1143,107 +1405,128 @@ page.innerHTML += `
 <button id="uploadCompareBtn" class="btn-primary">Upload & Compare</button>
 </div>
 </div>
+<div class="mb-6 flex flex-col md:flex-row md:items-center gap-3">
+<input id="resumeSearchInput" type="search" class="input-field p-2 rounded" placeholder="Search name, email or file">
+<input id="resumeMinScoreInput" type="number" min="0" max="100" class="input-field p-2 rounded" placeholder="Min score">
+<select id="resumeSortSelect" class="input-field p-2 rounded">
+<option value="score:desc">Highest score</option>
+<option value="score:asc">Lowest score</option>
+<option value="date:desc">Newest</option>
+<option value="date:asc">Oldest</option>
+<option value="name:asc">Name</option>
+</select>
+<span id="resumeCount" class="text-sm text-muted"></span>
+<div class="flex items-center space-x-2 md:ml-auto">
+<select id="exportFormatSelect" class="input-field p-2 rounded">
+<option value="csv">CSV</option>
+<option value="ndjson">NDJSON</option>
+</select>
+<button id="exportResumesBtn" class="btn-secondary"><i class="fas fa-download mr-2"></i>Export</button>
+</div>
+</div>
 
-<div id="projectResultsContainer" class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8"></div>
+<div id="projectResultsContainer"></div>
 </main>
 `;
 
 const resultsContainer = page.querySelector('#projectResultsContainer');
-const candidates = JSON.parse(localStorage.getItem('candidates') || '[]');
-
-if (candidates && candidates.length > 0) {
-    localStorage.setItem('candidates', JSON.stringify(candidates));
-    const resultsPage = renderResultsPage();
-    const generated = resultsPage.querySelector('#resultsContainer');
-    if (generated) {
-        const cloned = generated.cloneNode(true);
-        resultsContainer.replaceWith(cloned);
-        const clonedCandidates = candidates;
-        cloned.querySelectorAll('.card-wrapper').forEach(el => {
-            const idx = el.dataset.candidateIndex;
-            if (typeof idx !== 'undefined' && clonedCandidates[idx]) {
-                el.addEventListener('click', (e) => {
-                    if (e.target.closest('.delete-resume-btn')) return;
-                    showCandidateDetailModal(clonedCandidates[idx]);
-                });
-                const deleteBtn = document.createElement('button');
-                deleteBtn.className = 'delete-resume-btn btn-secondary';
-                deleteBtn.style.position = 'absolute';
-                deleteBtn.style.top = '8px';
-                deleteBtn.style.right = '8px';
-                deleteBtn.style.padding = '6px 10px';
-                deleteBtn.style.borderRadius = '8px';
-                deleteBtn.textContent = 'Delete';
-                deleteBtn.addEventListener('click', async (ev) => {
-                    ev.stopPropagation();
-                    const confirmDelete = confirm('Delete this resume from the project? This action cannot be undone.');
-                    if (!confirmDelete) return;
-                    const project = JSON.parse(localStorage.getItem('currentProject') || '{}');
-                if (!project || !project.id) { showModal('Error', 'No active project selected.', 'error'); return; }
-                try {
-                    const resp = await fetch(`/projects/${project.id}/resumes/${clonedCandidates[idx].id}`, { method: 'DELETE' });
-                    const result = await resp.json();
-                    if (resp.ok && result.success) {
-                        const r = await fetch(`/projects/${project.id}`);
-                        const d = await r.json();
-                        if (r.ok) {
-                            localStorage.setItem('currentProject', JSON.stringify(d.project));
-                            localStorage.setItem('candidates', JSON.stringify(d.project.resumes || d.project.top_resumes || []));
-                            navigateTo('project_view');
-                        } else {
-                            showModal('Error', d.error || 'Failed to refresh project', 'error');
-                        }
-                    } else {
-                        showModal('Delete Failed', result.error || 'Could not delete resume', 'error');
-                    }
-                } catch (err) {
-                    showModal('Network Error', 'Delete request failed: ' + err.message, 'error');
-                }
-            });
-            const card = el.querySelector('.card') || el;
-            card.style.position = 'relative';
-            card.appendChild(deleteBtn);
-        }
-    });
-    // Wire up comparison controls
-    const selectA = page.querySelector('#compareSelectA');
-    const selectB = page.querySelector('#compareSelectB');
-    const uploadInput = page.querySelector('#uploadCompareInput');
-    const uploadBtn = page.querySelector('#uploadCompareBtn');
-    const randomBtn = page.querySelector('#randomCompareBtn');
-    const topBtn = page.querySelector('#topCompareBtn');
-    
-    function populateSelects(list) {
-        [selectA, selectB].forEach(sel => {
-            if (!sel) return;
-            sel.innerHTML = '<option value="">(Select)</option>';
-            list.forEach((c, i) => {
-                const opt = document.createElement('option');
-                opt.value = i;
-                opt.text = `${c.name || c.filename} (${(c.sections && c.sections.ats_score) ? c.sections.ats_score + '%' : 'N/A'})`;
-                sel.appendChild(opt);
-            });
+if (!currentProject || !currentProject.id) {
+    resultsContainer.innerHTML = `<div class="text-center text-muted p-16 col-span-full">No stored evaluations for this project.</div>`;
+    page.appendChild(renderFooter());
+    return page;
+}
+
+// Wire up comparison controls
+const selectA = page.querySelector('#compareSelectA');
+const selectB = page.querySelector('#compareSelectB');
+const uploadInput = page.querySelector('#uploadCompareInput');
+const uploadBtn = page.querySelector('#uploadCompareBtn');
+const randomBtn = page.querySelector('#randomCompareBtn');
+const topBtn = page.querySelector('#topCompareBtn');
+const searchInput = page.querySelector('#resumeSearchInput');
+const minScoreInput = page.querySelector('#resumeMinScoreInput');
+const sortSelect = page.querySelector('#resumeSortSelect');
+const countLabel = page.querySelector('#resumeCount');
+
+function populateSelects(list) {
+    [selectA, selectB].forEach(sel => {
+        if (!sel) return;
+        const selected = sel.value;
+        sel.innerHTML = '<option value="">(Select)</option>';
+        list.forEach((c, i) => {
+            const opt = document.createElement('option');
+            opt.value = i;
+            opt.text = `${c.name || c.filename} (${getAtsScore(c) ? getAtsScore(c) + '%' : 'N/A'})`;
+            sel.appendChild(opt);
         });
+        sel.value = selected;
+    });
+}
+
+function currentQuery() {
+    const [sort, order] = sortSelect.value.split(':');
+    const query = { sort, order };
+    if (searchInput.value.trim()) query.q = searchInput.value.trim();
+    if (minScoreInput.value !== '') query.min_score = minScoreInput.value;
+    return query;
+}
+
+const analyticsContainer = page.querySelector('#projectAnalytics');
+loadProjectAnalytics(currentProject.id, analyticsContainer);
+
+const list = createVirtualCandidateList(currentProject.id, {
+    query: currentQuery(),
+    emptyText: 'No stored evaluations for this project.',
+    onPage: (items, total) => {
+        countLabel.textContent = `${total} resume${total === 1 ? '' : 's'}`;
+        populateSelects(items);
+    },
+    onDelete: async (candidate) => {
+        if (await deleteProjectResume(currentProject.id, candidate)) {
+            list.reset();
+            loadProjectAnalytics(currentProject.id, analyticsContainer);
+        }
     }
-    
-    populateSelects(clonedCandidates);
-    
-    randomBtn && randomBtn.addEventListener('click', () => {
-    if (clonedCandidates.length < 2) { showModal('Not enough resumes', 'Need at least 2 resumes to compare.', 'info'); return; }
-    const a = clonedCandidates[Math.floor(Math.random() * clonedCandidates.length)];
-    let b = clonedCandidates[Math.floor(Math.random() * clonedCandidates.length)];
-    let attempts = 0;
-    while (b && a && b.id === a.id && attempts < 10) {
-        b = clonedCandidates[Math.floor(Math.random() * clonedCandidates.length)];
-        attempts++;
-    }
-    openComparisonModal(a, b || clonedCandidates[0]);
+});
+resultsContainer.appendChild(list.element);
+const loaded = () => list.state.items;
+
+let filterTimer = null;
+[searchInput, minScoreInput].forEach(input => input.addEventListener('input', () => {
+    clearTimeout(filterTimer);
+    filterTimer = setTimeout(() => list.reset(currentQuery()), 250);
+}));
+sortSelect.addEventListener('change', () => list.reset(currentQuery()));
+
+// Exports the filtered, sorted list; the server streams it, so the browser downloads it directly.
+page.querySelector('#exportResumesBtn').addEventListener('click', () => {
+    const params = new URLSearchParams({ ...currentQuery(), format: page.querySelector('#exportFormatSelect').value });
+    window.location.href = `/projects/${encodeURIComponent(currentProject.id)}/export?${params}`;
 });
 
-topBtn && topBtn.addEventListener('click', () => {
-if (clonedCandidates.length < 2) { showModal('Not enough resumes', 'Need at least 2 resumes to compare.', 'info'); return; }
-const sorted = clonedCandidates.slice().sort((x,y)=> (parseInt((y.sections && y.sections.ats_score) || 0,10)||0)-(parseInt((x.sections && x.sections.ats_score) || 0,10)||0));
-openComparisonModal(sorted[0], sorted[1] || sorted[0]);
+randomBtn && randomBtn.addEventListener('click', () => {
+const pool = loaded();
+if (pool.length < 2) { showModal('Not enough resumes', 'Need at least 2 resumes to compare.', 'info'); return; }
+const a = pool[Math.floor(Math.random() * pool.length)];
+let b = pool[Math.floor(Math.random() * pool.length)];
+let attempts = 0;
+while (b && a && b.id === a.id && attempts < 10) {
+    b = pool[Math.floor(Math.random() * pool.length)];
+    attempts++;
+}
+openComparisonModal(a, b || pool[0]);
+});
+
+topBtn && topBtn.addEventListener('click', async () => {
+try {
+const res = await fetch(`/projects/${currentProject.id}/resumes?sort=score&order=desc&limit=2`);
+const data = await res.json();
+const top = data.resumes || [];
+if (top.length < 2) { showModal('Not enough resumes', 'Need at least 2 resumes to compare.', 'info'); return; }
+openComparisonModal(top[0], top[1]);
+} catch (err) {
+showModal('Network Error', 'Failed to load top resumes: ' + err.message, 'error');
+}
 });
 
 [selectA, selectB].forEach(sel => {
@@ -1251,7 +1534,7 @@ sel && sel.addEventListener('change', () => {
     const aIdx = selectA.value;
     const bIdx = selectB.value;
     if (aIdx !== '' && bIdx !== '' && aIdx !== bIdx) {
-        openComparisonModal(clonedCandidates[aIdx], clonedCandidates[bIdx]);
+        openComparisonModal(loaded()[aIdx], loaded()[bIdx]);
     }
 });
 });
@@ -1260,19 +1543,21 @@ uploadBtn && uploadBtn.addEventListener('click', () => uploadInput && uploadInpu
 uploadInput && uploadInput.addEventListener('change', async (ev) => {
 const file = ev.target.files[0];
 if (!file) return;
-const jd = localStorage.getItem('jobDescription') || (JSON.parse(localStorage.getItem('currentProject') || '{}')).description || '';
+const jd = localStorage.getItem('jobDescription') || currentProject.description || '';
 if (!jd) { showModal('Missing JD', 'Please provide a job description in the Upload or Gmail page before comparing with an uploaded resume.', 'error'); return; }
 const form = new FormData();
 form.append('resume', file);
 form.append('job_description', jd);
 try {
 // NOTE: This comparison logic assumes the standalone upload route is available
-const res = await fetch('/upload_resume', { method: 'POST', body: form });
+const res = await fetchIdempotent('/upload_resume', { method: 'POST', body: form });
 const data = await res.json();
 if (res.ok && data.candidates && data.candidates.length > 0) {
     const uploaded = data.candidates[0];
     const selIdx = selectA.value || selectB.value;
-    const base = (selIdx !== '' && typeof clonedCandidates[selIdx] !== 'undefined') ? clonedCandidates[selIdx] : clonedCandidates[0];
+    const pool = loaded();
+    const base = (selIdx !== '' && typeof pool[selIdx] !== 'undefined') ? pool[selIdx] : pool[0];
+    if (!base) { showModal('Not enough resumes', 'This project has no stored resumes to compare against.', 'info'); return; }
     openComparisonModal(base, uploaded);
 } else {
     showModal('Analysis failed', data.error || 'Could not analyze uploaded file.', 'error');
@@ -1281,21 +1566,65 @@ if (res.ok && data.candidates && data.candidates.length > 0) {
 showModal('Network Error', 'Failed to upload file: ' + err.message, 'error');
 }
 });
-}
-} else {
-resultsContainer.innerHTML = `<div class="text-center text-muted p-16 col-span-full">No stored evaluations for this project.</div>`;
-}
 
 page.appendChild(renderFooter());
 return page;
 }
 
+// --- Compact project records ---
+// Stored projects only carry an index record per resume (scores, contact, keywords).
+// The full evaluation sections are fetched when a candidate is opened or compared.
+function getAtsScore(candidate) {
+if (!candidate) return undefined;
+if (candidate.ats_score !== undefined && candidate.ats_score !== null) return candidate.ats_score;
+return candidate.sections ? candidate.sections.ats_score : undefined;
+}
+
+async function loadCandidateDetail(candidate) {
+if (candidate.sections && candidate.sections.strengths_weaknesses !== undefined) return candidate;
+const project = JSON.parse(localStorage.getItem('currentProject') || 'null');
+if (project && project.id && candidate.id) {
+try {
+const res = await fetch(`/projects/${project.id}/resumes/${candidate.id}`);
+if (res.ok) {
+const data = await res.json();
+return { ...data.resume, project_id: project.id };
+}
+} catch (err) {
+console.error('Failed to load candidate details:', err);
+}
+}
+return { ...candidate, sections: candidate.sections || { ats_score: getAtsScore(candidate) } };
+}
+
 // --- Comparison Modal ---
-function openComparisonModal(candidateA, candidateB) {
+async function openComparisonModal(candidateA, candidateB) {
 if (!candidateA || !candidateB) {
 showModal('Comparison Error', 'Both candidates must be provided for comparison.', 'error');
 return;
 }
+const comparison = await loadComparison([candidateA, candidateB]);
+if (comparison) {
+modalContainer.innerHTML = `
+<div class="modal-overlay-full modal-overlay-animated">
+<div class="modal-content-full modal-content-animated">
+<button class="modal-close-btn" onclick="closeModal()"><i class="fas fa-times"></i></button>
+<div class="comparison-header p-6 border-b">
+<h2 class="text-2xl font-bold">Resume Comparison</h2>
+<div class="text-sm text-muted">Side-by-side comparison of stored evaluations, ranked by ATS score</div>
+</div>
+<div class="comparison-body p-4 overflow-auto">${generateAlignedComparisonHtml(comparison)}</div>
+<div class="mt-auto p-4 flex justify-end bg-gray-50 dark:bg-gray-800 border-t">
+<button class="btn-secondary" onclick="closeModal()">Close</button>
+</div>
+</div>
+</div>
+`;
+return;
+}
+
+// Candidates outside the current project (e.g. a freshly uploaded file) are compared client-side
+[candidateA, candidateB] = await Promise.all([loadCandidateDetail(candidateA), loadCandidateDetail(candidateB)]);
 
 const htmlA = generateCandidateComparisonHtml(candidateA);
 const htmlB = generateCandidateComparisonHtml(candidateB);
@@ -1320,6 +1649,59 @@ modalContainer.innerHTML = `
 `;
 }
 
+async function loadComparison(candidates) {
+const project = JSON.parse(localStorage.getItem('currentProject') || 'null');
+if (!project || !project.id || !candidates.every(c => c.id)) return null;
+try {
+const ids = candidates.map(c => encodeURIComponent(c.id)).join(',');
+const res = await fetch(`/api/compare?ids=${ids}&project_id=${encodeURIComponent(project.id)}`);
+return res.ok ? await res.json() : null;
+} catch (err) {
+console.warn('Could not load comparison', err);
+return null;
+}
+}
+
+function generateAlignedComparisonHtml(comparison) {
+const columns = comparison.candidates.length;
+const grid = `display:grid;grid-template-columns:180px repeat(${columns}, minmax(0, 1fr));gap:0.75rem 1rem;align-items:start`;
+const label = (text) => `<div class="font-semibold text-heading">${text}</div>`;
+const cells = (values) => values.map(v => `<div>${v}</div>`).join('');
+const bullets = (items, icon) => items.length
+    ? items.map(item => `<div class="${icon === 'plus' ? 'strength-item' : 'weakness-item'}"><i class="fas fa-${icon}-circle mr-2 ${icon === 'plus' ? 'text-blue-500' : 'text-orange-500'}"></i><span>${item}</span></div>`).join('')
+    : '<span class="text-muted">None listed</span>';
+const keywordRows = comparison.keywords.matrix.map(row => `
+${label(`${row.keyword} <span class="text-xs text-muted">${row.domain.replace(/_/g, ' ')}</span>`)}
+${cells(row.present.map(p => p ? '<i class="fas fa-check text-green-500"></i>' : '<i class="fas fa-minus text-muted"></i>'))}
+`).join('');
+const questionRows = comparison.interview_questions.map(row => `
+${label(`Question ${row.index}`)}
+${cells(row.items.map(q => q ? `<div class="text-sm">${q.question}</div>${q.match_level ? `<span class="skill-tag ${getMatchClass(q.match_level)}">${q.match_level}</span>` : ''}` : '<span class="text-muted">—</span>'))}
+`).join('');
+const levels = (counts) => Object.entries(counts).map(([level, n]) => `<span class="skill-tag">${level} · ${n}</span>`).join('') || '<span class="text-muted">—</span>';
+
+return `
+<div style="${grid}">
+<div></div>
+${cells(comparison.candidates.map(c => `<h3 class="text-xl font-bold">${c.name || c.filename || 'Unknown'}</h3><div class="text-sm text-muted">${c.email || ''}</div>`))}
+${label('ATS Score')}
+${cells(comparison.scores.ats.map(v => `<span class="text-2xl font-bold text-primary-orange">${v ? v + '%' : 'N/A'}</span>`))}
+${label('HR Score')}
+${cells(comparison.scores.hr.map(v => v ? `${v}/10` : 'N/A'))}
+${label('Unique skills')}
+${cells(comparison.keywords.unique.map(list => list.map(k => `<span class="skill-tag">${k}</span>`).join('') || '<span class="text-muted">—</span>'))}
+${keywordRows}
+${label('Strengths')}
+${cells(comparison.strengths.map(list => bullets(list, 'plus')))}
+${label('Weaknesses')}
+${cells(comparison.weaknesses.map(list => bullets(list, 'minus')))}
+${label('Interview match')}
+${cells(comparison.match_levels.map(levels))}
+${questionRows}
+</div>
+`;
+}
+
 function generateCandidateComparisonHtml(candidate) {
 const name = candidate.name || candidate.filename || 'Unknown';
 const ats = candidate.sections && candidate.sections.ats_score ? candidate.sections.ats_score + '%' : 'N/A';
@@ -1359,7 +1741,13 @@ ${weaknesses}
 `;
 }
 
-function showCandidateDetailModal(candidate) {
+async function showCandidateDetailModal(candidate) {
+candidate = await loadCandidateDetail(candidate);
+const currentProject = JSON.parse(localStorage.getItem('currentProject') || 'null');
+// Stored PDFs are served through a short-lived signed URL
+const fileLink = (currentProject && currentProject.id && candidate.id && candidate.storage_path)
+    ? `<a class="btn-secondary" href="/projects/${currentProject.id}/resumes/${candidate.id}/file" target="_blank" rel="noopener"><i class="fas fa-file-pdf mr-2"></i> Resume PDF</a>`
+    : '';
 modalContainer.innerHTML = `
 <div class="modal-overlay-full modal-overlay-animated">
 <div class="modal-content-full modal-content-animated">
@@ -1375,6 +1763,7 @@ modalContainer.innerHTML = `
 <div class="header-actions">
 <button class="btn-primary email-btn" data-email-type="accept"><i class="fas fa-check-circle mr-2"></i> Accept</button>
 <button class="btn-secondary email-btn" data-email-type="reject"><i class="fas fa-times-circle mr-2"></i> Reject</button>
+${fileLink}
 </div>
 </div>
 <div class="modal-body-full">
@@ -1575,6 +1964,38 @@ chatBody.appendChild(messageElement);
 chatBody.scrollTop = chatBody.scrollHeight;
 }
 
+// Reads Server-Sent Events from /chat/stream and renders tokens as they arrive
+async function readChatStream(response, messageElement) {
+const chatBody = document.getElementById('chat-body');
+const reader = response.body.getReader();
+const decoder = new TextDecoder();
+let buffer = '';
+let reply = '';
+while (true) {
+const { value, done } = await reader.read();
+if (done) break;
+buffer += decoder.decode(value, { stream: true });
+const events = buffer.split('\n\n');
+buffer = events.pop();
+for (const evt of events) {
+if (!evt.startsWith('data: ')) continue;
+const payload = JSON.parse(evt.slice(6));
+if (payload.token) {
+reply += payload.token;
+} else if (payload.error) {
+reply = payload.error;
+}
+}
+if (reply) {
+messageElement.innerHTML = formatTextWithMarkdown(reply);
+chatBody.scrollTop = chatBody.scrollHeight;
+}
+}
+if (!reply) {
+messageElement.innerHTML = formatTextWithMarkdown("I'm sorry, I encountered an error. Please try again later.");
+}
+}
+
 async function sendMessage() {
 const chatInput = document.getElementById('chat-input-field');
 const message = chatInput.value.trim();
@@ -1587,14 +2008,27 @@ addMessage('<i class="fas fa-spinner fa-spin"></i>', 'assistant');
 const loadingMessage = document.getElementById('chat-body').lastChild;
 
 try {
-const response = await fetch('/chat', {
+const response = await fetch('/chat/stream', {
 method: 'POST',
 headers: { 'Content-Type': 'application/json' },
 body: JSON.stringify({ message: message })
 });
-const data = await response.json();
+const contentType = response.headers.get('Content-Type') || '';
+if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
+// Non-streaming reply (validation message, assistant unavailable, busy server, old server)
+const data = await response.json().catch(() => ({}));
 loadingMessage.remove();
+if (data.response) {
 addMessage(data.response, 'assistant');
+} else if (response.status === 429) {
+const retryAfter = data.retry_after || parseInt(response.headers.get('Retry-After'), 10);
+addMessage(`${data.error || 'The assistant is busy.'}${retryAfter ? ` Please retry in ${retryAfter}s.` : ''}`, 'assistant');
+} else {
+addMessage(data.error || "I'm sorry, I encountered an error. Please try again later.", 'assistant');
+}
+return;
+}
+await readChatStream(response, loadingMessage);
 } catch (error) {
 console.error('Error sending chat message:', error);
 loadingMessage.remove();